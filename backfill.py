@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from candle_store import (STORE, STORE_DIR, INTERVAL_MS, KLINES_PAGE_LIMIT, OPEN_TIME, CLOSE_TIME,
+                          fetch_klines, decode_klines, now_ms)
+from exchange_client import WEIGHT_LIMIT_1M, WEIGHT_SAFETY
+
+# ==================== CONFIGURAZIONE BACKFILL ====================
+BACKFILL_WORKERS = int(os.getenv('BACKFILL_WORKERS', 4))
+CHECKPOINT_DIR = os.path.join(os.path.dirname(STORE_DIR), 'backfill')
+KLINES_WEIGHT = 2            # Peso Binance di una pagina klines da 1000 barre
+
+# ==================== BUDGET RATE LIMIT ====================
+class WeightBudget:
+    """Token bucket sul peso API, condiviso da tutti i worker di backfill"""
+
+    def __init__(self, per_minute=WEIGHT_LIMIT_1M * WEIGHT_SAFETY):
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.rate = per_minute / 60.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, weight=KLINES_WEIGHT):
+        """Blocca finché il peso richiesto è disponibile"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                wait = (weight - self.tokens) / self.rate
+            time.sleep(wait)
+
+BUDGET = WeightBudget()
+
+# ==================== FINESTRE ====================
+def plan_windows(start_time, end_time, interval):
+    """Divide [start_time, end_time] in finestre da una pagina allineate a una griglia fissa.
+
+    La griglia non dipende da start_time, quindi un rilancio con un inizio
+    leggermente diverso ritrova le stesse finestre già salvate.
+    """
+    span = INTERVAL_MS[interval] * KLINES_PAGE_LIMIT
+    first = start_time // span
+    last = end_time // span
+    return [(cell * span, (cell + 1) * span - 1) for cell in range(first, last + 1)]
+
+class Backfill:
+    """Download storico parallelo e riprendibile per un simbolo/intervallo.
+
+    Le finestre vengono scaricate in parallelo rispettando il budget di peso
+    globale; ogni finestra completa (tutta nel passato) viene salvata su disco,
+    così un run interrotto riparte solo dalle finestre mancanti.
+    """
+
+    def __init__(self, symbol, interval, start_time, end_time=None, workers=BACKFILL_WORKERS,
+                 checkpoint_dir=CHECKPOINT_DIR, fetch=fetch_klines, budget=BUDGET):
+        self.symbol = symbol.upper()
+        self.interval = interval
+        self.start_time = int(start_time)
+        self.end_time = int(end_time) if end_time is not None else now_ms()
+        self.workers = workers
+        self.checkpoint_dir = checkpoint_dir
+        self.fetch = fetch
+        self.budget = budget
+        self.resumed = 0
+        self.downloaded = 0
+
+    def _checkpoint_path(self, window):
+        return os.path.join(self.checkpoint_dir,
+                            f"{self.symbol}_{self.interval}_{window[0]}_{window[1]}.npy")
+
+    def _fetch_window(self, window):
+        """Scarica (o rilegge dal checkpoint) una finestra"""
+        path = self._checkpoint_path(window)
+        if os.path.exists(path):
+            self.resumed += 1
+            return np.load(path)
+
+        self.budget.acquire(KLINES_WEIGHT)
+        page = self.fetch(self.symbol, self.interval, start_time=window[0], end_time=window[1],
+                          limit=KLINES_PAGE_LIMIT)
+        block = decode_klines(page)
+        self.downloaded += 1
+
+        # Solo finestre interamente chiuse sono definitive
+        if window[1] < now_ms():
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+            tmp_path = path + '.tmp.npy'
+            np.save(tmp_path, block)
+            os.replace(tmp_path, path)
+        return block
+
+    def run(self):
+        """Esegue il backfill e ritorna le candele chiuse (colonne × righe), ordinate e senza duplicati"""
+        windows = plan_windows(self.start_time, self.end_time, self.interval)
+        blocks = []
+        failed = []
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="backfill") as executor:
+            futures = {executor.submit(self._fetch_window, w): w for w in windows}
+            for future in as_completed(futures):
+                try:
+                    blocks.append(future.result())
+                except Exception as e:
+                    failed.append((futures[future], e))
+
+        if failed:
+            window, error = failed[0]
+            raise RuntimeError(
+                f"Backfill {self.symbol}: {len(failed)}/{len(windows)} finestre fallite "
+                f"(es. {window[0]}: {error}) - rilancia per riprendere"
+            )
+
+        return self.merge(blocks)
+
+    def merge(self, blocks):
+        """Unisce le pagine in un solo passaggio vettoriale"""
+        if not blocks:
+            return decode_klines([])
+        merged = np.concatenate(blocks, axis=1)
+        now = now_ms()
+        keep = ((merged[OPEN_TIME] >= self.start_time) & (merged[OPEN_TIME] <= self.end_time) &
+                (merged[CLOSE_TIME] < now))
+        merged = merged[:, keep]
+        # np.unique ordina e deduplica in un colpo
+        _, first = np.unique(merged[OPEN_TIME], return_index=True)
+        return merged[:, first]
+
+    def clear_checkpoints(self):
+        """Rimuove i checkpoint dopo che i dati sono finiti nello store"""
+        for window in plan_windows(self.start_time, self.end_time, self.interval):
+            path = self._checkpoint_path(window)
+            if os.path.exists(path):
+                os.remove(path)
+
+def backfill_store(symbol, interval, start_time, store=STORE, workers=BACKFILL_WORKERS, **kwargs):
+    """Porta lo store a coprire [start_time, adesso] scaricando in parallelo solo i buchi"""
+    kwargs.setdefault('fetch', store.fetch)
+    since, first_open, last_close, rows = store.coverage(symbol, interval)
+    now = now_ms()
+    step = INTERVAL_MS[interval]
+
+    ranges = []
+    if since is None or start_time < since:
+        ranges.append((start_time, first_open - 1 if rows else now))
+    if rows and last_close + step < now:
+        ranges.append((last_close + 1, now))
+
+    written = 0
+    for range_start, range_end in ranges:
+        job = Backfill(symbol, interval, range_start, range_end, workers=workers, **kwargs)
+        block = job.run()
+        store.merge_history(symbol, interval, block, since=start_time)
+        job.clear_checkpoints()
+        written += block.shape[1]
+    return written
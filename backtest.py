@@ -1,9 +1,20 @@
 import pandas as pd
-import requests
 import numpy as np
 from datetime import datetime, timedelta
+import os
 import json
 import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from candle_store import INTERVAL_MS
+from resample import provider_for
+import indicators
+import indicator_panel
+from indicator_panel import rolling_mean
+from backtest_cache import BACKTEST_CACHE, content_key, code_fingerprint
+import results_store
+import montecarlo
 
 print("📊 AVVIO BACKTESTING 7 ANNI...")
 
@@ -11,6 +22,8 @@ print("📊 AVVIO BACKTESTING 7 ANNI...")
 INITIAL_BALANCE = 50  # 50€
 COMMISSION = 0.001    # 0.1% commissioni Binance
 
+BACKTEST_WORKERS = int(os.getenv('BACKTEST_WORKERS', os.cpu_count() or 1))
+
 # Coppie per testare (ideali per piccoli capitali)
 CRYPTO_PAIRS = [
     "BTCUSDT",    # Bitcoin (referenza)
@@ -23,83 +36,35 @@ CRYPTO_PAIRS = [
     "LINKUSDT",   # Chainlink ~12€
 ]
 
-def download_historical_data(symbol, years=7):
-    """Scarica dati storici da Binance"""
+def download_historical_data(symbol, years=7, provider=None, interval="1d"):
+    """Scarica dati storici da Binance (store locale + sync incrementale)"""
     print(f"📥 Scaricando dati per {symbol}...")
     
-    all_data = []
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=years*365)
-    
-    current_start = start_date
-    
-    while current_start < end_date:
-        try:
-            url = "https://api.binance.com/api/v3/klines"
-            params = {
-                "symbol": symbol,
-                "interval": "1d",  # Dati giornalieri
-                "startTime": int(current_start.timestamp() * 1000),
-                "endTime": int(end_date.timestamp() * 1000),
-                "limit": 1000
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            data = response.json()
-            
-            if not data:
-                break
-                
-            all_data.extend(data)
-            
-            # Aggiorna data di inizio per prossima richiesta
-            last_timestamp = data[-1][0]
-            current_start = datetime.fromtimestamp(last_timestamp / 1000)
-            
-            # Rate limiting
-            time.sleep(0.1)
-            
-        except Exception as e:
-            print(f"❌ Errore download {symbol}: {e}")
-            break
+    start_date = datetime.now() - timedelta(days=years*365)
+    start_time = int(start_date.timestamp() * 1000)
     
-    if not all_data:
+    try:
+        # REST: backfill parallelo e riprendibile dei soli buchi, poi lettura dallo store
+        # (intervalli non nativi ricampionati dalla serie 1m)
+        provider = provider_for(interval, provider)
+        df = provider.get_history(symbol, interval, start_time=start_time)
+    except Exception as e:
+        print(f"❌ Errore download {symbol}: {e}")
         return None
     
-    # Converti in DataFrame
-    df = pd.DataFrame(all_data, columns=[
-        'timestamp', 'open', 'high', 'low', 'close', 'volume',
-        'close_time', 'quote_asset_volume', 'number_of_trades',
-        'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
-    ])
-    
-    # Converti timestamp e prezzi
-    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-    df['close'] = df['close'].astype(float)
-    df['open'] = df['open'].astype(float)
-    df['high'] = df['high'].astype(float)
-    df['low'] = df['low'].astype(float)
-    df['volume'] = df['volume'].astype(float)
+    if df.empty:
+        return None
     
     # Rimuovi duplicati
     df = df.drop_duplicates('timestamp')
     df = df.sort_values('timestamp').reset_index(drop=True)
     
-    print(f"✅ {symbol}: {len(df)} giorni di dati")
+    print(f"✅ {symbol}: {len(df)} candele {interval}")
     return df
 
-def calculate_rsi(prices, period=14):
-    """Calcola RSI"""
-    deltas = np.diff(prices)
-    gains = np.where(deltas > 0, deltas, 0)
-    losses = np.where(deltas < 0, -deltas, 0)
-    
-    avg_gains = pd.Series(gains).rolling(period).mean()
-    avg_losses = pd.Series(losses).rolling(period).mean()
-    
-    rs = avg_gains / avg_losses
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
+def calculate_rsi(prices, period=14, key=None):
+    """Calcola RSI (allineato alle barre: rsi[i] usa il delta tra i-1 e i)"""
+    return indicators.compute('rsi', prices, key, period=period)
 
 def improved_strategy(prices, rsi_values=None):
     """Strategia migliorata con multiple condizioni"""
@@ -136,43 +101,66 @@ def improved_strategy(prices, rsi_values=None):
     
     return "HOLD"
 
-def run_backtest(df, initial_balance=50, strategy_type="improved"):
-    """Esegue backtesting completo"""
+# ==================== MOTORE VETTORIALE ====================
+HOLD, BUY, SELL = 0, 1, -1
+WARMUP_BARS = 20              # Barre attese prima del primo segnale
+
+def improved_signals(prices, rsi_values=None):
+    """Segnali di improved_strategy per tutte le barre in un colpo (1 BUY, -1 SELL, 0 HOLD).
+
+    signals[i] coincide con improved_strategy(prices[:i+1], rsi_values[:i+1]).
+    """
+    prices = np.asarray(prices, dtype=float)
+    signals = np.zeros(len(prices), dtype=np.int8)
+    if len(prices) < 20:
+        return signals
+    
+    # Medie mobili (stessa somma di np.mean sulla finestra)
+    sma_20 = rolling_mean(prices, 20)
+    sma_5 = rolling_mean(prices, 5)
+    uptrend = sma_5 > sma_20
+    
+    oversold = np.zeros(len(prices), dtype=bool)
+    overbought = np.zeros(len(prices), dtype=bool)
+    if rsi_values is not None and len(rsi_values) > 0:
+        rsi_values = np.asarray(rsi_values, dtype=float)
+        oversold = rsi_values < 30
+        overbought = rsi_values > 70
+    
+    # Trend following: compra sui pullback in uptrend, vendi sui rimbalzi in downtrend
+    buy = uptrend & ~overbought & (prices < sma_5 * 0.98)
+    sell = ~uptrend & ~oversold & (prices > sma_5 * 1.02)
+    signals[buy] = BUY
+    signals[sell] = SELL
+    signals[:19] = HOLD
+    return signals
+
+def simulate_trades(prices, signals, timestamps, initial_balance, start=WARMUP_BARS):
+    """Macchina a stati long-only in un solo passaggio sulle barre con segnale.
+
+    Entrata su BUY senza posizione, uscita su SELL con posizione, commissioni
+    in entrata e uscita; l'eventuale posizione aperta si chiude sull'ultima barra.
+    """
     balance = initial_balance
-    position = 0  # 0 = no position, 1 = long
+    position = 0
     entry_price = 0
     trades = []
-    prices = df['close'].tolist()
     
-    # Calcola RSI per la strategia
-    rsi_values = calculate_rsi(prices).tolist() if len(prices) > 14 else None
-    
-    for i in range(len(prices)):
-        if i < 20:  # Aspetta dati sufficienti
-            continue
-            
-        current_data = prices[:i+1]
-        current_rsi = rsi_values[:i+1] if rsi_values else None
-        current_price = prices[i]
-        current_date = df.iloc[i]['timestamp']
+    for i in np.flatnonzero(signals[start:]) + start:
+        current_price = float(prices[i])
         
-        # Segnale della strategia
-        if strategy_type == "improved":
-            action = improved_strategy(current_data, current_rsi)
-        
-        # GESTIONE TRADE
-        if action == "BUY" and position == 0:
+        if signals[i] == BUY and position == 0:
             # ENTRATA LONG
             position = 1
             entry_price = current_price
             trades.append({
                 'type': 'BUY',
                 'price': current_price,
-                'date': current_date,
+                'date': timestamps.iloc[i],
                 'balance_before': balance
             })
             
-        elif action == "SELL" and position == 1:
+        elif signals[i] == SELL and position == 1:
             # USCITA LONG
             profit_percent = (current_price - entry_price) / entry_price
             # Applica commissioni
@@ -186,55 +174,338 @@ def run_backtest(df, initial_balance=50, strategy_type="improved"):
                 'price': current_price,
                 'profit_percent': profit_percent * 100,
                 'balance_after': balance,
-                'date': current_date
+                'date': timestamps.iloc[i]
             })
     
     # Chiudi eventuale posizione aperta
     if position == 1:
-        profit_percent = (prices[-1] - entry_price) / entry_price - COMMISSION * 2
+        last_price = float(prices[-1])
+        profit_percent = (last_price - entry_price) / entry_price - COMMISSION * 2
         balance = balance * (1 + profit_percent)
         trades.append({
             'type': 'SELL_FINAL',
-            'price': prices[-1],
+            'price': last_price,
             'profit_percent': profit_percent * 100,
             'balance_after': balance,
-            'date': df.iloc[-1]['timestamp']
+            'date': timestamps.iloc[-1]
         })
     
-    # CALCOLA STATISTICHE
+    return balance, trades
+
+EXIT_CHUNK = 256              # Barre esaminate per blocco nella ricerca dell'uscita
+
+def first_exit(prices, sell, start, entry_price, stop_loss, take_profit,
+               trailing_stop, trailing_activation, use_trailing_stop=True):
+    """Prima barra >= start in cui una posizione long si chiude: (indice, motivo) o (None, None).
+
+    Stesse regole di ProfessionalTrader.check_position_management, su blocchi
+    di barre: massimo progressivo, trailing attivo dopo `trailing_activation`
+    di profitto, stop che può solo salire; a ogni barra prima lo stop, poi il
+    take profit, poi il segnale SELL.
+    """
+    base_stop = entry_price * (1 - stop_loss)
+    target = entry_price * (1 + take_profit)
+    max_price = entry_price
+    stop = base_stop
+    
+    j = start
+    while j < len(prices):
+        segment = prices[j:j + EXIT_CHUNK]
+        if use_trailing_stop:
+            running_max = np.maximum.accumulate(np.maximum(segment, max_price))
+            active = (running_max - entry_price) / entry_price >= trailing_activation
+            trailing = np.where(active, running_max * (1 - trailing_stop), -np.inf)
+            stops = np.maximum(np.maximum.accumulate(trailing), stop)
+        else:
+            running_max = segment
+            stops = np.full(len(segment), stop)
+        
+        hit = (segment <= stops) | (segment >= target) | sell[j:j + len(segment)]
+        if hit.any():
+            k = int(np.argmax(hit))
+            if segment[k] <= stops[k]:
+                reason = "TRAILING_STOP" if use_trailing_stop and stops[k] > base_stop else "STOP_LOSS"
+            elif segment[k] >= target:
+                reason = "TAKE_PROFIT"
+            else:
+                reason = "SELL"
+            return j + k, reason
+        
+        if use_trailing_stop:
+            max_price = running_max[-1]
+            stop = stops[-1]
+        j += len(segment)
+    return None, None
+
+def simulate_managed(prices, buy, sell, initial_balance, stop_loss, take_profit,
+                     trailing_stop, trailing_activation, use_trailing_stop=True,
+                     timestamps=None, start=0, find_exit=None):
+    """Come simulate_trades, con uscite su stop loss, take profit e trailing stop.
+
+    buy/sell sono maschere booleane dei segnali già filtrati; l'uscita è
+    cercata per blocchi vettoriali, quindi il costo dipende dal numero di
+    trade e non dal numero di barre. find_exit(inizio, prezzo di entrata)
+    sostituisce la ricerca sulle chiusure e ritorna (indice, motivo, prezzo
+    di uscita), es. uscite intrabar su high/low (vedi intrabar.py).
+    """
+    prices = np.asarray(prices, dtype=float)
+    entries = np.flatnonzero(buy[start:]) + start
+    balance = initial_balance
+    trades = []
+    
+    i = entries[0] if len(entries) else None
+    while i is not None:
+        entry_price = float(prices[i])
+        trades.append({
+            'type': 'BUY',
+            'price': entry_price,
+            'date': timestamps.iloc[i] if timestamps is not None else int(i),
+            'balance_before': balance
+        })
+        
+        if find_exit is None:
+            exit_index, reason = first_exit(prices, sell, i + 1, entry_price, stop_loss, take_profit,
+                                            trailing_stop, trailing_activation, use_trailing_stop)
+            exit_price = prices[exit_index] if exit_index is not None else None
+        else:
+            exit_index, reason, exit_price = find_exit(i + 1, entry_price)
+        if exit_index is None:
+            exit_index, reason, exit_price = len(prices) - 1, "SELL_FINAL", prices[-1]
+        
+        exit_price = float(exit_price)
+        profit_percent = (exit_price - entry_price) / entry_price - COMMISSION * 2
+        balance = balance * (1 + profit_percent)
+        trades.append({
+            'type': 'SELL_FINAL' if reason == "SELL_FINAL" else 'SELL',
+            'reason': reason,
+            'price': exit_price,
+            'profit_percent': profit_percent * 100,
+            'balance_after': balance,
+            'date': timestamps.iloc[exit_index] if timestamps is not None else int(exit_index)
+        })
+        
+        # Dopo uno stop la stessa barra può riaprire (come il bot: prima gestione, poi analisi)
+        following = np.searchsorted(entries, exit_index if reason != "SELL" else exit_index + 1)
+        i = entries[following] if following < len(entries) and reason != "SELL_FINAL" else None
+    
+    return balance, trades
+
+def equity_per_bar(prices, trades, initial_balance, timestamps=None):
+    """Equity mark-to-market a ogni barra dai trade di simulate_trades/simulate_managed.
+
+    In posizione vale il saldo d'entrata × prezzo/entrata meno le commissioni
+    di entrata e uscita (quanto si incasserebbe chiudendo al close); sulla
+    barra d'uscita vale il saldo dopo il trade, fuori posizione il saldo.
+    """
+    prices = np.asarray(prices, dtype=float)
+    equity = np.full(len(prices), float(initial_balance))
+    index = pd.Index(timestamps) if timestamps is not None else None
+    
+    balance = initial_balance
+    flat_from = 0
+    for buy, sell in zip(trades[::2], trades[1::2]):
+        i = int(buy['date']) if index is None else index.get_loc(buy['date'])
+        j = int(sell['date']) if index is None else index.get_loc(sell['date'])
+        equity[flat_from:i] = balance
+        equity[i:j] = buy['balance_before'] * (prices[i:j] / buy['price'] - COMMISSION * 2)
+        balance = sell['balance_after']
+        equity[j] = balance
+        flat_from = j + 1
+    equity[flat_from:] = balance
+    return equity
+
+def backtest_stats(initial_balance, balance, trades):
+    """Statistiche finali di un backtest"""
     total_return = (balance - initial_balance) / initial_balance * 100
     
+    closed = [t for t in trades if t.get('profit_percent') is not None]
     profitable_trades = [t for t in trades if t.get('profit_percent', 0) > 0]
-    win_rate = len(profitable_trades) / len([t for t in trades if t.get('profit_percent') is not None]) * 100 if trades else 0
-    
-    # Drawdown
-    equity_curve = [initial_balance]
-    current_equity = initial_balance
-    for trade in trades:
-        if 'balance_after' in trade:
-            current_equity = trade['balance_after']
-            equity_curve.append(current_equity)
-    
-    max_drawdown = 0
-    peak = equity_curve[0]
-    for equity in equity_curve:
-        if equity > peak:
-            peak = equity
-        drawdown = (peak - equity) / peak * 100
-        if drawdown > max_drawdown:
-            max_drawdown = drawdown
+    win_rate = len(profitable_trades) / len(closed) * 100 if trades else 0
+    
+    # Drawdown sulla curva dei saldi dopo ogni uscita
+    equity_curve = [initial_balance] + [t['balance_after'] for t in trades if 'balance_after' in t]
+    equity = np.asarray(equity_curve, dtype=float)
+    peak = np.maximum.accumulate(equity)
+    max_drawdown = max(0, float(((peak - equity) / peak * 100).max()))
     
     return {
         'initial_balance': initial_balance,
         'final_balance': balance,
         'total_return_percent': total_return,
-        'total_trades': len([t for t in trades if t.get('profit_percent') is not None]),
+        'total_trades': len(closed),
         'win_rate': win_rate,
         'max_drawdown': max_drawdown,
         'trades': trades,
         'equity_curve': equity_curve
     }
 
+# Codice che determina il risultato di ogni strategia (parte della chiave in cache,
+# insieme a run_backtest e result_key); indicator_panel per intero, perché
+# rolling_mean dipende dai suoi helper
+STRATEGY_CODE = {
+    "improved": (improved_signals, calculate_rsi, indicators.rsi, indicator_panel, simulate_trades, backtest_stats),
+}
+_CODE_FINGERPRINTS = {}
+
+def result_key(df, initial_balance, strategy_type):
+    """Chiave di contenuto di un backtest: serie di prezzi, codice della strategia e impostazioni"""
+    if strategy_type not in _CODE_FINGERPRINTS:
+        _CODE_FINGERPRINTS[strategy_type] = code_fingerprint(run_backtest, result_key, *STRATEGY_CODE[strategy_type])
+    settings = {
+        'strategy': strategy_type,
+        'initial_balance': initial_balance,
+        'commission': COMMISSION,
+        'warmup_bars': WARMUP_BARS,
+        'signals': (HOLD, BUY, SELL),
+        'rsi_min_loss': indicators.RSI_MIN_LOSS,
+    }
+    return content_key(df['timestamp'], df['close'].to_numpy(dtype=float),
+                       _CODE_FINGERPRINTS[strategy_type], settings)
+
+def run_backtest(df=None, initial_balance=50, strategy_type="improved", provider=None, symbol=None, years=7,
+                 interval="1d", cache=BACKTEST_CACHE):
+    """Esegue backtesting completo (df già pronto, oppure symbol + provider + interval).
+
+    Con cache, stessi prezzi, strategia e impostazioni ritornano il risultato
+    salvato senza ricalcolare; cache=None forza il calcolo.
+    """
+    if df is None:
+        df = download_historical_data(symbol, years, provider, interval)
+        if df is None:
+            return None
+    if strategy_type not in STRATEGY_CODE:
+        raise ValueError(f"Strategia sconosciuta: {strategy_type}")
+    
+    cache_key = result_key(df, initial_balance, strategy_type) if cache is not None and cache.enabled else None
+    if cache_key is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
+    prices = df['close'].to_numpy(dtype=float)
+    
+    # Calcola RSI per la strategia
+    key = indicators.series_key(symbol, interval, df)
+    rsi_values = calculate_rsi(prices, key=key).to_numpy() if len(prices) > 14 else None
+    
+    # Segnali di tutta la storia in un colpo, poi un solo passaggio per i trade
+    signals = improved_signals(prices, rsi_values)
+    
+    balance, trades = simulate_trades(prices, signals, df['timestamp'], initial_balance)
+    result = backtest_stats(initial_balance, balance, trades)
+    if cache_key is not None:
+        cache.put(cache_key, result)
+    return result
+
+# ==================== RUNNER MULTI-COPPIA ====================
+MIN_HISTORY_BARS = 100
+
+def load_pair(symbol, years=7, provider=None, interval="1d"):
+    """Candele di una coppia, o (None, motivo) se mancano: scaricate una volta sola per simbolo"""
+    try:
+        df = download_historical_data(symbol, years=years, provider=provider, interval=interval)
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+    if df is None or len(df) < MIN_HISTORY_BARS:
+        return None, "dati insufficienti"
+    return df, None
+
+def run_pair(task):
+    """Backtest + equity per barra di una (coppia, strategia) su candele già caricate.
+
+    Gira in un processo del pool: ogni errore resta dentro il risultato,
+    così una coppia sbagliata non ferma le altre.
+    """
+    symbol, strategy_type, df, initial_balance, interval = task
+    started = time.time()
+    outcome = {'symbol': symbol, 'strategy': strategy_type, 'result': None, 'equity': None, 'error': None}
+    try:
+        result = run_backtest(df, initial_balance, strategy_type, symbol=symbol, interval=interval)
+        outcome['result'] = result
+        outcome['equity'] = (df['timestamp'], equity_per_bar(df['close'], result['trades'],
+                                                              initial_balance, df['timestamp']))
+    except Exception as e:
+        outcome['error'] = f"{type(e).__name__}: {e}"
+    outcome['elapsed'] = time.time() - started
+    return outcome
+
+def _failed(symbol, strategy_type, error):
+    return {'symbol': symbol, 'strategy': strategy_type, 'result': None, 'equity': None,
+            'error': error, 'elapsed': None}
+
+def _drain(futures, on_result, lost, wait=False):
+    """Passa a on_result i task terminati (tutti se wait); quelli persi per un crash finiscono in lost"""
+    done = as_completed(list(futures)) if wait else [future for future in list(futures) if future.done()]
+    for future in done:
+        task = futures.pop(future)
+        try:
+            outcome = future.result()
+        except BrokenProcessPool:
+            lost.append(task)
+            continue
+        on_result(outcome)
+
+def run_pairs(pairs=None, strategies=("improved",), years=7, initial_balance=INITIAL_BALANCE,
+              workers=BACKTEST_WORKERS, provider=None, on_result=None, interval="1d"):
+    """Backtest di tutte le (coppie × strategie) in un pool di processi.
+
+    Le candele sono scaricate qui, in sequenza e una volta per simbolo:
+    store e budget di peso del backfill restano in un solo processo, mentre
+    il pool calcola i backtest delle coppie già pronte. I risultati arrivano
+    a on_result(esito) appena ogni coppia termina, e sono ritornati come
+    {nome: risultato} per analyze_results (nome = simbolo, o
+    "simbolo [strategia]" con più strategie; None se la coppia è fallita).
+    Un crash del processo rompe il pool: le coppie rimaste senza esito sono
+    rieseguite una alla volta in un processo proprio, così solo quella
+    responsabile fallisce. Con workers <= 1 tutto gira in questo processo.
+    """
+    pairs = pairs or CRYPTO_PAIRS
+    results = {}
+
+    def name(symbol, strategy_type):
+        return symbol if len(strategies) == 1 else f"{symbol} [{strategy_type}]"
+
+    def collect(outcome):
+        results[name(outcome['symbol'], outcome['strategy'])] = outcome['result']
+        if outcome['error']:
+            print(f"❌ {outcome['symbol']} ({outcome['strategy']}): {outcome['error']}")
+        if on_result is not None:
+            on_result(outcome)
+
+    if workers <= 1:
+        for symbol in pairs:
+            df, error = load_pair(symbol, years, provider, interval)
+            for strategy_type in strategies:
+                collect(run_pair((symbol, strategy_type, df, initial_balance, interval)) if df is not None
+                        else _failed(symbol, strategy_type, error))
+    else:
+        lost = []
+        with ProcessPoolExecutor(max_workers=min(workers, len(pairs) * len(strategies))) as executor:
+            futures = {}
+            for symbol in pairs:
+                df, error = load_pair(symbol, years, provider, interval)
+                for strategy_type in strategies:
+                    if df is None:
+                        collect(_failed(symbol, strategy_type, error))
+                        continue
+                    task = (symbol, strategy_type, df, initial_balance, interval)
+                    try:
+                        futures[executor.submit(run_pair, task)] = task
+                    except BrokenProcessPool:
+                        lost.append(task)
+                _drain(futures, collect, lost)
+            _drain(futures, collect, lost, wait=True)
+        for task in lost:
+            retry = []
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                _drain({executor.submit(run_pair, task): task}, collect, retry, wait=True)
+            if retry:
+                collect(_failed(task[0], task[1], "processo terminato in modo anomalo"))
+
+    # Stesso ordine delle coppie richieste, non di completamento
+    return {name(symbol, strategy_type): results.get(name(symbol, strategy_type))
+            for symbol in pairs for strategy_type in strategies}
+
 def analyze_results(results):
     """Analizza e stampa risultati"""
     print("\n" + "="*60)
@@ -278,35 +549,40 @@ def analyze_results(results):
     else:
         print("❌ Nessuna coppia profittevole trovata - strategia da migliorare")
 
-def main():
+def main(provider=None, workers=BACKTEST_WORKERS, interval="1d"):
     """Funzione principale"""
     print("🚀 BACKTESTING COMPARATIVO 7 ANNI")
     print(f"💰 Capitale iniziale: {INITIAL_BALANCE}€")
-    print(f"📊 Coppie testate: {', '.join(CRYPTO_PAIRS)}")
+    print(f"📊 Coppie testate: {', '.join(CRYPTO_PAIRS)} | Candele {interval}")
     print("⏳ Questo potrebbe richiedere alcuni minuti...")
     
-    results = {}
+    # Equity per barra e log dei trade su disco, una coppia alla volta
+    writer = results_store.ResultsWriter(results_store.new_run_dir("backtest"),
+                                         info={'initial_balance': INITIAL_BALANCE, 'pairs': CRYPTO_PAIRS,
+                                               'interval': interval})
     
-    for symbol in CRYPTO_PAIRS:
-        try:
-            # Scarica dati
-            df = download_historical_data(symbol, years=7)
-            if df is None or len(df) < 100:
-                print(f"❌ Dati insufficienti per {symbol}")
-                results[symbol] = None
-                continue
-            
-            # Esegui backtest
-            result = run_backtest(df, INITIAL_BALANCE, "improved")
-            results[symbol] = result
-            
-        except Exception as e:
-            print(f"❌ Errore con {symbol}: {e}")
-            results[symbol] = None
+    def save(outcome):
+        # Coppie in parallelo: ogni risultato è salvato appena arriva
+        if outcome['result']:
+            symbol = outcome['symbol']
+            writer.write_equity(symbol, *outcome['equity'])
+            writer.write_trades(symbol, outcome['result']['trades'])
+            print(f"✅ {symbol}: backtest completato in {outcome['elapsed']:.1f}s")
+    
+    results = run_pairs(CRYPTO_PAIRS, years=7, workers=workers, provider=provider, on_result=save,
+                        interval=interval)
     
     # Analizza risultati
     analyze_results(results)
     
+    # Robustezza: quanto variano ritorno e drawdown rimescolando i trade
+    print("\n🎲 MONTE CARLO")
+    monte_carlo_results = {}
+    for symbol, result in results.items():
+        if result:
+            monte_carlo_results[symbol] = montecarlo.analyze_backtest(result)
+            montecarlo.print_monte_carlo(symbol, monte_carlo_results[symbol])
+    
     # Salva risultati dettagliati
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"backtest_results_{timestamp}.json"
@@ -319,11 +595,25 @@ def main():
                 k: v for k, v in result.items() 
                 if k not in ['trades', 'equity_curve']  # Escludi dati grandi
             }
+            if monte_carlo_results.get(symbol):
+                json_results[symbol]['monte_carlo'] = {
+                    k: v for k, v in monte_carlo_results[symbol].items() if k != 'bands'
+                }
     
     with open(filename, 'w') as f:
         json.dump(json_results, f, indent=2, default=str)
     
     print(f"\n💾 Risultati salvati in: {filename}")
+    print(f"💾 Equity per barra e trade in: {writer.root}")
+
+# ==================== CLI ====================
+def main_cli():
+    parser = argparse.ArgumentParser(description="Backtest comparativo di tutte le coppie")
+    parser.add_argument('--interval', default="1d", choices=list(INTERVAL_MS),
+                        help="Candele del backtest (fuori da 1d ricampionate dalla serie 1m)")
+    parser.add_argument('--workers', type=int, default=BACKTEST_WORKERS)
+    args = parser.parse_args()
+    main(workers=args.workers, interval=args.interval)
 
 if __name__ == "__main__":
-    main()
+    main_cli()
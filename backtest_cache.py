@@ -0,0 +1,151 @@
+import os
+import json
+import pickle
+import inspect
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from candle_store import STORE_DIR
+
+# ==================== CONFIGURAZIONE ====================
+RESULT_CACHE_DIR = os.getenv(
+    'BACKTEST_CACHE_DIR',
+    os.path.join(os.path.dirname(STORE_DIR), 'backtest_cache')
+)
+RESULT_CACHE_MB = float(os.getenv('BACKTEST_CACHE_MB', 256))   # 0 = cache disattivata
+
+# ==================== CHIAVI ====================
+def _update(digest, value):
+    """Aggiunge un valore all'impronta: array e serie per contenuto, il resto come JSON ordinato"""
+    if isinstance(value, (pd.Series, pd.Index)):
+        value = value.values
+    if isinstance(value, np.ndarray):
+        if np.issubdtype(value.dtype, np.datetime64):
+            value = value.astype('datetime64[ms]').astype(np.int64)
+        value = np.ascontiguousarray(value)
+        digest.update(f"{value.dtype.str}{value.shape}".encode())
+        digest.update(value.tobytes())
+    else:
+        digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+
+def content_key(*parts):
+    """Hash SHA-1 del contenuto di tutte le parti: stessi input, stessa chiave"""
+    digest = hashlib.sha1()
+    for part in parts:
+        _update(digest, part)
+    return digest.hexdigest()
+
+def code_fingerprint(*functions):
+    """Impronta del sorgente di funzioni (o moduli): cambiare la strategia invalida i suoi risultati"""
+    return content_key(*(inspect.getsource(func) for func in functions))
+
+# ==================== CACHE SU DISCO ====================
+class ResultCache:
+    """Risultati di backtest su disco, un file pickle per chiave di contenuto.
+
+    La chiave è l'hash degli input, quindi nessuna voce va mai invalidata a
+    mano: input diversi cadono su file diversi e le voci non più usate
+    escono per LRU. L'ordine LRU è la data di modifica del file, aggiornata
+    a ogni lettura; dopo ogni scrittura si eliminano i file più vecchi
+    finché il totale sta sotto max_bytes. Le scritture sono atomiche, quindi
+    più processi possono condividere la stessa cartella.
+    """
+
+    def __init__(self, root=RESULT_CACHE_DIR, max_mb=RESULT_CACHE_MB):
+        self.root = root
+        self.max_bytes = int(max_mb * 1024 ** 2)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.pkl")
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except Exception:
+            # Voce troncata o scritta da codice vecchio (classi spostate, formati cambiati): miss e via
+            self._remove(path)
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.put_many({key: value})
+
+    def put_many(self, items):
+        """Scrive più voci {chiave: valore} con un solo controllo di dimensione alla fine"""
+        if not self.enabled or not items:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        for key, value in items.items():
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        self.evict()
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def entries(self):
+        """[(ultimo uso, byte, percorso)] dal meno recente"""
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for entry in os.scandir(self.root):
+            if not entry.name.endswith('.pkl'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def evict(self):
+        """Elimina le voci meno usate di recente oltre max_bytes"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self._remove(path)
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self.entries())
+
+BACKTEST_CACHE = ResultCache()
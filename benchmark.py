@@ -0,0 +1,295 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+import backtest
+import main as bot
+from candle_store import INTERVAL_MS
+
+# ==================== CONFIGURAZIONE BENCHMARK ====================
+BENCH_SIZES = (1_000, 100_000, 10_000_000)
+BENCH_SEED = 42
+BENCH_INTERVAL = '1m'        # Passo dei timestamp sintetici: 10M barre giornaliere uscirebbero dal calendario pandas
+BENCH_MIN_TIME = 1.0         # Secondi minimi di misura per caso (ripetizioni, si tiene il migliore)
+BENCH_MAX_REPEATS = 5
+BENCH_TIMEOUT = int(os.getenv('BENCH_TIMEOUT', 600))   # Secondi per caso prima di interromperlo
+REGRESSION_TOLERANCE = 0.25  # Peggioramento ammesso rispetto al baseline (throughput e memoria)
+BASELINE_PATH = os.getenv(
+    'BENCH_BASELINES',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baselines.json')
+)
+
+# Regimi di mercato: (drift, volatilità) per barra e probabilità di cambiare regime a ogni barra
+REGIMES = ((0.00002, 0.0015), (-0.00003, 0.004), (0.0, 0.0008))
+REGIME_SWITCH = 0.001
+JUMP_RATE = 0.0005           # Probabilità di un salto per barra
+JUMP_SIZE = 0.03             # Deviazione standard del salto (log-ritorno)
+
+# ==================== DATI SINTETICI ====================
+def synthetic_ohlcv(bars, seed=BENCH_SEED, start_price=100.0, interval=BENCH_INTERVAL, start='2017-01-01'):
+    """Candele OHLCV riproducibili: moto browniano geometrico con salti e cambi di regime.
+
+    Il regime (drift e volatilità) è una catena di Markov: a ogni barra
+    cambia con probabilità REGIME_SWITCH. I salti arrivano con probabilità
+    JUMP_RATE e si sommano al log-ritorno. High e low si allargano oltre
+    open/close di una frazione della volatilità del regime; il volume cresce
+    con il movimento della barra. Stesso seed, stesse candele.
+    """
+    rng = np.random.default_rng(seed)
+    drift, vol = (np.array(values) for values in zip(*REGIMES))
+
+    # Regime di ogni barra: cumulata dei cambi, modulo il numero di regimi
+    switches = rng.random(bars) < REGIME_SWITCH
+    regime = (np.cumsum(switches * rng.integers(1, len(REGIMES), bars)) % len(REGIMES))
+    sigma = vol[regime]
+
+    returns = drift[regime] - sigma ** 2 / 2 + sigma * rng.standard_normal(bars)
+    jumps = rng.random(bars) < JUMP_RATE
+    returns[jumps] += JUMP_SIZE * rng.standard_normal(int(jumps.sum()))
+
+    close = start_price * np.exp(np.cumsum(returns))
+    open_ = np.r_[start_price, close[:-1]]
+    wick = sigma * np.abs(rng.standard_normal((2, bars)))
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    volume = rng.lognormal(3, 0.5, bars) * (1 + np.abs(returns) / sigma)
+
+    return pd.DataFrame({
+        'timestamp': pd.Timestamp(start) + pd.to_timedelta(np.arange(bars) * INTERVAL_MS[interval], unit='ms'),
+        'open': open_,
+        'high': high,
+        'low': low,
+        'close': close,
+        'volume': volume,
+    })
+
+# ==================== CASI ====================
+def _prepare_indicators(df):
+    return (df,)
+
+def _prepare_improved(df):
+    prices = df['close'].to_numpy(dtype=float)
+    return prices, backtest.calculate_rsi(prices).to_numpy()
+
+def _prepare_optimized(df):
+    return (bot.calculate_advanced_indicators(df).dropna().reset_index(drop=True),)
+
+def _prepare_backtest(df):
+    return (df,)
+
+def _run_backtest_uncached(df):
+    # Senza cache dei risultati: dalla seconda ripetizione si misurerebbe la lettura da disco
+    return backtest.run_backtest(df, cache=None)
+
+# Nome -> (preparazione non misurata, funzione misurata). improved_strategy e
+# optimized_ml_strategy valutano l'ultima barra: sulla storia intera si misurano
+# le versioni vettoriali equivalenti usate dal backtest
+CASES = {
+    'calculate_advanced_indicators': (_prepare_indicators, bot.calculate_advanced_indicators),
+    'improved_strategy': (_prepare_improved, backtest.improved_signals),
+    'optimized_ml_strategy': (_prepare_optimized, bot.optimized_ml_scores),
+    'optimized_ml_live': (_prepare_optimized, bot.optimized_ml_strategy),
+    'run_backtest': (_prepare_backtest, _run_backtest_uncached),
+}
+
+def measure(func, args, bars, min_time=BENCH_MIN_TIME, max_repeats=BENCH_MAX_REPEATS):
+    """Tempo migliore su più ripetizioni, poi un'esecuzione con tracemalloc per il picco di memoria.
+
+    Il tracciamento rallenta le allocazioni, quindi tempo e memoria sono
+    misurati in esecuzioni separate.
+    """
+    times = []
+    started = time.perf_counter()
+    while not times or (len(times) < max_repeats and time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    wall = min(times)
+    return {
+        'wall_time': wall,
+        'bars_per_sec': bars / wall if wall > 0 else float('inf'),
+        'peak_memory_mb': peak / 1024 ** 2,
+        'repeats': len(times),
+    }
+
+def _run_case(name, bars, seed, conn):
+    """Processo figlio: dati, preparazione e misura di un caso (memoria e cache isolate)"""
+    try:
+        prepare, func = CASES[name]
+        args = prepare(synthetic_ohlcv(bars, seed))
+        result = measure(func, args, bars)
+        result['status'] = 'ok'
+    except Exception as e:
+        result = {'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+    conn.send(result)
+    conn.close()
+
+def run_case(name, bars, seed=BENCH_SEED, timeout=BENCH_TIMEOUT):
+    """Esegue un caso in un processo separato; oltre `timeout` secondi è interrotto"""
+    ctx = mp.get_context()
+    receiver, sender = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_run_case, args=(name, bars, seed, sender), daemon=True)
+    process.start()
+    sender.close()
+    if receiver.poll(timeout):
+        try:
+            result = receiver.recv()
+        except EOFError:
+            result = {'status': 'error', 'error': f"processo terminato (exit code {process.exitcode})"}
+    else:
+        process.terminate()
+        result = {'status': 'timeout', 'error': f"oltre {timeout}s"}
+    process.join()
+    return result
+
+def run_benchmarks(names=None, sizes=BENCH_SIZES, seed=BENCH_SEED, timeout=BENCH_TIMEOUT):
+    """{caso@barre: risultato} per ogni caso e dimensione"""
+    results = {}
+    for name in names or CASES:
+        for bars in sizes:
+            key = f"{name}@{bars}"
+            print(f"⏳ {key}...", flush=True)
+            results[key] = run_case(name, bars, seed, timeout)
+            print_result(key, results[key])
+    return results
+
+# ==================== BASELINE ====================
+def machine_info():
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+def load_baselines(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_baselines(results, seed=BENCH_SEED, path=BASELINE_PATH):
+    """Salva i risultati riusciti come nuovo riferimento (i casi non eseguiti restano invariati).
+
+    Con un seed diverso i vecchi risultati vengono scartati: misurano altri dati.
+    """
+    baselines = load_baselines(path)
+    if baselines is None or baselines.get('seed') != seed:
+        baselines = {'results': {}}
+    baselines['machine'] = machine_info()
+    baselines['seed'] = seed
+    baselines['saved_at'] = pd.Timestamp.now().isoformat()
+    baselines['results'].update({key: result for key, result in results.items() if result['status'] == 'ok'})
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(baselines, f, indent=2)
+    os.replace(tmp_path, path)
+
+def compare(results, baselines, tolerance=REGRESSION_TOLERANCE):
+    """Regressioni rispetto al baseline: [(caso, motivo)].
+
+    Un caso regredisce se il throughput scende o il picco di memoria sale
+    oltre la tolleranza, oppure se fallisce (errore o timeout) dove il
+    baseline era riuscito. I casi senza baseline non sono confrontati.
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baselines['results'].get(key)
+        if base is None:
+            continue
+        if result['status'] != 'ok':
+            regressions.append((key, f"{result['status']}: {result.get('error', '')}"))
+            continue
+        if result['bars_per_sec'] < base['bars_per_sec'] * (1 - tolerance):
+            regressions.append((key, f"throughput {result['bars_per_sec']:,.0f} barre/s "
+                                     f"(baseline {base['bars_per_sec']:,.0f})"))
+        if result['peak_memory_mb'] > base['peak_memory_mb'] * (1 + tolerance):
+            regressions.append((key, f"memoria {result['peak_memory_mb']:.1f} MB "
+                                     f"(baseline {base['peak_memory_mb']:.1f} MB)"))
+    return regressions
+
+def missing_baselines(results, baselines):
+    """Casi eseguiti che il baseline non copre (mai salvati o falliti quando è stato registrato)"""
+    return [key for key in results if key not in baselines['results']]
+
+# ==================== REPORT ====================
+def print_result(key, result):
+    if result['status'] != 'ok':
+        print(f"   ❌ {key}: {result['status']} ({result.get('error', '')})")
+        return
+    print(f"   ✅ {key}: {result['bars_per_sec']:,.0f} barre/s | {result['wall_time'] * 1000:.1f} ms | "
+          f"picco {result['peak_memory_mb']:.1f} MB ({result['repeats']} ripetizioni)")
+
+# ==================== CLI ====================
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark di backtest e strategie su dati sintetici")
+    parser.add_argument('cases', nargs='*', help=f"Casi da eseguire (default: tutti): {', '.join(CASES)}")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(BENCH_SIZES))
+    parser.add_argument('--seed', type=int, default=BENCH_SEED)
+    parser.add_argument('--timeout', type=int, default=BENCH_TIMEOUT, help="Secondi massimi per caso")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument('--baselines', default=BASELINE_PATH)
+    parser.add_argument('--save', action='store_true', help="Salva i risultati come nuovo baseline")
+    args = parser.parse_args()
+    unknown = [name for name in args.cases if name not in CASES]
+    if unknown:
+        parser.error(f"casi sconosciuti: {', '.join(unknown)}")
+
+    baselines = None if args.save else load_baselines(args.baselines)
+    if baselines is not None and baselines.get('seed') != args.seed:
+        # Dati sintetici diversi: throughput e memoria non sono confrontabili
+        print(f"❌ Baseline registrato con seed {baselines.get('seed')}, richiesto {args.seed}: "
+              f"usa lo stesso seed o salva un nuovo baseline con --save")
+        return 1
+
+    same_machine = baselines is None or baselines.get('machine') == machine_info()
+    if not same_machine:
+        # Tempi di un'altra CPU o di altre versioni di numpy/pandas: si misura ma non si confronta
+        print("⚠️ Baseline registrato su un'altra macchina o con altre versioni: "
+              "il confronto sarà saltato (salva un baseline locale con --save)")
+
+    print(f"🏁 BENCHMARK SINTETICO (seed {args.seed}, barre: {', '.join(f'{n:,}' for n in args.sizes)})")
+    results = run_benchmarks(args.cases or None, args.sizes, args.seed, args.timeout)
+
+    if args.save:
+        save_baselines(results, args.seed, args.baselines)
+        print(f"\n💾 Baseline salvato in: {args.baselines}")
+        return 0
+
+    if baselines is None:
+        print(f"\n⚠️ Nessun baseline in {args.baselines}: esegui con --save per crearlo")
+        return 0
+    if not same_machine:
+        print("\n⚠️ Confronto saltato: baseline di un'altra macchina")
+        return 0
+
+    missing = missing_baselines(results, baselines)
+    if missing:
+        print(f"\n⚪ {len(missing)} casi senza baseline (non confrontati): {', '.join(missing)}")
+    regressions = compare(results, baselines, args.tolerance)
+    if regressions:
+        print(f"\n🔴 {len(regressions)} REGRESSIONI (tolleranza {args.tolerance:.0%})")
+        for key, reason in regressions:
+            print(f"   {key}: {reason}")
+        return 1
+    print(f"\n🟢 Nessuna regressione rispetto al baseline (tolleranza {args.tolerance:.0%})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
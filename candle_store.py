@@ -0,0 +1,301 @@
+import os
+import json
+import threading
+import time
+import numpy as np
+from exchange_client import CLIENT
+import klines
+
+# ==================== CONFIGURAZIONE STORE ====================
+KLINES_PATH = "/api/v3/klines"
+STORE_DIR = os.getenv(
+    'CANDLE_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'candles')
+)
+
+# Colonne salvate su disco (una riga dell'array per colonna)
+COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time']
+OPEN_TIME, CLOSE_TIME = 0, 6
+
+KLINES_PAGE_LIMIT = 1000     # Massimo Binance per richiesta
+MIN_CAPACITY = 1024          # Righe pre-allocate nel file
+
+INTERVAL_MS = {
+    '1m': 60_000,
+    '3m': 3 * 60_000,
+    '5m': 5 * 60_000,
+    '15m': 15 * 60_000,
+    '30m': 30 * 60_000,
+    '1h': 3_600_000,
+    '2h': 2 * 3_600_000,
+    '4h': 4 * 3_600_000,
+    '6h': 6 * 3_600_000,
+    '8h': 8 * 3_600_000,
+    '12h': 12 * 3_600_000,
+    '1d': 86_400_000,
+    '3d': 3 * 86_400_000,
+    '1w': 7 * 86_400_000,
+}
+
+def now_ms():
+    """Timestamp corrente in millisecondi"""
+    return int(time.time() * 1000)
+
+def fetch_klines(symbol, interval, start_time=None, end_time=None, limit=KLINES_PAGE_LIMIT):
+    """Scarica una pagina di klines da Binance"""
+    params = {"symbol": symbol, "interval": interval, "limit": limit}
+    if start_time is not None:
+        params["startTime"] = int(start_time)
+    if end_time is not None:
+        params["endTime"] = int(end_time)
+
+    data = CLIENT.get(KLINES_PATH, params=params)
+
+    # Binance risponde con un dict in caso di errore
+    if isinstance(data, dict):
+        raise ValueError(f"Binance klines {symbol}: {data.get('msg', data)}")
+    return data
+
+def decode_klines(data):
+    """Converte il payload klines in array colonnare float64 (colonne × righe)"""
+    if not data:
+        return np.empty((len(COLUMNS), 0), dtype=np.float64)
+    columns = klines.decode(data, COLUMNS)
+    return np.vstack([columns[name] for name in COLUMNS]).astype(np.float64, copy=False)
+
+def to_dataframe(block, fields=None, dtype=np.float64):
+    """Converte un blocco colonnare nel DataFrame usato dalle strategie.
+
+    Tiene solo i campi richiesti; prezzi e volumi in `dtype` (float64 o float32).
+    """
+    columns = {}
+    for name in fields or COLUMNS:
+        row = np.asarray(block[COLUMNS.index(name)])
+        if name in klines.INT_FIELDS:
+            columns[name] = row.astype(np.int64)
+        else:
+            columns[name] = row.astype(dtype, copy=False)
+    return klines.to_frame(columns)
+
+# ==================== STORE COLONNARE ====================
+class CandleStore:
+    """Archivio locale di candele: un file .npy memory-mappabile per simbolo e intervallo.
+
+    Il file contiene un array float64 di forma (colonne, capacità): ogni colonna
+    è contigua su disco e le nuove candele vengono scritte in coda senza
+    riscrivere lo storico. Il file .json accanto registra righe valide e
+    inizio della copertura richiesta.
+    Sono salvate solo candele chiuse; la candela in corso viene scaricata a
+    ogni richiesta che la vuole e non finisce mai su disco.
+    """
+
+    def __init__(self, root=STORE_DIR, fetch=fetch_klines):
+        self.root = root
+        self.fetch = fetch
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    # ---------- file e metadati ----------
+    def _paths(self, symbol, interval):
+        base = os.path.join(self.root, f"{symbol.upper()}_{interval}")
+        return base + '.npy', base + '.json'
+
+    def _lock(self, symbol, interval):
+        key = (symbol.upper(), interval)
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.RLock()
+            return self._locks[key]
+
+    def _read_meta(self, symbol, interval):
+        data_path, meta_path = self._paths(symbol, interval)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return {'rows': 0, 'since': None}
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def _write_meta(self, symbol, interval, meta):
+        _, meta_path = self._paths(symbol, interval)
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def _write_full(self, symbol, interval, block, meta):
+        """Riscrive il file da zero (prima scrittura, backfill in testa, crescita)"""
+        os.makedirs(self.root, exist_ok=True)
+        data_path, _ = self._paths(symbol, interval)
+        rows = block.shape[1]
+        capacity = max(MIN_CAPACITY, 2 * rows)
+
+        tmp_path = data_path + '.tmp.npy'
+        mm = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float64,
+                                       shape=(len(COLUMNS), capacity))
+        mm[:, :rows] = block
+        mm[:, rows:] = np.nan
+        mm.flush()
+        del mm
+        os.replace(tmp_path, data_path)
+
+        meta['rows'] = rows
+        self._write_meta(symbol, interval, meta)
+
+    def _append(self, symbol, interval, block, meta):
+        """Aggiunge candele in coda scrivendo solo le nuove righe"""
+        if block.shape[1] == 0:
+            return
+        rows = meta['rows']
+        if rows == 0:
+            self._write_full(symbol, interval, block, meta)
+            return
+
+        data_path, _ = self._paths(symbol, interval)
+        mm = np.load(data_path, mmap_mode='r+')
+        if rows + block.shape[1] > mm.shape[1]:
+            merged = np.concatenate([np.asarray(mm[:, :rows]), block], axis=1)
+            del mm
+            self._write_full(symbol, interval, merged, meta)
+            return
+
+        mm[:, rows:rows + block.shape[1]] = block
+        mm.flush()
+        del mm
+        meta['rows'] = rows + block.shape[1]
+        self._write_meta(symbol, interval, meta)
+
+    def append_closed(self, symbol, interval, block):
+        """Aggiunge candele chiuse arrivate dallo stream (solo se contigue allo storico).
+
+        Se tra l'ultima candela salvata e quelle nuove c'è un buco, le candele
+        vengono ignorate: il prossimo sync REST riempie il buco in ordine.
+        Ritorna il numero di candele scritte.
+        """
+        with self._lock(symbol, interval):
+            meta = self._read_meta(symbol, interval)
+            if meta['rows'] == 0:
+                return 0
+            stored = self.load(symbol, interval)
+            last_close = int(stored[CLOSE_TIME, -1])
+            block = block[:, block[OPEN_TIME] > last_close]
+            if block.shape[1] == 0 or int(block[OPEN_TIME, 0]) != last_close + 1:
+                return 0
+            self._append(symbol, interval, block, meta)
+            return block.shape[1]
+
+    def coverage(self, symbol, interval):
+        """(inizio copertura richiesta, prima apertura, ultima chiusura, righe)"""
+        meta = self._read_meta(symbol, interval)
+        stored = self.load(symbol, interval)
+        if meta['rows'] == 0:
+            return meta['since'], None, None, 0
+        return meta['since'], int(stored[OPEN_TIME, 0]), int(stored[CLOSE_TIME, -1]), meta['rows']
+
+    def merge_history(self, symbol, interval, block, since=None):
+        """Fonde un blocco scaricato a parte (es. backfill) con lo storico salvato.
+
+        Righe duplicate per timestamp vengono scartate tenendo quelle salvate.
+        """
+        with self._lock(symbol, interval):
+            meta = self._read_meta(symbol, interval)
+            stored = np.asarray(self.load(symbol, interval))
+            merged = np.concatenate([stored, block], axis=1)
+            _, first = np.unique(merged[OPEN_TIME], return_index=True)
+            merged = merged[:, first]
+            if since is not None and (meta['since'] is None or since < meta['since']):
+                meta['since'] = int(since)
+            if merged.shape[1]:
+                self._write_full(symbol, interval, merged, meta)
+            else:
+                self._write_meta(symbol, interval, meta)
+            return merged.shape[1]
+
+    def load(self, symbol, interval):
+        """Candele chiuse salvate, come vista memory-mapped (colonne × righe)"""
+        meta = self._read_meta(symbol, interval)
+        if meta['rows'] == 0:
+            return np.empty((len(COLUMNS), 0), dtype=np.float64)
+        data_path, _ = self._paths(symbol, interval)
+        return np.load(data_path, mmap_mode='r')[:, :meta['rows']]
+
+    # ---------- sincronizzazione ----------
+    def fetch_range(self, symbol, interval, start_time, end_time=None):
+        """Scarica tutte le candele in [start_time, end_time] pagina per pagina (senza salvarle)"""
+        blocks = []
+        cursor = start_time
+        while True:
+            page = self.fetch(symbol, interval, start_time=cursor, end_time=end_time,
+                              limit=KLINES_PAGE_LIMIT)
+            if not page:
+                break
+            block = decode_klines(page)
+            blocks.append(block)
+            cursor = int(block[CLOSE_TIME, -1]) + 1
+            if len(page) < KLINES_PAGE_LIMIT or (end_time is not None and cursor > end_time):
+                break
+        if not blocks:
+            return decode_klines([])
+        return np.concatenate(blocks, axis=1)
+
+    def sync(self, symbol, interval='1d', start_time=None, include_live=True):
+        """Allinea lo store con l'exchange scaricando solo le candele mancanti.
+
+        Ritorna la candela in corso (blocco colonnare) se richiesta, altrimenti
+        un blocco vuoto.
+        """
+        step = INTERVAL_MS[interval]
+        with self._lock(symbol, interval):
+            now = now_ms()
+            meta = self._read_meta(symbol, interval)
+            stored = self.load(symbol, interval)
+
+            # Backfill in testa: solo se si chiede più storia di quella già coperta
+            if start_time is not None and (meta['since'] is None or start_time < meta['since']):
+                head_end = int(stored[OPEN_TIME, 0]) - 1 if meta['rows'] else now
+                head = self.fetch_range(symbol, interval, start_time, head_end)
+                head = head[:, head[CLOSE_TIME] < now]
+                meta['since'] = int(start_time)
+                if meta['rows']:
+                    merged = np.concatenate([head, np.asarray(stored)], axis=1)
+                    self._write_full(symbol, interval, merged, meta)
+                elif head.shape[1]:
+                    self._write_full(symbol, interval, head, meta)
+                else:
+                    self._write_meta(symbol, interval, meta)
+                stored = self.load(symbol, interval)
+
+            if stored.shape[1] == 0:
+                # Nessuno storico e nessun inizio richiesto: solo la candela live
+                if not include_live:
+                    return decode_klines([])
+                tail = decode_klines(self.fetch(symbol, interval, limit=1))
+                return tail[:, tail[CLOSE_TIME] >= now]
+
+            # Coda: candele chiuse dopo l'ultima salvata (+ eventuale candela live)
+            last_close = int(stored[CLOSE_TIME, -1])
+            if not include_live and last_close + step >= now:
+                return decode_klines([])
+            tail = self.fetch_range(symbol, interval, last_close + 1)
+            closed = tail[CLOSE_TIME] < now
+            self._append(symbol, interval, tail[:, closed], meta)
+            if include_live:
+                return tail[:, ~closed]
+            return decode_klines([])
+
+    def get_klines(self, symbol, interval='1d', limit=None, start_time=None, include_live=True,
+                   fields=None, dtype=np.float64):
+        """Candele come DataFrame, leggendo dallo store e scaricando solo il mancante"""
+        if start_time is None and limit is not None:
+            # Una candela di margine: quella più vecchia può aprire prima di start_time
+            start_time = now_ms() - (limit + 1) * INTERVAL_MS[interval]
+        live = self.sync(symbol, interval, start_time=start_time, include_live=include_live)
+
+        stored = self.load(symbol, interval)
+        if start_time is not None:
+            first = np.searchsorted(stored[OPEN_TIME], start_time)
+            stored = stored[:, first:]
+        block = np.concatenate([np.asarray(stored), live], axis=1)
+        if limit is not None:
+            block = block[:, -limit:]
+        return to_dataframe(block, fields, dtype)
+
+STORE = CandleStore()
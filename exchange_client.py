@@ -0,0 +1,116 @@
+import os
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+# ==================== CONFIGURAZIONE CLIENT ====================
+BINANCE_API_URL = "https://api.binance.com"
+
+# Timeout (secondi) per endpoint: le klines pesano più del ticker
+ENDPOINT_TIMEOUTS = {
+    '/api/v3/klines': 15,
+    '/api/v3/ticker/price': 10,
+}
+DEFAULT_TIMEOUT = 10
+
+POOL_SIZE = int(os.getenv('EXCHANGE_POOL_SIZE', 10))
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5           # Secondi, raddoppia a ogni tentativo
+BACKOFF_MAX = 30
+
+# Limite di peso Binance per minuto (header X-MBX-USED-WEIGHT-1M)
+WEIGHT_LIMIT_1M = int(os.getenv('BINANCE_WEIGHT_LIMIT', 6000))
+WEIGHT_SAFETY = 0.8          # Rallenta oltre l'80% del limite
+WEIGHT_HEADER = 'X-MBX-USED-WEIGHT-1M'
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# ==================== CLIENT CONDIVISO ====================
+class ExchangeClient:
+    """Client HTTP unico verso Binance.
+
+    Usa una Session con pool di connessioni keep-alive (niente handshake
+    TCP+TLS a ogni chiamata), timeout per endpoint, retry con backoff
+    esponenziale e jitter, e tiene traccia del peso usato nel minuto per
+    fermarsi prima del ban.
+    """
+
+    def __init__(self, base_url=BINANCE_API_URL, pool_size=POOL_SIZE, max_retries=MAX_RETRIES,
+                 weight_limit=WEIGHT_LIMIT_1M):
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.weight_limit = weight_limit
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.used_weight = 0
+        self._weight_minute = 0
+        self._lock = threading.Lock()
+
+    # ---------- peso / rate limit ----------
+    def _record_weight(self, response):
+        used = response.headers.get(WEIGHT_HEADER)
+        if used is None:
+            return
+        with self._lock:
+            self.used_weight = int(used)
+            self._weight_minute = int(time.time() // 60)
+
+    def weight_remaining(self):
+        """Peso ancora disponibile nel minuto corrente"""
+        with self._lock:
+            if int(time.time() // 60) != self._weight_minute:
+                return self.weight_limit
+            return max(0, self.weight_limit - self.used_weight)
+
+    def throttle(self):
+        """Attende il prossimo minuto se il peso usato supera la soglia di sicurezza"""
+        with self._lock:
+            minute = int(time.time() // 60)
+            over = (minute == self._weight_minute and
+                    self.used_weight >= self.weight_limit * WEIGHT_SAFETY)
+        if over:
+            wait = 60 - time.time() % 60
+            print(f"⏳ Peso API {self.used_weight}/{self.weight_limit}: pausa {wait:.0f}s")
+            time.sleep(wait)
+
+    def _backoff(self, attempt):
+        """Backoff esponenziale con jitter completo"""
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    # ---------- richieste ----------
+    def get(self, path, params=None, timeout=None):
+        """GET su un endpoint pubblico, ritorna il JSON decodificato"""
+        url = self.base_url + path
+        timeout = timeout or ENDPOINT_TIMEOUTS.get(path, DEFAULT_TIMEOUT)
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            self.throttle()
+            try:
+                response = self.session.get(url, params=params, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+            else:
+                self._record_weight(response)
+                if response.status_code == 418:
+                    # IP bannato: riprovare peggiora solo la situazione
+                    raise requests.HTTPError(f"Binance ban IP (418) su {path}", response=response)
+                if response.status_code not in RETRY_STATUS:
+                    return response.json()
+                last_error = requests.HTTPError(f"HTTP {response.status_code} su {path}", response=response)
+                retry_after = response.headers.get('Retry-After')
+                if retry_after is not None and attempt < self.max_retries:
+                    time.sleep(float(retry_after))
+                    continue
+
+            if attempt < self.max_retries:
+                time.sleep(self._backoff(attempt))
+
+        raise last_error
+
+CLIENT = ExchangeClient()
@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from indicators import RSI_MIN_LOSS
+
+# ==================== OPERAZIONI SU PANNELLO (simboli × tempo) ====================
+def _pad_left(values, width):
+    """Riporta un risultato a finestra alla lunghezza originale con NaN iniziali"""
+    pad = np.full(values.shape[:-1] + (width,), np.nan)
+    return np.concatenate([pad, values], axis=-1)
+
+def rolling_mean(x, window):
+    """Media mobile lungo il tempo (NaN finché la finestra non è piena, come pandas)"""
+    if x.shape[-1] < window:
+        return np.full(x.shape, np.nan)
+    return _pad_left(sliding_window_view(x, window, axis=-1).mean(axis=-1), window - 1)
+
+def rolling_std(x, window):
+    """Deviazione standard mobile campionaria (ddof=1, come pandas)"""
+    if x.shape[-1] < window:
+        return np.full(x.shape, np.nan)
+    return _pad_left(sliding_window_view(x, window, axis=-1).std(axis=-1, ddof=1), window - 1)
+
+def shift(x, periods):
+    """Sposta in avanti di `periods` barre (NaN in testa)"""
+    out = np.full(x.shape, np.nan)
+    out[..., periods:] = x[..., :-periods]
+    return out
+
+def pct_change(x, periods):
+    return x / shift(x, periods) - 1
+
+def ewm_mean(x, span):
+    """Media esponenziale adjust=True come pandas ewm(span).mean(), su tutti i simboli insieme.
+
+    Un solo passaggio compilato lungo il tempo (una colonna per simbolo):
+    nessun ciclo Python per barra.
+    """
+    values = np.atleast_2d(x)
+    out = pd.DataFrame(values.T).ewm(span=span).mean().to_numpy().T
+    return out.reshape(x.shape)
+
+def rsi(x, period=14):
+    """RSI come indicators.rsi (delta iniziale contato come 0)"""
+    deltas = np.diff(x, axis=-1, prepend=np.nan)
+    gains = np.where(deltas > 0, deltas, 0.0)
+    losses = np.where(deltas < 0, -deltas, 0.0)
+    # Prima della quotazione (prezzo NaN) la finestra non deve riempirsi di zeri
+    listed = ~np.isnan(x)
+    gains = np.where(listed, gains, np.nan)
+    losses = np.where(listed, losses, np.nan)
+    avg_gains = rolling_mean(gains, period)
+    avg_losses = rolling_mean(losses, period)
+    avg_losses = np.where(avg_losses != 0, avg_losses, RSI_MIN_LOSS)
+    return 100 - (100 / (1 + avg_gains / avg_losses))
+
+def _compact(x, present):
+    """Candele presenti di ogni simbolo allineate a destra, NaN in testa.
+
+    Ritorna l'array compatto (simboli × candele del simbolo più lungo) e,
+    per ogni cella di x, riga e colonna compatte: le finestre scorrono sulle
+    candele del simbolo, non sull'asse comune con i suoi buchi.
+    """
+    counts = present.sum(axis=-1)
+    width = int(counts.max()) if len(counts) else 0
+    positions = np.cumsum(present, axis=-1) - 1 + (width - counts)[:, None]
+    rows = np.broadcast_to(np.arange(x.shape[0])[:, None], x.shape)
+    out = np.full((x.shape[0], width), np.nan)
+    out[rows[present], positions[present]] = x[present]
+    return out, rows, positions
+
+# ==================== PANNELLO MULTI-SIMBOLO ====================
+class IndicatorPanel:
+    """Chiusure e volumi di tutti i simboli come array 2-D (simboli × tempo).
+
+    compute() calcola in un solo passaggio vettoriale gli indicatori di
+    main.calculate_advanced_indicators e MLTrader.calculate_technical_indicators:
+    passare da 6 a 200 simboli allarga gli array, non moltiplica le pipeline.
+    Le celle senza candela (prima della quotazione o in un buco dello
+    storico) sono mascherate: ogni simbolo vede solo le proprie candele,
+    quindi i valori coincidono con il calcolo sul suo DataFrame.
+    """
+
+    def __init__(self, symbols, timestamps, close, volume=None):
+        self.symbols = list(symbols)
+        self.timestamps = np.asarray(timestamps)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.volume = None if volume is None else np.asarray(volume, dtype=np.float64)
+        self.present = ~np.isnan(self.close)
+        self.indicators = {}
+
+    @classmethod
+    def from_frames(cls, frames):
+        """Allinea i DataFrame per simbolo sull'unione dei timestamp (NaN dove manca la candela)"""
+        symbols = list(frames)
+        close = pd.concat({s: frames[s].set_index('timestamp')['close'] for s in symbols}, axis=1)
+        close = close.sort_index()
+        volume = None
+        if all('volume' in frames[s].columns for s in symbols):
+            volume = pd.concat({s: frames[s].set_index('timestamp')['volume'] for s in symbols}, axis=1)
+            volume = volume.reindex(close.index)
+        return cls(
+            symbols,
+            close.index.values,
+            close.to_numpy(dtype=np.float64).T,
+            None if volume is None else volume.to_numpy(dtype=np.float64).T,
+        )
+
+    def compute(self):
+        """Calcola tutti gli indicatori (dict nome -> array simboli × tempo)"""
+        # Indicatori sulle candele compatte di ogni simbolo, poi di nuovo sull'asse comune
+        prices, rows, positions = _compact(self.close, self.present)
+        volume = None if self.volume is None else _compact(self.volume, self.present)[0]
+        ind = {}
+
+        # Medie mobili
+        for n in (5, 10, 20, 30):
+            ind[f'sma_{n}'] = rolling_mean(prices, n)
+
+        # RSI
+        ind['rsi'] = rsi(prices)
+
+        # Momentum
+        for n in (1, 3, 5, 10, 20):
+            ind[f'momentum_{n}'] = pct_change(prices, n)
+
+        # Volatilità e Bollinger (stessa finestra a 20)
+        std_20 = rolling_std(prices, 20)
+        ind['volatility'] = std_20
+        ind['bb_middle'] = ind['sma_20']
+        ind['bb_upper'] = ind['bb_middle'] + std_20 * 2
+        ind['bb_lower'] = ind['bb_middle'] - std_20 * 2
+        ind['bb_position'] = (prices - ind['bb_lower']) / (ind['bb_upper'] - ind['bb_lower'])
+
+        # MACD
+        ind['macd'] = ewm_mean(prices, 12) - ewm_mean(prices, 26)
+        ind['macd_signal'] = ewm_mean(ind['macd'], 9)
+
+        # Volume
+        if volume is not None:
+            ind['volume_sma'] = rolling_mean(volume, 20)
+            ind['volume_ratio'] = volume / ind['volume_sma']
+        else:
+            ind['volume_ratio'] = np.ones(prices.shape)
+
+        # Posizione relativa
+        for n in (5, 10, 20, 30):
+            ind[f'price_vs_sma{n}'] = prices / ind[f'sma_{n}']
+        ind['sma_ratio_5_20'] = ind['sma_5'] / ind['sma_20']
+
+        present = self.present
+        for name, values in ind.items():
+            full = np.full(self.close.shape, np.nan)
+            full[present] = values[rows[present], positions[present]]
+            ind[name] = full
+        self.indicators = ind
+        return ind
+
+    def frame(self, symbol, columns=None):
+        """DataFrame di un simbolo con close, volume e indicatori (solo le sue candele)"""
+        if not self.indicators:
+            self.compute()
+        i = self.symbols.index(symbol)
+        present = self.present[i]
+        data = {'timestamp': self.timestamps[present], 'close': self.close[i, present]}
+        if self.volume is not None:
+            data['volume'] = self.volume[i, present]
+        for name in columns or self.indicators:
+            data[name] = self.indicators[name][i, present]
+        return pd.DataFrame(data)
+
+    def latest(self, columns=None):
+        """Valori all'ultima candela di ogni simbolo (una riga per simbolo)"""
+        if not self.indicators:
+            self.compute()
+        last = self.present.shape[-1] - 1 - np.argmax(self.present[:, ::-1], axis=-1)
+        rows = np.arange(len(self.symbols))
+        data = {'timestamp': self.timestamps[last], 'close': self.close[rows, last]}
+        for name in columns or self.indicators:
+            data[name] = self.indicators[name][rows, last]
+        return pd.DataFrame(data, index=self.symbols)
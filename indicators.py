@@ -0,0 +1,254 @@
+import bisect
+import math
+import threading
+from collections import OrderedDict, deque
+import numpy as np
+import pandas as pd
+
+# ==================== CONFIGURAZIONE ====================
+CACHE_SIZE = 512             # Serie indicatori tenute in memoria
+RSI_MIN_LOSS = 0.0001        # Evita divisione per zero nell'RSI
+VOLATILITY_PERCENTILE = 70   # Soglia del filtro di regime (alta volatilità)
+EWM_SETTLE = 3               # Span di storia perché una EMA dimentichi l'inizio (peso residuo < 1%)
+
+NAN = float('nan')
+
+# ==================== INDICATORI ====================
+# Ogni funzione riceve una pd.Series di prezzi e ritorna valori allineati
+# all'indice di input (stessa lunghezza, NaN durante il riscaldamento).
+
+def sma(prices, window):
+    """Media mobile semplice"""
+    return prices.rolling(window).mean()
+
+def ema(prices, span):
+    """Media mobile esponenziale (come pandas ewm(span).mean())"""
+    return prices.ewm(span=span).mean()
+
+def volatility(prices, window=20):
+    """Deviazione standard mobile"""
+    return prices.rolling(window).std()
+
+def momentum(prices, periods):
+    """Variazione percentuale su `periods` barre"""
+    return prices.pct_change(periods)
+
+def rsi(prices, period=14):
+    """RSI su medie mobili semplici di guadagni e perdite.
+
+    Il delta è calcolato con diff() sull'indice dei prezzi, quindi il valore
+    alla barra i usa la variazione tra i-1 e i (nessuno sfasamento).
+    """
+    deltas = prices.diff()
+    gains = deltas.where(deltas > 0, 0)
+    losses = -deltas.where(deltas < 0, 0)
+
+    avg_gains = gains.rolling(period).mean()
+    avg_losses = losses.rolling(period).mean()
+
+    # Evita divisione per zero
+    avg_losses = avg_losses.where(avg_losses != 0, RSI_MIN_LOSS)
+    rs = avg_gains / avg_losses
+    return 100 - (100 / (1 + rs))
+
+def macd(prices, fast=12, slow=26):
+    """Linea MACD (differenza tra EMA veloce e lenta)"""
+    return ema(prices, fast) - ema(prices, slow)
+
+def macd_signal(prices, fast=12, slow=26, signal=9):
+    """Linea di segnale del MACD"""
+    return ema(macd(prices, fast, slow), signal)
+
+def bollinger_upper(prices, window=20, width=2):
+    return sma(prices, window) + volatility(prices, window) * width
+
+def bollinger_lower(prices, window=20, width=2):
+    return sma(prices, window) - volatility(prices, window) * width
+
+def volatility_regime(prices, window=20, q=VOLATILITY_PERCENTILE, lookback=None):
+    """Filtro di regime: True dove la volatilità supera il proprio percentile q.
+
+    Il percentile a ogni barra usa solo le volatilità fino a quella barra
+    (le ultime `lookback`, o tutte se None), quindi niente sguardo al futuro.
+    """
+    vol = volatility(prices, window)
+    return vol > rolling_quantile(vol, q, lookback)
+
+# Barre di storia prima del primo valore valido (o stabile, per le EMA)
+WARMUP = {
+    'sma': lambda window: window - 1,
+    'ema': lambda span: EWM_SETTLE * span,
+    'volatility': lambda window=20: window - 1,
+    'momentum': lambda periods: periods,
+    'rsi': lambda period=14: period - 1,
+    'macd': lambda fast=12, slow=26: EWM_SETTLE * slow,
+    'macd_signal': lambda fast=12, slow=26, signal=9: EWM_SETTLE * (slow + signal),
+    'bb_upper': lambda window=20, width=2: window - 1,
+    'bb_lower': lambda window=20, width=2: window - 1,
+    'volatility_regime': lambda window=20, q=VOLATILITY_PERCENTILE, lookback=None: window - 1 + (lookback or 0),
+}
+
+def warmup_bars(name, **params):
+    """Barre che l'indicatore `name` consuma prima di dare il primo valore utile"""
+    return WARMUP[name](**params)
+
+# ==================== QUANTILI MOBILI ====================
+class RollingQuantile:
+    """Percentile esatto su finestra mobile (o espansiva se window è None).
+
+    I valori sono tenuti in una lista ordinata aggiornata con bisect: ogni
+    barra costa una ricerca O(log n) e uno spostamento contiguo in memoria,
+    invece di riordinare tutta la storia come np.percentile a ogni chiamata.
+    I NaN occupano posto nella finestra ma sono esclusi dal calcolo (come
+    dropna()); l'interpolazione è quella lineare di np.percentile.
+    """
+
+    def __init__(self, window=None):
+        self.window = window
+        self.values = deque()
+        self.sorted = []
+
+    def add(self, value):
+        value = float(value)
+        self.values.append(value)
+        if not math.isnan(value):
+            bisect.insort(self.sorted, value)
+        if self.window is not None and len(self.values) > self.window:
+            old = self.values.popleft()
+            if not math.isnan(old):
+                del self.sorted[bisect.bisect_left(self.sorted, old)]
+
+    def __len__(self):
+        return len(self.sorted)
+
+    def _at(self, k, extra, pos):
+        """k-esimo valore ordinato con `extra` inserito virtualmente in posizione pos"""
+        if extra is None or k < pos:
+            return self.sorted[k]
+        if k == pos:
+            return extra
+        return self.sorted[k - 1]
+
+    def quantile(self, q, extra=None):
+        """Percentile q (0-100) dei valori in finestra, più `extra` senza inserirlo"""
+        if extra is not None and math.isnan(extra):
+            extra = None
+        n = len(self.sorted) + (extra is not None)
+        if n == 0:
+            return NAN
+        pos = bisect.bisect_left(self.sorted, extra) if extra is not None else 0
+
+        rank = (n - 1) * (q / 100)
+        lo = math.floor(rank)
+        hi = min(lo + 1, n - 1)
+        gamma = rank - lo
+        a, b = self._at(lo, extra, pos), self._at(hi, extra, pos)
+        # Stessa formula di np.percentile (stabile vicino a b)
+        if gamma >= 0.5:
+            return b - (b - a) * (1 - gamma)
+        return a + (b - a) * gamma
+
+def rolling_quantile(values, q, window=None):
+    """Percentile q a ogni barra in un solo passaggio (finestra mobile o espansiva)"""
+    rq = RollingQuantile(window)
+    data = np.asarray(values, dtype=float)
+    out = np.full(len(data), np.nan)
+    for i, value in enumerate(data):
+        rq.add(value)
+        out[i] = rq.quantile(q)
+    if isinstance(values, pd.Series):
+        return pd.Series(out, index=values.index)
+    return out
+
+INDICATORS = {
+    'sma': sma,
+    'ema': ema,
+    'volatility': volatility,
+    'momentum': momentum,
+    'rsi': rsi,
+    'macd': macd,
+    'macd_signal': macd_signal,
+    'bb_upper': bollinger_upper,
+    'bb_lower': bollinger_lower,
+    'volatility_regime': volatility_regime,
+}
+
+# ==================== SEGNALI DA PUNTEGGIO ====================
+def score_signals(scores, buy_above, sell_below):
+    """BUY sopra buy_above, SELL sotto sell_below, altrimenti HOLD (anche su array interi)"""
+    scores = np.asarray(scores)
+    return np.where(scores > buy_above, "BUY", np.where(scores < sell_below, "SELL", "HOLD")).astype(object)
+
+# ==================== CACHE LRU ====================
+class IndicatorCache:
+    """Cache LRU limitata delle serie indicatori già calcolate.
+
+    La chiave è (serie, nome, parametri): la stessa serie di candele vista
+    dal bot live, dal builder delle feature ML e dal backtest calcola ogni
+    indicatore una volta sola. I valori sono salvati come array NumPy e
+    riallineati all'indice del chiamante a ogni lettura.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            values = self._data.get(key)
+            if values is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return values
+
+    def put(self, key, values):
+        with self._lock:
+            self._data[key] = values
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+CACHE = IndicatorCache()
+
+def series_key(symbol, interval, df):
+    """Identifica una serie di candele: (simbolo, intervallo, prima/ultima barra, righe, ultima chiusura).
+
+    L'ultima chiusura entra nella chiave perché la candela in corso cambia
+    prezzo senza cambiare timestamp. Ritorna None se il simbolo non è noto
+    (nessuna cache).
+    """
+    if symbol is None or df is None or len(df) == 0:
+        return None
+    if 'timestamp' in df.columns:
+        first_ts, last_ts = df['timestamp'].iloc[0], df['timestamp'].iloc[-1]
+    else:
+        first_ts, last_ts = df.index[0], df.index[-1]
+    return (symbol.upper(), interval, first_ts, last_ts, len(df), float(df['close'].iloc[-1]))
+
+def compute(name, prices, key=None, cache=CACHE, **params):
+    """Calcola l'indicatore `name` sui prezzi, riusando la cache se `key` è dato"""
+    if not isinstance(prices, pd.Series):
+        prices = pd.Series(prices, dtype=float)
+    if key is None:
+        return INDICATORS[name](prices, **params)
+
+    cache_key = (key, name, tuple(sorted(params.items())))
+    values = cache.get(cache_key)
+    if values is None:
+        values = INDICATORS[name](prices, **params).to_numpy()
+        values.setflags(write=False)
+        cache.put(cache_key, values)
+    return pd.Series(values, index=prices.index, copy=True)
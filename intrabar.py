@@ -0,0 +1,248 @@
+import os
+import time
+import argparse
+import numpy as np
+import backtest
+import sweep
+from candle_store import STORE, STORE_DIR, CandleStore, INTERVAL_MS, OPEN_TIME, COLUMNS
+
+# ==================== CONFIGURAZIONE DRILL-DOWN ====================
+DRILL_INTERVAL = '1m'
+# Giorni scaricati solo per il drill-down: store a parte, perché lo store
+# principale assume una copertura contigua e questi sono giorni sparsi
+INTRABAR_DIR = os.path.join(STORE_DIR, 'intrabar')
+INTRABAR_STORE = CandleStore(INTRABAR_DIR)
+
+OPEN, HIGH, LOW, CLOSE = (COLUMNS.index(name) for name in ('open', 'high', 'low', 'close'))
+
+# ==================== CANDELE 1m PER GIORNO ====================
+class IntrabarCandles:
+    """Candele a timeframe inferiore di un simbolo, caricate solo per le barre richieste.
+
+    Ordine di ricerca: store principale (se la sua copertura contiene la
+    barra), store dei giorni sparsi, infine download del solo intervallo
+    della barra, salvato nello store sparso per i run successivi.
+    """
+
+    def __init__(self, symbol, bar_open_times, bar_interval='1d', interval=DRILL_INTERVAL,
+                 store=STORE, cache_store=INTRABAR_STORE):
+        self.symbol = symbol
+        self.bar_open_times = np.asarray(bar_open_times, dtype=np.int64)
+        self.bar_ms = INTERVAL_MS[bar_interval]
+        self.interval = interval
+        self.store = store
+        self.cache_store = cache_store
+        self.bars = {}
+        self.fetched = 0
+        _, first_open, last_close, _ = store.coverage(symbol, interval)
+        self.covered = (first_open, last_close) if first_open is not None else None
+
+    def _slice(self, store, start, end):
+        stored = store.load(self.symbol, self.interval)
+        lo, hi = np.searchsorted(stored[OPEN_TIME], [start, end])
+        return np.asarray(stored[:, lo:hi])
+
+    def __call__(self, i):
+        """(open, high, low, close) delle candele dentro la barra i, o None se non disponibili"""
+        if i in self.bars:
+            return self.bars[i]
+        start = int(self.bar_open_times[i])
+        end = start + self.bar_ms
+        if self.covered and self.covered[0] <= start and end - 1 <= self.covered[1]:
+            block = self._slice(self.store, start, end)
+        else:
+            block = self._slice(self.cache_store, start, end)
+            if block.shape[1] == 0:
+                block = self._download(start, end)
+        candles = (block[OPEN], block[HIGH], block[LOW], block[CLOSE]) if block.shape[1] else None
+        self.bars[i] = candles
+        return candles
+
+    def _download(self, start, end):
+        try:
+            block = self.cache_store.fetch_range(self.symbol, self.interval, start, end - 1)
+        except Exception as e:
+            print(f"❌ Drill-down {self.symbol} {self.interval}: {e}")
+            return np.empty((len(COLUMNS), 0))
+        block = block[:, (block[OPEN_TIME] >= start) & (block[OPEN_TIME] < end)]
+        if block.shape[1]:
+            self.cache_store.merge_history(self.symbol, self.interval, block)
+            self.fetched += 1
+        return block
+
+# ==================== PERCORSO INTRABAR ====================
+def bar_path(opens, highs, lows, closes):
+    """Percorso dei prezzi dentro le candele: O-L-H-C se chiude sopra l'apertura, altrimenti O-H-L-C.
+
+    Ritorna (prezzi, maschera delle aperture): sulle aperture un livello già
+    superato si esegue al prezzo d'apertura (gap), altrove al livello.
+    """
+    up = closes >= opens
+    path = np.column_stack([opens, np.where(up, lows, highs), np.where(up, highs, lows), closes]).ravel()
+    is_open = np.zeros(len(path), dtype=bool)
+    is_open[::4] = True
+    return path, is_open
+
+def _trailing(max_price, entry_price, trailing_stop, trailing_activation):
+    active = (max_price - entry_price) / entry_price >= trailing_activation
+    return np.where(active, max_price * (1 - trailing_stop), -np.inf)
+
+def walk_path(path, is_open, entry_price, max_price, stop, target, trailing_stop, trailing_activation,
+              use_trailing_stop=True):
+    """Prima uscita lungo un percorso di prezzi: (punto, livello eseguito, stop al punto) o None"""
+    running_max = np.maximum.accumulate(np.maximum(path, max_price))
+    if use_trailing_stop:
+        stops = np.maximum(np.maximum.accumulate(
+            _trailing(running_max, entry_price, trailing_stop, trailing_activation)), stop)
+    else:
+        stops = np.full(len(path), stop)
+    hit_stop = path <= stops
+    hit = hit_stop | (path >= target)
+    if not hit.any():
+        return None
+    k = int(np.argmax(hit))
+    if hit_stop[k]:
+        return k, path[k] if is_open[k] else stops[k], stops[k]
+    return k, path[k] if is_open[k] else target, None
+
+# ==================== USCITE SU BARRE OHLC ====================
+def first_exit_intrabar(bars, sell, start, entry_price, stop_loss, take_profit,
+                        trailing_stop, trailing_activation, use_trailing_stop=True, drill=None, stats=None):
+    """Prima uscita dopo start su barre OHLC: (indice, motivo, prezzo) o (None, None, None).
+
+    Stesse regole di backtest.first_exit, ma stop e target sono confrontati
+    con low e high della barra ed eseguiti al livello (o all'apertura se la
+    barra apre oltre). Una barra è ambigua quando l'esito dipende dall'ordine
+    dei prezzi al suo interno: tocca sia stop che target, oppure il massimo
+    della barra alza il trailing fino al suo minimo. Le barre ambigue sono
+    trovate con un controllo vettoriale e solo per quelle drill(i) fornisce
+    le candele 1m; senza dati si usa il percorso convenzionale della barra.
+    """
+    opens, highs, lows, closes = bars
+    base_stop = entry_price * (1 - stop_loss)
+    target = entry_price * (1 + take_profit)
+    max_price, stop = entry_price, base_stop
+
+    def exit_reason(level):
+        return "TRAILING_STOP" if use_trailing_stop and level > base_stop else "STOP_LOSS"
+
+    j = start
+    while j < len(closes):
+        end = j + backtest.EXIT_CHUNK
+        o, h, l, c, s = opens[j:end], highs[j:end], lows[j:end], closes[j:end], sell[j:end]
+        max_after = np.maximum.accumulate(np.maximum(h, max_price))
+        max_before = np.r_[max_price, max_after[:-1]]
+        if use_trailing_stop:
+            stop_before = np.maximum(np.maximum.accumulate(
+                _trailing(max_before, entry_price, trailing_stop, trailing_activation)), stop)
+            stop_after = np.maximum(stop_before, _trailing(max_after, entry_price, trailing_stop, trailing_activation))
+        else:
+            stop_before = stop_after = np.full(len(c), stop)
+
+        gap_stop = o <= stop_before
+        gap_target = o >= target
+        hit_stop = l <= stop_before
+        hit_target = h >= target
+        ambiguous = ~gap_stop & ~gap_target & (l <= stop_after) & (hit_target | ~hit_stop | (stop_after > stop_before))
+        events = np.flatnonzero(ambiguous | hit_stop | hit_target | s)
+
+        for k in events:
+            i = j + int(k)
+            if gap_stop[k]:
+                return i, exit_reason(stop_before[k]), o[k]
+            if gap_target[k]:
+                return i, "TAKE_PROFIT", o[k]
+            if ambiguous[k]:
+                candles = drill(i) if drill is not None else None
+                if stats is not None:
+                    stats['ambiguous'] = stats.get('ambiguous', 0) + 1
+                    stats['drilled'] = stats.get('drilled', 0) + (candles is not None)
+                path, is_open = bar_path(*(candles or (o[k:k + 1], h[k:k + 1], l[k:k + 1], c[k:k + 1])))
+                hit = walk_path(path, is_open, entry_price, max_before[k], stop_before[k], target,
+                                trailing_stop, trailing_activation, use_trailing_stop)
+                if hit is not None:
+                    _, price, level = hit
+                    return i, exit_reason(level) if level is not None else "TAKE_PROFIT", price
+                if s[k]:
+                    return i, "SELL", c[k]
+                continue
+            if hit_stop[k]:
+                return i, exit_reason(stop_before[k]), stop_before[k]
+            if hit_target[k]:
+                return i, "TAKE_PROFIT", target
+            return i, "SELL", c[k]
+
+        max_price, stop = max_after[-1], stop_after[-1]
+        j += len(c)
+    return None, None, None
+
+def ambiguous_bars(highs, lows, stop_loss, take_profit, trailing_stop=None):
+    """Barre che potrebbero essere ambigue per qualunque entrata: escursione high/low
+    sufficiente a toccare stop e target (o stop di trailing e massimo) nella stessa barra"""
+    ratio = (1 + take_profit) / (1 - stop_loss)
+    if trailing_stop is not None:
+        ratio = min(ratio, 1 / (1 - trailing_stop))
+    return highs >= lows * ratio
+
+def simulate_intrabar(df, buy, sell, initial_balance, stop_loss, take_profit,
+                      trailing_stop, trailing_activation, use_trailing_stop=True,
+                      symbol=None, drill=True, start=0):
+    """backtest.simulate_managed con uscite su high/low e drill-down 1m delle barre ambigue.
+
+    df: candele OHLC con timestamp. Ritorna (saldo, trade, statistiche del drill-down).
+    """
+    bars = tuple(df[name].to_numpy(dtype=float) for name in ('open', 'high', 'low', 'close'))
+    intrabar = None
+    if drill and symbol is not None:
+        open_times = df['timestamp'].values.astype('datetime64[ms]').astype(np.int64)
+        intrabar = IntrabarCandles(symbol, open_times)
+    stats = {'ambiguous': 0, 'drilled': 0}
+
+    def find_exit(i, entry_price):
+        return first_exit_intrabar(bars, sell, i, entry_price, stop_loss, take_profit,
+                                   trailing_stop, trailing_activation, use_trailing_stop, intrabar, stats)
+
+    balance, trades = backtest.simulate_managed(
+        bars[3], buy, sell, initial_balance, stop_loss, take_profit, trailing_stop, trailing_activation,
+        use_trailing_stop, timestamps=df['timestamp'], start=start, find_exit=find_exit)
+    stats['downloaded'] = intrabar.fetched if intrabar is not None else 0
+    return balance, trades, stats
+
+# ==================== CLI ====================
+def main():
+    parser = argparse.ArgumentParser(description="Backtest con uscite intrabar e drill-down 1m")
+    parser.add_argument('symbol', nargs='?', default='BTCUSDT')
+    parser.add_argument('--years', type=float, default=7)
+    args = parser.parse_args()
+
+    df = backtest.download_historical_data(args.symbol, years=args.years)
+    if df is None:
+        return
+    params = sweep.DEFAULT_PARAMS
+    scores = sweep.strategy_scores(df)
+    confident = scores > params['min_confidence']
+    buy = confident & (scores > params['buy_above'])
+    sell = confident & (scores < params['sell_below'])
+    exits = (params['stop_loss'], params['take_profit'], params['trailing_stop'],
+             params['trailing_activation'], params['use_trailing_stop'])
+
+    candidates = ambiguous_bars(df['high'].to_numpy(), df['low'].to_numpy(),
+                                params['stop_loss'], params['take_profit'], params['trailing_stop'])
+    print(f"🔍 Barre potenzialmente ambigue: {int(candidates.sum())}/{len(df)}")
+
+    balance, trades = backtest.simulate_managed(df['close'].to_numpy(dtype=float), buy, sell,
+                                                backtest.INITIAL_BALANCE, *exits)
+    closes = backtest.backtest_stats(backtest.INITIAL_BALANCE, balance, trades)
+
+    started = time.time()
+    balance, trades, drill_stats = simulate_intrabar(df, buy, sell, backtest.INITIAL_BALANCE, *exits,
+                                                     symbol=args.symbol)
+    intrabar = backtest.backtest_stats(backtest.INITIAL_BALANCE, balance, trades)
+    print(f"⏱️  Intrabar in {time.time() - started:.1f}s: {drill_stats['ambiguous']} barre ambigue, "
+          f"{drill_stats['drilled']} risolte con candele {DRILL_INTERVAL} ({drill_stats['downloaded']} scaricate)")
+    for name, stats in (("Solo chiusure", closes), ("Intrabar", intrabar)):
+        print(f"📊 {name}: {stats['total_return_percent']:+.2f}% | {stats['total_trades']} trade | "
+              f"win rate {stats['win_rate']:.1f}% | max DD {stats['max_drawdown']:.2f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+# ==================== FORMATO KLINES BINANCE ====================
+KLINE_FIELDS = [
+    'timestamp', 'open', 'high', 'low', 'close', 'volume',
+    'close_time', 'quote_asset_volume', 'number_of_trades',
+    'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
+]
+FIELD_INDEX = {name: i for i, name in enumerate(KLINE_FIELDS)}
+
+# Campi interi (timestamp in ms e conteggi); gli altri sono prezzi/volumi
+INT_FIELDS = {'timestamp', 'close_time', 'number_of_trades'}
+DEFAULT_FIELDS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+# ==================== DECODER ====================
+def decode(data, fields=DEFAULT_FIELDS, dtype=np.float64):
+    """Decodifica il payload klines in colonne NumPy tipizzate.
+
+    Timestamp e conteggi diventano int64, prezzi e volumi `dtype`
+    (float64 o float32). Vengono convertiti solo i campi richiesti.
+    """
+    columns = {}
+    for name in fields:
+        index = FIELD_INDEX[name]
+        column_dtype = np.int64 if name in INT_FIELDS else dtype
+        columns[name] = np.array([row[index] for row in data], dtype=column_dtype)
+    return columns
+
+def to_frame(columns):
+    """DataFrame dalle colonne decodificate, con timestamp come datetime"""
+    df = pd.DataFrame(columns, copy=False)
+    if 'timestamp' in df.columns:
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    return df
+
+def decode_frame(data, fields=DEFAULT_FIELDS, dtype=np.float64):
+    """Payload klines -> DataFrame tipizzato in un passo"""
+    return to_frame(decode(data, fields, dtype))
+
+# ==================== MEMORIA ====================
+def columns_nbytes(columns):
+    """Byte occupati dalle colonne tipizzate"""
+    return sum(column.nbytes for column in columns.values())
+
+def legacy_frame_nbytes(data):
+    """Byte del vecchio DataFrame: 12 colonne object con stringhe Python"""
+    df = pd.DataFrame(data, columns=KLINE_FIELDS)
+    return int(df.memory_usage(deep=True, index=False).sum())
+
+def memory_report(data, fields=DEFAULT_FIELDS, dtype=np.float64):
+    """Confronto memoria vecchio DataFrame object vs colonne tipizzate"""
+    before = legacy_frame_nbytes(data)
+    after = columns_nbytes(decode(data, fields, dtype))
+    return {
+        'rows': len(data),
+        'legacy_bytes': before,
+        'typed_bytes': after,
+        'saved_bytes': before - after,
+        'ratio': before / after if after else 0.0,
+    }
+
+def print_memory_report(report):
+    """Stampa il report di memoria"""
+    print(f"🧮 Klines: {report['rows']} righe")
+    print(f"   • DataFrame object: {report['legacy_bytes'] / 1024:.1f} KB")
+    print(f"   • Colonne tipizzate: {report['typed_bytes'] / 1024:.1f} KB")
+    print(f"   • Risparmio: {report['saved_bytes'] / 1024:.1f} KB ({report['ratio']:.1f}x)")
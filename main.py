@@ -1,11 +1,16 @@
 import os
 import threading
 import time
-import requests
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from datetime import datetime
 from flask import Flask
+from price_service import PRICES
+from market_data import REST_PROVIDER, StreamProvider
+from resample import provider_for
+from streaming_indicators import StreamingIndicators
+import indicators
+import strategies
 
 app = Flask(__name__)
 
@@ -28,6 +33,20 @@ MONEY_MANAGEMENT = {
     'weekend_trading': False
 }
 
+# Thread per l'analisi concorrente del portfolio (download + indicatori)
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', 6))
+
+# Strategia live: indicatori dichiarati + righe valutate (finestra del percentile
+# di volatilità) -> giorni di storico da scaricare
+OPTIMIZED_ML = strategies.register('optimized_ml', strategies.OPTIMIZED_ML_INDICATORS, rows=71)
+# Indicatori incrementali (O(1) per candela), stesse righe della strategia
+INDICATORS = StreamingIndicators(rows=OPTIMIZED_ML.rows)
+
+# Stream WebSocket: stop/trailing/take profit controllati a ogni tick
+USE_MARKET_STREAM = os.getenv('MARKET_STREAM', '0') == '1'
+# Candele del bot live: fuori da 1d sono ricampionate dalla serie 1m dello store
+MARKET_INTERVAL = os.getenv('MARKET_INTERVAL', OPTIMIZED_ML.interval)
+
 CRYPTO_PORTFOLIO = [
     {"symbol": "BTCUSDT", "weight": 0.3, "allocation": 15},
     {"symbol": "ETHUSDT", "weight": 0.2, "allocation": 10},
@@ -37,9 +56,16 @@ CRYPTO_PORTFOLIO = [
     {"symbol": "AVAXUSDT", "weight": 0.1, "allocation": 5}
 ]
 
+# Tutti i simboli del portfolio in un'unica richiesta bulk di prezzi
+PRICES.track(*[crypto['symbol'] for crypto in CRYPTO_PORTFOLIO])
+
 # ==================== TRADER PROFESSIONALE ====================
 class ProfessionalTrader:
-    def __init__(self):
+    def __init__(self, provider=None, clock=None, verbose=True):
+        self.provider = provider or REST_PROVIDER
+        # Orologio iniettabile: il backtest di portfolio fa scorrere il tempo simulato
+        self.clock = clock or datetime.now
+        self.verbose = verbose
         self.paper_balance = MONEY_MANAGEMENT['initial_capital']
         self.daily_trades = 0
         self.daily_pnl = 0
@@ -47,21 +73,27 @@ class ProfessionalTrader:
         self.winning_trades = 0
         self.open_positions = {}
         self.daily_reset_hour = -1
+        # Lo stream di mercato aggiorna le posizioni da un altro thread
+        self.lock = threading.RLock()
         
-        print("💰 MONEY MANAGEMENT PRO ATTIVO")
-        print(f"   • Capitale: {self.paper_balance}€")
-        print(f"   • Position Size: {MONEY_MANAGEMENT['position_size']*100}%")
-        print(f"   • Stop Loss: {MONEY_MANAGEMENT['stop_loss']*100}%")
-        print(f"   • Take Profit: {MONEY_MANAGEMENT['take_profit']*100}%")
-        print(f"   • Trailing Stop: {MONEY_MANAGEMENT['trailing_stop']*100}%")
-        print(f"   • Max Daily Trades: {MONEY_MANAGEMENT['max_daily_trades']}")
-        print("🎯 PORTFOLIO MULTI-CRYPTO:")
+        self.log("💰 MONEY MANAGEMENT PRO ATTIVO")
+        self.log(f"   • Capitale: {self.paper_balance}€")
+        self.log(f"   • Position Size: {MONEY_MANAGEMENT['position_size']*100}%")
+        self.log(f"   • Stop Loss: {MONEY_MANAGEMENT['stop_loss']*100}%")
+        self.log(f"   • Take Profit: {MONEY_MANAGEMENT['take_profit']*100}%")
+        self.log(f"   • Trailing Stop: {MONEY_MANAGEMENT['trailing_stop']*100}%")
+        self.log(f"   • Max Daily Trades: {MONEY_MANAGEMENT['max_daily_trades']}")
+        self.log("🎯 PORTFOLIO MULTI-CRYPTO:")
         for crypto in CRYPTO_PORTFOLIO:
-            print(f"   • {crypto['symbol']}: {crypto['weight']*100}%")
+            self.log(f"   • {crypto['symbol']}: {crypto['weight']*100}%")
+    
+    def log(self, message):
+        if self.verbose:
+            print(message)
     
     def can_trade(self):
         """Controlla se possiamo fare trading"""
-        current_time = datetime.now()
+        current_time = self.clock()
         current_hour = current_time.hour
         
         # Reset daily counters se è un nuovo giorno
@@ -69,7 +101,7 @@ class ProfessionalTrader:
             self.daily_trades = 0
             self.daily_pnl = 0
             self.daily_reset_hour = current_hour
-            print("🔄 Reset contatori giornalieri")
+            self.log("🔄 Reset contatori giornalieri")
             
         # Controllo ore trading
         start_hour, end_hour = MONEY_MANAGEMENT['trading_hours']
@@ -119,7 +151,7 @@ class ProfessionalTrader:
                 if new_stop > position['stop_loss']:
                     position['stop_loss'] = new_stop
                     current_profit = (current_price - position['entry_price']) / position['entry_price'] * 100
-                    print(f"🎯 Trailing Stop {symbol} aggiornato: {new_stop:.2f}$ (+{current_profit:.1f}%)")
+                    self.log(f"🎯 Trailing Stop {symbol} aggiornato: {new_stop:.2f}$ (+{current_profit:.1f}%)")
     
     def check_position_management(self, symbol, current_price):
         """Gestisce stop loss, trailing stop e take profit"""
@@ -156,106 +188,109 @@ class ProfessionalTrader:
             self.winning_trades += 1
             
         # Statistiche dettagliate
-        hold_time = (datetime.now() - position['entry_time']).total_seconds() / 3600  # ore
+        hold_time = (self.clock() - position['entry_time']).total_seconds() / 3600  # ore
         win_rate = (self.winning_trades / self.total_trades * 100) if self.total_trades > 0 else 0
         
-        print(f"💰 USCITA {reason}: {symbol}")
-        print(f"   • Profitto: {profit_percent*100:+.2f}% ({profit_amount:+.2f}€)")
-        print(f"   • Durata: {hold_time:.1f}h")
-        print(f"   • Daily PnL: {self.daily_pnl:.2f}€")
-        print(f"   • Win Rate: {win_rate:.1f}%")
-        print(f"   • Balance: {self.paper_balance:.2f}€")
+        self.log(f"💰 USCITA {reason}: {symbol}")
+        self.log(f"   • Profitto: {profit_percent*100:+.2f}% ({profit_amount:+.2f}€)")
+        self.log(f"   • Durata: {hold_time:.1f}h")
+        self.log(f"   • Daily PnL: {self.daily_pnl:.2f}€")
+        self.log(f"   • Win Rate: {win_rate:.1f}%")
+        self.log(f"   • Balance: {self.paper_balance:.2f}€")
         
         del self.open_positions[symbol]
     
     def execute_paper_trade(self, symbol, signal, price, confidence):
         """Esegue trade con gestione avanzata"""
-        can_trade, reason = self.can_trade()
-        if not can_trade:
-            print(f"⏸️  Trading sospeso: {reason}")
-            return False
+        with self.lock:
+            can_trade, reason = self.can_trade()
+            if not can_trade:
+                self.log(f"⏸️  Trading sospeso: {reason}")
+                return False
             
-        position_size = self.calculate_position_size(symbol)
+            position_size = self.calculate_position_size(symbol)
         
-        if signal == "BUY" and symbol not in self.open_positions:
-            # ENTRATA LONG con trailing stop
-            self.open_positions[symbol] = {
-                'type': 'LONG',
-                'entry_price': price,
-                'position_size': position_size,
-                'stop_loss': price * (1 - MONEY_MANAGEMENT['stop_loss']),
-                'take_profit': price * (1 + MONEY_MANAGEMENT['take_profit']),
-                'max_price': price,  # Per trailing stop
-                'entry_time': datetime.now()
-            }
-            self.paper_balance -= position_size
-            self.daily_trades += 1
-            self.total_trades += 1
+            if signal == "BUY" and symbol not in self.open_positions:
+                # ENTRATA LONG con trailing stop
+                self.open_positions[symbol] = {
+                    'type': 'LONG',
+                    'entry_price': price,
+                    'position_size': position_size,
+                    'stop_loss': price * (1 - MONEY_MANAGEMENT['stop_loss']),
+                    'take_profit': price * (1 + MONEY_MANAGEMENT['take_profit']),
+                    'max_price': price,  # Per trailing stop
+                    'entry_time': self.clock()
+                }
+                self.paper_balance -= position_size
+                self.daily_trades += 1
+                self.total_trades += 1
             
-            print(f"💰 ENTRATA LONG: {symbol}")
-            print(f"   • Size: {position_size:.2f}€")
-            print(f"   • Entry: {price:.2f}$")
-            print(f"   • Stop Loss: {self.open_positions[symbol]['stop_loss']:.2f}$")
-            print(f"   • Take Profit: {self.open_positions[symbol]['take_profit']:.2f}$")
-            if MONEY_MANAGEMENT['use_trailing_stop']:
-                print(f"   • Trailing Stop: {MONEY_MANAGEMENT['trailing_stop']*100}% (attivo dopo +{MONEY_MANAGEMENT['trailing_activation']*100}%)")
-            print(f"   • Daily Trades: {self.daily_trades}/{MONEY_MANAGEMENT['max_daily_trades']}")
-            return True
+                self.log(f"💰 ENTRATA LONG: {symbol}")
+                self.log(f"   • Size: {position_size:.2f}€")
+                self.log(f"   • Entry: {price:.2f}$")
+                self.log(f"   • Stop Loss: {self.open_positions[symbol]['stop_loss']:.2f}$")
+                self.log(f"   • Take Profit: {self.open_positions[symbol]['take_profit']:.2f}$")
+                if MONEY_MANAGEMENT['use_trailing_stop']:
+                    self.log(f"   • Trailing Stop: {MONEY_MANAGEMENT['trailing_stop']*100}% (attivo dopo +{MONEY_MANAGEMENT['trailing_activation']*100}%)")
+                self.log(f"   • Daily Trades: {self.daily_trades}/{MONEY_MANAGEMENT['max_daily_trades']}")
+                return True
             
-        elif signal == "SELL" and symbol in self.open_positions:
-            # USCITA MANUALE
-            self.close_position(symbol, price, "MANUAL_EXIT")
-            return True
+            elif signal == "SELL" and symbol in self.open_positions:
+                # USCITA MANUALE
+                self.close_position(symbol, price, "MANUAL_EXIT")
+                return True
             
-        return False
+            return False
+
+    def on_price_update(self, symbol, current_price):
+        """Aggiornamento prezzo in tempo reale (stream o polling)"""
+        with self.lock:
+            return self.check_position_management(symbol, current_price)
 
     def monitor_open_positions(self):
         """Monitora le posizioni aperte per stop loss/take profit"""
-        for symbol in list(self.open_positions.keys()):
+        symbols = list(self.open_positions.keys())
+        if not symbols:
+            return
+        try:
+            # Un solo snapshot bulk per tutte le posizioni aperte
+            prices = self.provider.get_prices(symbols)
+        except Exception as e:
+            self.log(f"❌ Errore monitoraggio prezzi: {e}")
+            return
+        
+        for symbol in symbols:
             try:
-                # Prendi prezzo corrente
-                current_price = get_current_price(symbol)
+                current_price = prices.get(symbol)
                 if current_price:
-                    self.check_position_management(symbol, current_price)
+                    self.on_price_update(symbol, current_price)
             except Exception as e:
-                print(f"❌ Errore monitoraggio {symbol}: {e}")
+                self.log(f"❌ Errore monitoraggio {symbol}: {e}")
 
 # ==================== FUNZIONI DI SUPPORTO ====================
 def get_current_price(symbol):
-    """Ottiene prezzo corrente di una crypto"""
+    """Ottiene prezzo corrente di una crypto (cache condivisa, refresh bulk)"""
     try:
-        url = "https://api.binance.com/api/v3/ticker/price"
-        response = requests.get(url, params={"symbol": symbol}, timeout=10)
-        data = response.json()
-        return float(data['price'])
+        price = PRICES.get_price(symbol)
+        if price is None:
+            raise ValueError("simbolo non quotato")
+        return price
     except Exception as e:
         print(f"❌ Errore prezzo {symbol}: {e}")
         return None
 
-def download_crypto_data(symbol, days=100):
-    """Download dati storici crypto"""
+MAX_DOWNLOAD_BARS = 200           # Tetto di download_crypto_data
+
+def download_crypto_data(symbol, days=100, provider=None, interval="1d"):
+    """Download dati storici crypto (store locale + sync incrementale); days = candele di `interval`"""
+    if days > MAX_DOWNLOAD_BARS:
+        print(f"⚠️ {symbol}: richieste {days} candele, scaricate solo le ultime {MAX_DOWNLOAD_BARS}")
     try:
-        url = "https://api.binance.com/api/v3/klines"
-        params = {
-            "symbol": symbol,
-            "interval": "1d",
-            "limit": min(days, 200)
-        }
-        response = requests.get(url, params=params, timeout=15)
-        data = response.json()
+        provider = provider_for(interval, provider)
+        df = provider.get_klines(symbol, interval, limit=min(days, MAX_DOWNLOAD_BARS))
         
-        if not data:
+        if df.empty:
             return None
-            
-        df = pd.DataFrame(data, columns=[
-            'timestamp', 'open', 'high', 'low', 'close', 'volume',
-            'close_time', 'quote_asset_volume', 'number_of_trades',
-            'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
-        ])
-        
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df['close'] = df['close'].astype(float)
-        df['volume'] = df['volume'].astype(float)
         
         return df.sort_values('timestamp').dropna()
         
@@ -263,40 +298,30 @@ def download_crypto_data(symbol, days=100):
         print(f"❌ Download {symbol} failed: {e}")
         return None
 
-def calculate_rsi(prices, period=14):
+def calculate_rsi(prices, period=14, key=None):
     """Calcola RSI"""
-    deltas = prices.diff()
-    gains = deltas.where(deltas > 0, 0)
-    losses = -deltas.where(deltas < 0, 0)
-    
-    avg_gains = gains.rolling(period).mean()
-    avg_losses = losses.rolling(period).mean()
-    
-    # Evita divisione per zero
-    avg_losses = avg_losses.where(avg_losses != 0, 0.0001)
-    rs = avg_gains / avg_losses
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
+    return indicators.compute('rsi', prices, key, period=period)
 
-def calculate_advanced_indicators(df):
-    """Calcola indicatori tecnici avanzati"""
+def calculate_advanced_indicators(df, symbol=None, interval="1d"):
+    """Calcola indicatori tecnici avanzati (in cache se il simbolo è noto)"""
     prices = df['close'].astype(float)
+    key = indicators.series_key(symbol, interval, df)
     
     # Medie mobili
-    df['sma_10'] = prices.rolling(10).mean()
-    df['sma_30'] = prices.rolling(30).mean()
-    df['sma_5'] = prices.rolling(5).mean()
+    df['sma_10'] = indicators.compute('sma', prices, key, window=10)
+    df['sma_30'] = indicators.compute('sma', prices, key, window=30)
+    df['sma_5'] = indicators.compute('sma', prices, key, window=5)
     
     # RSI
-    df['rsi'] = calculate_rsi(prices)
+    df['rsi'] = calculate_rsi(prices, key=key)
     
     # Momentum
-    df['momentum_5'] = prices.pct_change(5)
-    df['momentum_10'] = prices.pct_change(10)
-    df['momentum_3'] = prices.pct_change(3)
+    df['momentum_5'] = indicators.compute('momentum', prices, key, periods=5)
+    df['momentum_10'] = indicators.compute('momentum', prices, key, periods=10)
+    df['momentum_3'] = indicators.compute('momentum', prices, key, periods=3)
     
     # Volatilità
-    df['volatility'] = prices.rolling(20).std()
+    df['volatility'] = indicators.compute('volatility', prices, key, window=20)
     
     # Posizione relativa
     df['price_vs_sma5'] = prices / df['sma_5']
@@ -305,94 +330,140 @@ def calculate_advanced_indicators(df):
     
     return df
 
-def optimized_ml_strategy(df):
-    """Strategia ML OTTIMIZZATA - più reattiva"""
-    if len(df) < 40:
-        return "HOLD", 0.5
-        
-    current = df.iloc[-1]
-    
-    # Sistema di scoring ottimizzato
-    score = 0.5
+# Soglie della strategia ottimizzata
+OPTIMIZED_BUY_ABOVE = 0.55       # OTTIMIZZATO: era 0.6
+OPTIMIZED_SELL_BELOW = 0.45      # OTTIMIZZATO: era 0.4
+STRATEGY_MIN_BARS = 40
+MIN_CONFIDENCE = 0.6             # Punteggio minimo perché il bot esegua il segnale
+
+def _optimized_ml_score(df, high_volatility):
+    """Punteggio della strategia ottimizzata per ogni riga di df (maschere booleane)"""
+    sma_5, sma_10, sma_30 = df['sma_5'].values, df['sma_10'].values, df['sma_30'].values
+    rsi = df['rsi'].values
+    momentum_5 = df['momentum_5'].values
     
     # Trend analysis
-    trend_up_short = current['sma_5'] > current['sma_10']
-    trend_up_medium = current['sma_10'] > current['sma_30']
-    strong_uptrend = trend_up_short and trend_up_medium
-    strong_downtrend = not trend_up_short and not trend_up_medium
+    trend_up_short = sma_5 > sma_10
+    trend_up_medium = sma_10 > sma_30
+    strong_uptrend = trend_up_short & trend_up_medium
+    strong_downtrend = ~trend_up_short & ~trend_up_medium
     
     # RSI analysis
-    rsi_oversold = current['rsi'] < 35
-    rsi_overbought = current['rsi'] > 65
-    rsi_neutral = 40 <= current['rsi'] <= 60
+    rsi_oversold = rsi < 35
+    rsi_overbought = rsi > 65
+    rsi_neutral = (40 <= rsi) & (rsi <= 60)
     
     # Momentum
-    momentum_positive = current['momentum_5'] > 0
-    momentum_strong = current['momentum_5'] > 0.02
+    momentum_positive = momentum_5 > 0
     
-    # Volatilità
-    high_volatility = current['volatility'] > np.percentile(df['volatility'].dropna(), 70)
+    # 🎯 LOGICA MIGLIORATA (stesso ordine di if/elif della versione scalare)
+    bullish = np.select(
+        [strong_uptrend & rsi_oversold,
+         strong_uptrend & rsi_neutral & momentum_positive,
+         trend_up_short & rsi_oversold],
+        [0.3, 0.2, 0.15], 0.0)
+    bearish = np.select(
+        [strong_downtrend & rsi_overbought,
+         strong_downtrend & rsi_neutral & ~momentum_positive,
+         ~trend_up_short & rsi_overbought],
+        [0.3, 0.2, 0.15], 0.0)
     
-    # 🎯 LOGICA MIGLIORATA
-    if strong_uptrend and rsi_oversold:
-        score += 0.3
-    elif strong_uptrend and rsi_neutral and momentum_positive:
-        score += 0.2
-    elif trend_up_short and rsi_oversold:
-        score += 0.15
-        
-    if strong_downtrend and rsi_overbought:
-        score -= 0.3
-    elif strong_downtrend and rsi_neutral and not momentum_positive:
-        score -= 0.2
-    elif not trend_up_short and rsi_overbought:
-        score -= 0.15
-        
+    score = 0.5 + bullish
+    score = score - bearish
     # Aggiusta per volatilità
-    if high_volatility:
-        score -= 0.05
-        
-    score = max(0.1, min(0.9, score))
+    score = score - np.where(high_volatility, 0.05, 0.0)
+    
+    return np.clip(score, 0.1, 0.9)
+
+def optimized_ml_scores(df, high_volatility=None, buy_above=OPTIMIZED_BUY_ABOVE, sell_below=OPTIMIZED_SELL_BELOW):
+    """Punteggi e segnali della strategia ottimizzata per tutta la storia in un colpo.
+
+    Il valore alla riga i coincide con optimized_ml_strategy(df.iloc[:i+1]):
+    il percentile di volatilità è espansivo (solo dati fino a i).
+    """
+    if high_volatility is None:
+        volatility = df['volatility'].values
+        high_volatility = volatility > indicators.rolling_quantile(volatility, indicators.VOLATILITY_PERCENTILE)
+    scores = _optimized_ml_score(df, high_volatility)
+    scores[:STRATEGY_MIN_BARS - 1] = 0.5
+    signals = indicators.score_signals(scores, buy_above, sell_below)
+    signals[:STRATEGY_MIN_BARS - 1] = "HOLD"
+    return scores, signals
+
+def optimized_ml_strategy(df, high_volatility=None):
+    """Strategia ML OTTIMIZZATA - più reattiva
+
+    high_volatility può arrivare già calcolato da un filtro di regime
+    incrementale; altrimenti si ricava dal percentile della colonna volatility.
+    """
+    if len(df) < STRATEGY_MIN_BARS:
+        return "HOLD", 0.5
+    
+    current = df.iloc[-1]
+    
+    # Volatilità
+    if high_volatility is None:
+        high_volatility = current['volatility'] > np.percentile(df['volatility'].dropna(), indicators.VOLATILITY_PERCENTILE)
+    
+    # Live: stessa logica vettoriale applicata solo all'ultima riga
+    score = float(_optimized_ml_score(df.iloc[-1:], high_volatility)[0])
     
     # 🚀 SOGLIE PIÙ REATTIVE
-    if score > 0.55:    # OTTIMIZZATO: era 0.6
-        return "BUY", score
-    elif score < 0.45:  # OTTIMIZZATO: era 0.4
-        return "SELL", score
-    else:
-        return "HOLD", score
+    return indicators.score_signals(score, OPTIMIZED_BUY_ABOVE, OPTIMIZED_SELL_BELOW).item(), score
 
-def analyze_crypto(symbol):
-    """Analizza una crypto con ML ottimizzato"""
-    try:
-        # Download dati
-        df = download_crypto_data(symbol, days=100)
-        if df is None or len(df) < 40:
-            return "HOLD", 0.5, 0
-            
-        # Calcola indicatori
-        df = calculate_advanced_indicators(df)
-        df = df.dropna()
-        
-        if len(df) < 40:
-            return "HOLD", 0.5, 0
-            
-        current_price = df.iloc[-1]['close']
-        signal, confidence = optimized_ml_strategy(df)
+def evaluate_optimized_ml(symbol, df):
+    """Segnale, confidenza e prezzo dalle candele grezze (ultima = candela in corso)"""
+    # Calcola indicatori: solo le candele nuove, stesse righe di
+    # calculate_advanced_indicators(df).dropna()
+    df = INDICATORS.frame(symbol, df)
+    
+    if len(df) < STRATEGY_MIN_BARS:
+        return "HOLD", 0.5, 0
         
-        return signal, confidence, current_price
+    current_price = df.iloc[-1]['close']
+    signal, confidence = optimized_ml_strategy(df, INDICATORS.high_volatility(symbol))
+    
+    return signal, confidence, current_price
+
+OPTIMIZED_ML.evaluate = evaluate_optimized_ml
+
+def analyze_crypto(symbol, provider=None, interval=None):
+    """Analizza una crypto con ML ottimizzato (candele MARKET_INTERVAL o `interval`)"""
+    try:
+        # Registro strategie: download del lookback dichiarato, valutazione
+        # saltata se le candele non sono cambiate dall'ultimo ciclo
+        results = strategies.run_all(symbol, [OPTIMIZED_ML.name], provider, interval or MARKET_INTERVAL)
+        return results.get(OPTIMIZED_ML.name, ("HOLD", 0.5, 0))
         
     except Exception as e:
         print(f"❌ Errore analisi {symbol}: {e}")
         return "HOLD", 0.5, 0
 
+def analyze_portfolio(executor, symbols, provider=None):
+    """Analizza tutti i simboli in parallelo, risultati nell'ordine del portfolio"""
+    # executor.map restituisce i risultati nell'ordine degli input:
+    # il ciclo dura quanto il simbolo più lento, non la somma di tutti
+    results = executor.map(lambda symbol: analyze_crypto(symbol, provider), symbols)
+    return list(zip(symbols, results))
+
 # ==================== BOT PRINCIPALE ====================
-def professional_bot():
-    trader = ProfessionalTrader()
+def professional_bot(provider=None):
+    if provider is None and USE_MARKET_STREAM:
+        provider = StreamProvider([crypto['symbol'] for crypto in CRYPTO_PORTFOLIO], interval=MARKET_INTERVAL)
+    provider = provider_for(MARKET_INTERVAL, provider)
+    trader = ProfessionalTrader(provider)
+    executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix="analysis")
+    symbols = [crypto['symbol'] for crypto in CRYPTO_PORTFOLIO]
     
     print("🧠 AVVIO BOT PRO - MULTI-CRYPTO & TRAILING STOP")
     print("🎯 Soglie ottimizzate: BUY > 0.55, SELL < 0.45")
     
+    if isinstance(provider, StreamProvider):
+        # Ogni tick va subito alla gestione posizioni; le klines chiuse allo store
+        provider.add_listener(trader.on_price_update)
+        provider.start()
+        print("📡 Modalità stream attiva: gestione posizioni in tempo reale")
+    
     monitor_count = 0
     
     while True:
@@ -403,14 +474,9 @@ def professional_bot():
                 trader.monitor_open_positions()
                 monitor_count = 0
             
-            # Analizza ogni crypto nel portfolio
-            for crypto in CRYPTO_PORTFOLIO:
-                symbol = crypto['symbol']
-                
-                # Analizza la crypto
-                signal, confidence, price = analyze_crypto(symbol)
-                
-                if signal in ["BUY", "SELL"] and confidence > 0.6:
+            # Analizza tutte le crypto del portfolio in parallelo
+            for symbol, (signal, confidence, price) in analyze_portfolio(executor, symbols, provider):
+                if signal in ["BUY", "SELL"] and confidence > MIN_CONFIDENCE:
                     timestamp = datetime.now().strftime('%H:%M:%S')
                     print(f"⏰ {timestamp} | 🧠 {symbol}: {signal} (score: {confidence:.2f}) | 💰 ${price:.2f}")
                     trader.execute_paper_trade(symbol, signal, price, confidence)
@@ -427,8 +493,9 @@ def simple_monitor():
     """Monitoraggio semplice prezzi"""
     while True:
         try:
+            prices = PRICES.get_prices([crypto['symbol'] for crypto in CRYPTO_PORTFOLIO])
             for crypto in CRYPTO_PORTFOLIO:
-                price = get_current_price(crypto['symbol'])
+                price = prices.get(crypto['symbol'])
                 if price:
                     timestamp = datetime.now().strftime('%H:%M:%S')
                     print(f"✅ {crypto['symbol']}: {price:.2f}$ - {timestamp}")
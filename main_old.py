@@ -9,15 +9,13 @@ print("🤖 TRADING BOT ATTIVO - ML OTTIMIZZATO")
 
 def simple_bot():
     """Bot semplice di monitoraggio"""
-    import requests
+    from price_service import PRICES
     
     while True:
         try:
-            url = "https://api.binance.com/api/v3/ticker/price"
-            params = {"symbol": "BTCUSDT"}
-            response = requests.get(url, params=params)
-            data = response.json()
-            price = float(data['price'])
+            price = PRICES.get_price("BTCUSDT")
+            if price is None:
+                raise ValueError("BTCUSDT non quotato")
             
             print(f"✅ BTC/USDT: {price:.2f}$ - {time.strftime('%H:%M:%S')}")
             
@@ -31,10 +29,15 @@ def ml_bot():
     """Bot ML OTTIMIZZATO - più bilanciato"""
     try:
         # Import qui per evitare errori all'avvio
-        import pandas as pd
         import numpy as np
-        import requests
         from datetime import datetime
+        import indicators
+        import strategies
+        
+        # Indicatori usati + righe valutate: il punteggio guarda solo l'ultima riga,
+        # servono 40 righe complete per il controllo iniziale (rows = righe minime)
+        OPTIMIZED_ML_OLD = strategies.register('optimized_ml_old', strategies.OPTIMIZED_ML_INDICATORS, rows=40)
+        MIN_ROWS = OPTIMIZED_ML_OLD.rows
         
         print("🧠 INIZIALIZZAZIONE ML BOT OTTIMIZZATO")
         print("🔧 Soglie: BUY > 0.6, SELL < 0.4 (prima: 0.7/0.3)")
@@ -54,22 +57,8 @@ def ml_bot():
                 df['sma_30'] = prices.rolling(30).mean()
                 df['sma_5'] = prices.rolling(5).mean()  # Aggiunta
                 
-                # 2. RSI migliorato
-                def improved_rsi(prices, period=14):
-                    deltas = prices.diff()
-                    gains = deltas.where(deltas > 0, 0)
-                    losses = -deltas.where(deltas < 0, 0)
-                    
-                    avg_gains = gains.rolling(period).mean()
-                    avg_losses = losses.rolling(period).mean()
-                    
-                    # Evita divisione per zero
-                    avg_losses = avg_losses.where(avg_losses != 0, 0.0001)
-                    rs = avg_gains / avg_losses
-                    rsi = 100 - (100 / (1 + rs))
-                    return rsi
-                
-                df['rsi'] = improved_rsi(prices)
+                # 2. RSI (libreria indicatori condivisa)
+                df['rsi'] = indicators.rsi(prices)
                 
                 # 3. Momentum avanzato
                 df['momentum_5'] = prices.pct_change(5)
@@ -93,115 +82,85 @@ def ml_bot():
                 
                 return df
             
-            def download_historical_data(self, symbol, days=200):
-                """Download dati con più history"""
-                try:
-                    url = "https://api.binance.com/api/v3/klines"
-                    params = {
-                        "symbol": symbol,
-                        "interval": "1d",
-                        "limit": min(days, 400)
-                    }
-                    
-                    response = requests.get(url, params=params, timeout=15)
-                    data = response.json()
-                    
-                    if not data:
-                        return None
-                    
-                    df = pd.DataFrame(data, columns=[
-                        'timestamp', 'open', 'high', 'low', 'close', 'volume',
-                        'close_time', 'quote_asset_volume', 'number_of_trades',
-                        'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
-                    ])
-                    
-                    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-                    df['close'] = df['close'].astype(float)
-                    df['volume'] = df['volume'].astype(float)
-                    
-                    return df.sort_values('timestamp').dropna()
-                    
-                except Exception as e:
-                    print(f"❌ Errore download {symbol}: {e}")
-                    return None
-            
-            def optimized_ml_strategy(self, df):
-                """Strategia ML OTTIMIZZATA - più bilanciata"""
-                if len(df) < 40:
-                    return "HOLD", 0.5
-                
-                # Features avanzate
-                current = df.iloc[-1]
-                prices = df['close'].values
-                
+            def _optimized_score(self, df):
+                """Punteggio ottimizzato per ogni riga di df (maschere booleane)"""
                 # 1. Trend multiplo
-                trend_up_short = current['sma_5'] > current['sma_10']
-                trend_up_medium = current['sma_10'] > current['sma_30']
-                strong_uptrend = trend_up_short and trend_up_medium
-                strong_downtrend = not trend_up_short and not trend_up_medium
+                trend_up_short = df['sma_5'].values > df['sma_10'].values
+                trend_up_medium = df['sma_10'].values > df['sma_30'].values
+                strong_uptrend = trend_up_short & trend_up_medium
+                strong_downtrend = ~trend_up_short & ~trend_up_medium
                 
                 # 2. RSI conditions avanzate
-                rsi_oversold = current['rsi'] < 32  # Più sensibile
-                rsi_overbought = current['rsi'] > 68  # Più sensibile
-                rsi_neutral = 40 <= current['rsi'] <= 60
+                rsi = df['rsi'].values
+                rsi_oversold = rsi < 32  # Più sensibile
+                rsi_overbought = rsi > 68  # Più sensibile
+                rsi_neutral = (40 <= rsi) & (rsi <= 60)
                 
                 # 3. Momentum avanzato
-                momentum_very_positive = current['momentum_3'] > 0.02  # 2% in 3 giorni
-                momentum_very_negative = current['momentum_3'] < -0.02
+                momentum_very_positive = df['momentum_3'].values > 0.02  # 2% in 3 giorni
+                momentum_very_negative = df['momentum_3'].values < -0.02
                 
-                # 4. Volatility e volume
-                high_volatility = current['volatility'] > np.percentile(df['volatility'].dropna(), 70)
-                volume_spike = current['volume_ratio'] > 1.3
+                # 4. Volume (la volatilità non entra nel punteggio: niente percentile)
+                volume_spike = df['volume_ratio'].values > 1.3
                 
                 # 5. Posizione prezzi
-                price_above_all_sma = (current['price_vs_sma5'] > 1 and 
-                                      current['price_vs_sma10'] > 1 and 
-                                      current['price_vs_sma30'] > 1)
-                price_below_all_sma = (current['price_vs_sma5'] < 1 and 
-                                      current['price_vs_sma10'] < 1 and 
-                                      current['price_vs_sma30'] < 1)
+                price_above_all_sma = ((df['price_vs_sma5'].values > 1) &
+                                       (df['price_vs_sma10'].values > 1) &
+                                       (df['price_vs_sma30'].values > 1))
+                price_below_all_sma = ((df['price_vs_sma5'].values < 1) &
+                                       (df['price_vs_sma10'].values < 1) &
+                                       (df['price_vs_sma30'].values < 1))
+                
+                # 🎯 SISTEMA DI SCORING OTTIMIZZATO (stesso ordine delle somme scalari)
+                score = np.full(len(df), 0.5)  # Neutral start
+                
+                # 🔥 BULLISH FACTORS
+                score = score + np.where(strong_uptrend, 0.25, 0.0)
+                score = score + np.where(rsi_oversold & trend_up_short, 0.3, 0.0)
+                score = score + np.where(rsi_oversold, 0.2, 0.0)
+                score = score + np.where(momentum_very_positive, 0.15, 0.0)
+                score = score + np.where(volume_spike & trend_up_short, 0.2, 0.0)
+                score = score + np.where(price_above_all_sma & rsi_neutral, 0.15, 0.0)
+                
+                # 🐻 BEARISH FACTORS
+                score = score - np.where(strong_downtrend, 0.25, 0.0)
+                score = score - np.where(rsi_overbought & ~trend_up_short, 0.3, 0.0)
+                score = score - np.where(rsi_overbought, 0.2, 0.0)
+                score = score - np.where(momentum_very_negative, 0.15, 0.0)
+                score = score - np.where(volume_spike & ~trend_up_short, 0.2, 0.0)
+                score = score - np.where(price_below_all_sma & rsi_neutral, 0.15, 0.0)
                 
-                # 🎯 SISTEMA DI SCORING OTTIMIZZATO
-                score = 0.5  # Neutral start
+                # 🎯 NORMALIZZAZIONE
+                return np.clip(score, 0.1, 0.9)
+            
+            def optimized_ml_scores(self, df, buy_above=0.6, sell_below=0.4):
+                """Punteggi e segnali per tutta la storia (riga i = optimized_ml_strategy(df.iloc[:i+1]))"""
+                scores = self._optimized_score(df)
+                scores[:MIN_ROWS - 1] = 0.5
+                signals = indicators.score_signals(scores, buy_above, sell_below)
+                signals[:MIN_ROWS - 1] = "HOLD"
+                return scores, signals
+            
+            def optimized_ml_strategy(self, df):
+                """Strategia ML OTTIMIZZATA - più bilanciata"""
+                if len(df) < MIN_ROWS:
+                    return "HOLD", 0.5
                 
-                # 🔥 BULLISH FACTORS (più aggressivi)
-                if strong_uptrend:
-                    score += 0.25  # ERA 0.2
-                if rsi_oversold and trend_up_short:
-                    score += 0.3   # NUOVO: Combo potente
-                if rsi_oversold:
-                    score += 0.2   # ERA 0.15
-                if momentum_very_positive:
-                    score += 0.15  # NUOVO
-                if volume_spike and trend_up_short:
-                    score += 0.2   # NUOVO: Volume + trend
-                if price_above_all_sma and rsi_neutral:
-                    score += 0.15  # NUOVO: Breakout con RSI ok
-                    
-                # 🐻 BEARISH FACTORS (più bilanciati)  
-                if strong_downtrend:
-                    score -= 0.25  # ERA 0.2
-                if rsi_overbought and not trend_up_short:
-                    score -= 0.3   # NUOVO: Combo potente
-                if rsi_overbought:
-                    score -= 0.2   # ERA 0.15
-                if momentum_very_negative:
-                    score -= 0.15  # NUOVO
-                if volume_spike and not trend_up_short:
-                    score -= 0.2   # NUOVO: Volume + downtrend
-                if price_below_all_sma and rsi_neutral:
-                    score -= 0.15  # NUOVO: Breakdown con RSI ok
+                # Live: stessa logica vettoriale sull'ultima riga
+                score = float(self._optimized_score(df.iloc[-1:])[0])
                 
-                # 🎯 NORMALIZZAZIONE
-                score = max(0.1, min(0.9, score))
+                # 🚀 DECISIONE OTTIMIZZATA: BUY > 0.6, SELL < 0.4 (erano 0.7/0.3)
+                return indicators.score_signals(score, 0.6, 0.4).item(), score
+            
+            def evaluate(self, symbol, df):
+                """Segnale, score e prezzo dalle candele grezze (None se dati insufficienti)"""
+                df = self.calculate_advanced_indicators(df).dropna()
+                if len(df) < MIN_ROWS:
+                    return None
                 
-                # 🚀 DECISIONE OTTIMIZZATA
-                if score > 0.6:    # OTTIMIZZATO: ERA 0.7 → più BUY
-                    return "BUY", score
-                elif score < 0.4:  # OTTIMIZZATO: ERA 0.3 → più SELL
-                    return "SELL", score
-                else:
-                    return "HOLD", score
+                # Strategia ML ottimizzata
+                signal, confidence = self.optimized_ml_strategy(df)
+                return signal, confidence, df.iloc[-1]['close']
             
             def run_optimized_bot(self):
                 """Bot ML ottimizzato"""
@@ -210,24 +169,17 @@ def ml_bot():
                 
                 while True:
                     try:
-                        # Scarica dati
-                        df = self.download_historical_data("BTCUSDT", days=200)
-                        if df is None or len(df) < 40:
+                        # Registro strategie: download del lookback dichiarato + valutazione
+                        results = strategies.run_all("BTCUSDT", [OPTIMIZED_ML_OLD.name],
+                                                     evaluators={OPTIMIZED_ML_OLD.name: self.evaluate})
+                        result = results.get(OPTIMIZED_ML_OLD.name)
+                        if result is None:
                             print("❌ Dati insufficienti per ML")
                             time.sleep(300)
                             continue
                         
-                        # Calcola indicatori avanzati
-                        df = self.calculate_advanced_indicators(df)
-                        df = df.dropna()
-                        
-                        if len(df) < 40:
-                            continue
-                        
-                        # Strategia ML ottimizzata
-                        signal, confidence = self.optimized_ml_strategy(df)
+                        signal, confidence, current_price = result
                         timestamp = datetime.now().strftime('%H:%M:%S')
-                        current_price = df.iloc[-1]['close']
                         
                         # Statistiche
                         if signal == "BUY":
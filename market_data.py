@@ -0,0 +1,164 @@
+import threading
+import numpy as np
+from candle_store import STORE, COLUMNS, OPEN_TIME, CLOSE_TIME, INTERVAL_MS, to_dataframe
+from price_service import PRICES
+from backfill import backfill_store
+from market_stream import MarketStream, STREAM_URL
+
+CLOSE = COLUMNS.index('close')
+
+# ==================== INTERFACCIA PROVIDER ====================
+class MarketDataProvider:
+    """Sorgente dati di mercato usata da trader, strategie e backtest.
+
+    get_klines  -> DataFrame di candele (come STORE.get_klines)
+    get_history -> solo candele chiuse da start_time in poi (backtest/training)
+    get_prices  -> {simbolo: prezzo} correnti
+    """
+
+    def get_klines(self, symbol, interval='1d', limit=None, start_time=None, include_live=True,
+                   fields=None, dtype=np.float64):
+        raise NotImplementedError
+
+    def get_history(self, symbol, interval='1d', start_time=None):
+        return self.get_klines(symbol, interval, start_time=start_time, include_live=False)
+
+    def get_prices(self, symbols):
+        raise NotImplementedError
+
+    def get_price(self, symbol):
+        return self.get_prices([symbol]).get(symbol)
+
+# ==================== BACKEND LIVE REST ====================
+class RestProvider(MarketDataProvider):
+    """Dati live via REST: candele dallo store locale, prezzi dalla cache bulk"""
+
+    def __init__(self, store=STORE, prices=PRICES):
+        self.store = store
+        self.prices = prices
+
+    def get_klines(self, symbol, interval='1d', limit=None, start_time=None, include_live=True,
+                   fields=None, dtype=np.float64):
+        return self.store.get_klines(symbol, interval, limit=limit, start_time=start_time,
+                                     include_live=include_live, fields=fields, dtype=dtype)
+
+    def get_history(self, symbol, interval='1d', start_time=None):
+        # Storico lungo: backfill parallelo dei buchi, poi lettura locale
+        if start_time is not None:
+            backfill_store(symbol, interval, start_time, store=self.store)
+        return super().get_history(symbol, interval, start_time)
+
+    def get_prices(self, symbols):
+        return self.prices.get_prices(symbols)
+
+# ==================== BACKEND LIVE STREAM ====================
+class StreamProvider(RestProvider):
+    """Dati live via WebSocket: prezzi dall'ultimo tick, candele dallo store aggiornato dallo stream"""
+
+    def __init__(self, symbols, interval='1d', url=STREAM_URL, store=STORE, prices=PRICES):
+        super().__init__(store, prices)
+        self.stream = MarketStream(symbols, interval, url, on_price=self._dispatch, store=store)
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback):
+        """Registra una callback(symbol, price) chiamata a ogni tick"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def _dispatch(self, symbol, price):
+        with self._lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            callback(symbol, price)
+
+    def start(self):
+        return self.stream.start()
+
+    def stop(self, timeout=None):
+        self.stream.stop(timeout)
+
+    def get_prices(self, symbols):
+        result = self.stream.fresh_prices(symbols)
+        missing = [s for s in symbols if s not in result]
+        # Nessun tick recente (stream non ancora partito, disconnesso o muto): si ripiega sul REST
+        if missing:
+            result.update(super().get_prices(missing))
+        return result
+
+# ==================== BACKEND REPLAY DA FILE ====================
+def capture_key(symbol, interval):
+    return f"{symbol.upper()}|{interval}"
+
+def save_capture(path, symbols, interval='1d', start_time=None, provider=None):
+    """Registra su file (.npz) le candele di più simboli per replay offline"""
+    provider = provider or REST_PROVIDER
+    arrays = {}
+    for symbol in symbols:
+        df = provider.get_history(symbol, interval, start_time=start_time)
+        block = np.vstack([
+            df['timestamp'].values.astype('datetime64[ms]').astype(np.int64)
+            if name == 'timestamp' else df[name].to_numpy(dtype=np.float64)
+            for name in COLUMNS
+        ]).astype(np.float64)
+        arrays[capture_key(symbol, interval)] = block
+    np.savez(path, **arrays)
+    return path
+
+class ReplayProvider(MarketDataProvider):
+    """Dati registrati su file, senza rete e senza attese.
+
+    Un orologio simulato (`now`, in ms) decide quali candele sono visibili:
+    solo quelle chiuse prima di `now`, così una strategia non vede mai il
+    futuro. Il prezzo corrente è la chiusura dell'ultima candela visibile.
+    """
+
+    def __init__(self, path, now=None):
+        with np.load(path) as capture:
+            self.blocks = {key: capture[key] for key in capture.files}
+        self.now = now if now is not None else self.end_time()
+
+    def end_time(self):
+        """Istante dopo l'ultima candela registrata"""
+        return max(int(block[CLOSE_TIME, -1]) + 1 for block in self.blocks.values() if block.shape[1])
+
+    def advance_to(self, timestamp_ms):
+        """Sposta l'orologio simulato"""
+        self.now = int(timestamp_ms)
+
+    def timeline(self, interval='1d'):
+        """Istanti di chiusura di tutte le candele registrate per un intervallo"""
+        times = [block[CLOSE_TIME] + 1 for key, block in self.blocks.items()
+                 if key.endswith('|' + interval)]
+        return np.unique(np.concatenate(times)).astype(np.int64) if times else np.empty(0, np.int64)
+
+    def _visible(self, symbol, interval):
+        block = self.blocks.get(capture_key(symbol, interval))
+        if block is None:
+            raise KeyError(f"{symbol} {interval} non presente nella registrazione")
+        end = np.searchsorted(block[CLOSE_TIME], self.now, side='left')
+        return block[:, :end]
+
+    def get_klines(self, symbol, interval='1d', limit=None, start_time=None, include_live=True,
+                   fields=None, dtype=np.float64):
+        block = self._visible(symbol, interval)
+        if start_time is None and limit is not None:
+            start_time = self.now - (limit + 1) * INTERVAL_MS[interval]
+        if start_time is not None:
+            block = block[:, np.searchsorted(block[OPEN_TIME], start_time):]
+        if limit is not None:
+            block = block[:, -limit:]
+        return to_dataframe(block, fields, dtype)
+
+    def get_prices(self, symbols):
+        prices = {}
+        for symbol in symbols:
+            for key, block in self.blocks.items():
+                if key.startswith(symbol.upper() + '|'):
+                    end = np.searchsorted(block[CLOSE_TIME], self.now, side='left')
+                    if end:
+                        prices[symbol] = float(block[CLOSE, end - 1])
+                    break
+        return prices
+
+REST_PROVIDER = RestProvider()
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import asyncio
+import random
+import threading
+import numpy as np
+import websockets
+from candle_store import STORE, COLUMNS
+
+# ==================== CONFIGURAZIONE STREAM ====================
+BINANCE_STREAM_URL = "wss://stream.binance.com:9443/stream"
+STREAM_URL = os.getenv('MARKET_STREAM_URL', BINANCE_STREAM_URL)
+RECONNECT_MAX = 60           # Secondi massimi tra due riconnessioni
+PRICE_MAX_AGE = float(os.getenv('STREAM_PRICE_MAX_AGE', 60))   # Oltre questi secondi senza tick il prezzo è scaduto
+
+def stream_names(symbols, interval='1d'):
+    """Nomi degli stream Binance: kline + book ticker per ogni simbolo"""
+    names = []
+    for symbol in symbols:
+        names.append(f"{symbol.lower()}@kline_{interval}")
+        names.append(f"{symbol.lower()}@bookTicker")
+    return names
+
+def stream_url(symbols, interval='1d', base_url=STREAM_URL):
+    """URL dello stream combinato"""
+    return f"{base_url}?streams={'/'.join(stream_names(symbols, interval))}"
+
+def parse_message(raw):
+    """Decodifica un messaggio dello stream combinato in un evento.
+
+    kline  -> {'type': 'kline', 'symbol', 'interval', 'closed', 'price', 'block'}
+    ticker -> {'type': 'ticker', 'symbol', 'bid', 'ask', 'price'}
+    """
+    message = json.loads(raw) if isinstance(raw, (str, bytes)) else raw
+    data = message.get('data', message)
+
+    if data.get('e') == 'kline':
+        k = data['k']
+        row = [k['t'], k['o'], k['h'], k['l'], k['c'], k['v'], k['T']]
+        block = np.array(row, dtype=np.float64).reshape(len(COLUMNS), 1)
+        return {
+            'type': 'kline',
+            'symbol': data['s'],
+            'interval': k['i'],
+            'closed': bool(k['x']),
+            'price': float(k['c']),
+            'block': block,
+        }
+
+    if 'b' in data and 'a' in data and 's' in data:
+        bid, ask = float(data['b']), float(data['a'])
+        # Per chiudere un LONG conta il prezzo bid
+        return {'type': 'ticker', 'symbol': data['s'], 'bid': bid, 'ask': ask, 'price': bid}
+
+    return None
+
+# ==================== STREAM DI MERCATO ====================
+class MarketStream:
+    """Ingestione event-driven di klines e book ticker via WebSocket.
+
+    Ogni aggiornamento di prezzo va subito a on_price (es. gestione stop /
+    trailing / take profit del trader); le klines chiuse finiscono nello
+    store delle candele. Gira in un thread dedicato con il proprio event loop
+    e si riconnette da solo con backoff.
+    """
+
+    def __init__(self, symbols, interval='1d', url=STREAM_URL, on_price=None, on_kline=None,
+                 store=STORE, record_path=None):
+        self.symbols = list(symbols)
+        self.interval = interval
+        self.url = url
+        self.on_price = on_price
+        self.on_kline = on_kline
+        self.store = store
+        self.record_path = record_path
+        self.last_prices = {}
+        self.last_ticks = {}
+        self.messages = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def handle(self, raw):
+        """Smista un messaggio grezzo verso trader e store"""
+        event = parse_message(raw)
+        if event is None:
+            return None
+        self.messages += 1
+        symbol = event['symbol']
+        self.last_prices[symbol] = event['price']
+        self.last_ticks[symbol] = time.time()
+
+        if event['type'] == 'kline':
+            if event['closed'] and self.store is not None:
+                self.store.append_closed(symbol, event['interval'], event['block'])
+            if self.on_kline:
+                self.on_kline(symbol, event)
+
+        if self.on_price:
+            self.on_price(symbol, event['price'])
+        return event
+
+    async def run(self):
+        """Loop di ricezione con riconnessione automatica"""
+        url = stream_url(self.symbols, self.interval, self.url)
+        record = open(self.record_path, 'a') if self.record_path else None
+        attempt = 0
+        try:
+            while not self._stop.is_set():
+                try:
+                    async with websockets.connect(url, ping_interval=20) as ws:
+                        print(f"📡 Stream connesso: {len(self.symbols)} simboli ({self.interval})")
+                        attempt = 0
+                        async for raw in ws:
+                            if record:
+                                record.write(raw if isinstance(raw, str) else raw.decode())
+                                record.write('\n')
+                            try:
+                                self.handle(raw)
+                            except Exception as e:
+                                print(f"❌ Errore evento stream: {e}")
+                            if self._stop.is_set():
+                                break
+                except (OSError, websockets.WebSocketException) as e:
+                    print(f"❌ Stream disconnesso: {e}")
+                # Senza connessione gli ultimi prezzi non sono più affidabili
+                self.clear_prices()
+
+                if self._stop.is_set():
+                    break
+                attempt += 1
+                await asyncio.sleep(random.uniform(0, min(RECONNECT_MAX, 2 ** attempt)))
+        finally:
+            if record:
+                record.close()
+
+    def clear_prices(self):
+        self.last_prices.clear()
+        self.last_ticks.clear()
+
+    def fresh_prices(self, symbols, max_age=PRICE_MAX_AGE):
+        """Ultimi prezzi ricevuti da meno di max_age secondi (i simboli scaduti mancano)"""
+        now = time.time()
+        prices = {}
+        for symbol in symbols:
+            price, tick = self.last_prices.get(symbol), self.last_ticks.get(symbol)
+            if price is not None and tick is not None and now - tick <= max_age:
+                prices[symbol] = price
+        return prices
+
+    def start(self):
+        """Avvia lo stream in un thread daemon"""
+        self._thread = threading.Thread(target=lambda: asyncio.run(self.run()), daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout=None):
+        """Ferma lo stream (al prossimo messaggio o riconnessione)"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
@@ -1,55 +1,55 @@
 import pandas as pd
 import numpy as np
-import requests
 from datetime import datetime, timedelta
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 import joblib
 import time
+from resample import provider_for
+import indicators
+import strategies
 
 print("🧠 TRADING BOT CON MACHINE LEARNING")
 
+# Feature del modello: la predizione usa solo l'ultima riga, il lookback
+# è il riscaldamento dell'indicatore più lento (MACD signal)
+ML_FEATURES = strategies.register('ml_random_forest', [
+    ('sma', {'window': 5}), ('sma', {'window': 20}),
+    ('rsi', {'period': 14}),
+    ('macd', {'fast': 12, 'slow': 26}), ('macd_signal', {'fast': 12, 'slow': 26, 'signal': 9}),
+    ('bb_upper', {'window': 20, 'width': 2}), ('bb_lower', {'window': 20, 'width': 2}),
+    ('momentum', {'periods': 1}), ('momentum', {'periods': 5}), ('momentum', {'periods': 20}),
+], rows=1)
+
 class MLTrader:
-    def __init__(self):
+    def __init__(self, provider=None, interval="1d"):
+        self.provider = provider_for(interval, provider)
+        self.interval = interval
         self.model = None
         self.is_trained = False
         
-    def calculate_technical_indicators(self, df):
-        """Calcola indicatori tecnici per features ML"""
+    def calculate_technical_indicators(self, df, symbol=None, interval="1d"):
+        """Calcola indicatori tecnici per features ML (in cache se il simbolo è noto)"""
         # Prezzi
         prices = df['close'].astype(float)
+        key = indicators.series_key(symbol, interval, df)
         
         # 1. Media Mobile 5 e 20 periodi
-        df['sma_5'] = prices.rolling(5).mean()
-        df['sma_20'] = prices.rolling(20).mean()
+        df['sma_5'] = indicators.compute('sma', prices, key, window=5)
+        df['sma_20'] = indicators.compute('sma', prices, key, window=20)
         
         # 2. RSI
-        def compute_rsi(prices, period=14):
-            deltas = np.diff(prices)
-            gains = np.where(deltas > 0, deltas, 0)
-            losses = np.where(deltas < 0, -deltas, 0)
-            
-            avg_gains = pd.Series(gains).rolling(period).mean()
-            avg_losses = pd.Series(losses).rolling(period).mean()
-            
-            rs = avg_gains / avg_losses
-            rsi = 100 - (100 / (1 + rs))
-            return rsi
-        
-        df['rsi'] = compute_rsi(prices)
+        df['rsi'] = indicators.compute('rsi', prices, key, period=14)
         
         # 3. MACD
-        exp12 = prices.ewm(span=12).mean()
-        exp26 = prices.ewm(span=26).mean()
-        df['macd'] = exp12 - exp26
-        df['macd_signal'] = df['macd'].ewm(span=9).mean()
+        df['macd'] = indicators.compute('macd', prices, key, fast=12, slow=26)
+        df['macd_signal'] = indicators.compute('macd_signal', prices, key, fast=12, slow=26, signal=9)
         
         # 4. Bollinger Bands
-        df['bb_middle'] = prices.rolling(20).mean()
-        bb_std = prices.rolling(20).std()
-        df['bb_upper'] = df['bb_middle'] + (bb_std * 2)
-        df['bb_lower'] = df['bb_middle'] - (bb_std * 2)
+        df['bb_middle'] = df['sma_20']
+        df['bb_upper'] = indicators.compute('bb_upper', prices, key, window=20, width=2)
+        df['bb_lower'] = indicators.compute('bb_lower', prices, key, window=20, width=2)
         df['bb_position'] = (prices - df['bb_lower']) / (df['bb_upper'] - df['bb_lower'])
         
         # 5. Volume (se disponibile)
@@ -60,9 +60,9 @@ class MLTrader:
             df['volume_ratio'] = 1.0
         
         # 6. Momentum
-        df['momentum_1'] = prices.pct_change(1)
-        df['momentum_5'] = prices.pct_change(5)
-        df['momentum_20'] = prices.pct_change(20)
+        df['momentum_1'] = indicators.compute('momentum', prices, key, periods=1)
+        df['momentum_5'] = indicators.compute('momentum', prices, key, periods=5)
+        df['momentum_20'] = indicators.compute('momentum', prices, key, periods=20)
         
         return df
     
@@ -110,7 +110,7 @@ class MLTrader:
             return False
         
         # Calcola indicatori
-        df = self.calculate_technical_indicators(df)
+        df = self.calculate_technical_indicators(df, symbol, self.interval)
         
         # Crea features e target
         X, y, df_clean = self.create_features_target(df)
@@ -146,36 +146,18 @@ class MLTrader:
         self.is_trained = True
         return True
     
-    def download_historical_data(self, symbol, years=2):
-        """Scarica dati storici (versione semplificata)"""
+    def download_historical_data(self, symbol, years=2, days=None):
+        """Scarica dati storici (store locale + sync incrementale)"""
         try:
             # Per velocità, usiamo meno dati
-            url = "https://api.binance.com/api/v3/klines"
-            days = years * 365
+            days = days or int(years * 365)
             limit = min(days, 500)  # Massimo 500 punti
             
-            params = {
-                "symbol": symbol,
-                "interval": "1d",
-                "limit": limit
-            }
+            df = self.provider.get_klines(symbol, self.interval, limit=limit)
             
-            response = requests.get(url, params=params, timeout=10)
-            data = response.json()
-            
-            if not data:
+            if df.empty:
                 return None
             
-            df = pd.DataFrame(data, columns=[
-                'timestamp', 'open', 'high', 'low', 'close', 'volume',
-                'close_time', 'quote_asset_volume', 'number_of_trades',
-                'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
-            ])
-            
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df['close'] = df['close'].astype(float)
-            df['volume'] = df['volume'].astype(float)
-            
             return df.sort_values('timestamp')
             
         except Exception as e:
@@ -202,12 +184,12 @@ class MLTrader:
     def get_current_features(self, symbol="BTCUSDT"):
         """Ottiene features correnti per predizione"""
         try:
-            # Scarica ultimi 50 giorni per calcolare indicatori
-            df = self.download_historical_data(symbol, years=0.2)  # ~70 giorni
-            if df is None:
+            # Scarica solo le candele che servono agli indicatori delle feature
+            df = strategies.fetch_inputs(symbol, [ML_FEATURES.name], self.provider, self.interval)[self.interval]
+            if df.empty:
                 return None
             
-            df = self.calculate_technical_indicators(df)
+            df = self.calculate_technical_indicators(df, symbol, self.interval)
             
             # Prendi l'ultima riga (oggi)
             last_row = df.iloc[-1]
@@ -224,9 +206,9 @@ class MLTrader:
             print(f"❌ Errore features: {e}")
             return None
 
-def ml_trading_bot():
+def ml_trading_bot(provider=None):
     """Bot di trading con ML"""
-    trader = MLTrader()
+    trader = MLTrader(provider)
     
     print("🧠 INIZIALIZZAZIONE ML TRADING BOT")
     print("=====================================")
@@ -1,49 +1,53 @@
-import pandas as pd
 import numpy as np
-import requests
 from datetime import datetime, timedelta
 import time
+from resample import provider_for
+import indicators
+import strategies
 import warnings
 warnings.filterwarnings('ignore')
 
 print("🧠 ML TRADING BOT - VERSIONE SICURA")
 
+# Soglie della strategia semplice
+SIMPLE_BUY_ABOVE = 0.7
+SIMPLE_SELL_BELOW = 0.3
+SIMPLE_MIN_BARS = 40
+
+# Indicatori usati + righe valutate (finestra della mediana di volatilità)
+SIMPLE_ML = strategies.register('simple_ml', [
+    ('sma', {'window': 10}), ('sma', {'window': 30}),
+    ('rsi', {'period': 14}),
+    ('momentum', {'periods': 5}), ('momentum', {'periods': 10}),
+    ('volatility', {'window': 20}),
+], rows=151)
+
 class SimpleMLTrader:
-    def __init__(self):
+    def __init__(self, provider=None, interval="1d"):
+        self.provider = provider_for(interval, provider)
+        self.interval = interval
         self.model = None
         self.is_trained = False
+        self._regimes = {}
         
-    def calculate_simple_indicators(self, df):
-        """Indicatori semplici senza dipendenze complesse"""
+    def calculate_simple_indicators(self, df, symbol=None, interval="1d"):
+        """Indicatori semplici senza dipendenze complesse (in cache se il simbolo è noto)"""
         prices = df['close'].astype(float)
+        key = indicators.series_key(symbol, interval, df)
         
         # 1. Media Mobile semplice
-        df['sma_10'] = prices.rolling(10).mean()
-        df['sma_30'] = prices.rolling(30).mean()
-        
-        # 2. RSI semplificato
-        def simple_rsi(prices, period=14):
-            deltas = prices.diff()
-            gains = deltas.where(deltas > 0, 0)
-            losses = -deltas.where(deltas < 0, 0)
-            
-            avg_gains = gains.rolling(period).mean()
-            avg_losses = losses.rolling(period).mean()
-            
-            # Evita divisione per zero
-            avg_losses = avg_losses.where(avg_losses != 0, 0.0001)
-            rs = avg_gains / avg_losses
-            rsi = 100 - (100 / (1 + rs))
-            return rsi
-        
-        df['rsi'] = simple_rsi(prices)
+        df['sma_10'] = indicators.compute('sma', prices, key, window=10)
+        df['sma_30'] = indicators.compute('sma', prices, key, window=30)
+        
+        # 2. RSI
+        df['rsi'] = indicators.compute('rsi', prices, key, period=14)
         
         # 3. Momentum semplice
-        df['momentum_5'] = prices.pct_change(5)
-        df['momentum_10'] = prices.pct_change(10)
+        df['momentum_5'] = indicators.compute('momentum', prices, key, periods=5)
+        df['momentum_10'] = indicators.compute('momentum', prices, key, periods=10)
         
         # 4. Volatilità
-        df['volatility'] = prices.rolling(20).std()
+        df['volatility'] = indicators.compute('volatility', prices, key, window=20)
         
         # 5. Posizione relativa
         df['price_vs_sma10'] = prices / df['sma_10']
@@ -51,93 +55,97 @@ class SimpleMLTrader:
         
         return df
     
-    def download_historical_data(self, symbol, days=180):
-        """Download dati semplificato"""
-        try:
-            url = "https://api.binance.com/api/v3/klines"
-            params = {
-                "symbol": symbol,
-                "interval": "1d",
-                "limit": min(days, 365)
-            }
-            
-            response = requests.get(url, params=params, timeout=15)
-            data = response.json()
-            
-            if not data:
-                return None
-            
-            df = pd.DataFrame(data, columns=[
-                'timestamp', 'open', 'high', 'low', 'close', 'volume',
-                'close_time', 'quote_asset_volume', 'number_of_trades',
-                'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
-            ])
-            
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df['close'] = df['close'].astype(float)
-            df['volume'] = df['volume'].astype(float)
-            
-            return df.sort_values('timestamp').dropna()
-            
-        except Exception as e:
-            print(f"❌ Errore download {symbol}: {e}")
-            return None
-    
-    def simple_ml_strategy(self, df):
-        """Strategia ML semplificata senza scikit-learn"""
-        if len(df) < 40:
-            return "HOLD", 0.5
-        
-        # Features semplici
-        current = df.iloc[-1]
-        prices = df['close'].values
-        
+    def _simple_score(self, df, high_volatility):
+        """Punteggio semplice per ogni riga di df (maschere booleane)"""
         # 1. Trend (sma10 > sma30 = uptrend)
-        trend_up = current['sma_10'] > current['sma_30']
+        trend_up = df['sma_10'].values > df['sma_30'].values
         
         # 2. RSI conditions
-        rsi_oversold = current['rsi'] < 35
-        rsi_overbought = current['rsi'] > 65
+        rsi_oversold = df['rsi'].values < 35
+        rsi_overbought = df['rsi'].values > 65
         
         # 3. Momentum
-        momentum_positive = current['momentum_5'] > 0
+        momentum_positive = df['momentum_5'].values > 0
         
-        # 4. Volatility adjustment
-        high_volatility = current['volatility'] > np.median(df['volatility'].dropna())
+        high_volatility = np.asarray(high_volatility, dtype=bool)
         
-        # Simple scoring system
-        score = 0.5  # Neutral start
+        # Simple scoring system (stesso ordine delle somme della versione scalare)
+        score = np.full(len(df), 0.5)  # Neutral start
         
         # Bullish factors
-        if trend_up:
-            score += 0.2
-        if rsi_oversold:
-            score += 0.15
-        if momentum_positive:
-            score += 0.1
-        if not high_volatility:
-            score += 0.05
-            
-        # Bearish factors  
-        if not trend_up:
-            score -= 0.2
-        if rsi_overbought:
-            score -= 0.15
-        if not momentum_positive:
-            score -= 0.1
-        if high_volatility:
-            score -= 0.05
+        score = score + np.where(trend_up, 0.2, 0.0)
+        score = score + np.where(rsi_oversold, 0.15, 0.0)
+        score = score + np.where(momentum_positive, 0.1, 0.0)
+        score = score + np.where(~high_volatility, 0.05, 0.0)
+        
+        # Bearish factors
+        score = score - np.where(~trend_up, 0.2, 0.0)
+        score = score - np.where(rsi_overbought, 0.15, 0.0)
+        score = score - np.where(~momentum_positive, 0.1, 0.0)
+        score = score - np.where(high_volatility, 0.05, 0.0)
         
         # Normalize score
-        score = max(0.1, min(0.9, score))
+        return np.clip(score, 0.1, 0.9)
+    
+    def simple_ml_scores(self, df, high_volatility=None, buy_above=SIMPLE_BUY_ABOVE, sell_below=SIMPLE_SELL_BELOW):
+        """Punteggi e segnali per tutta la storia (riga i = simple_ml_strategy(df.iloc[:i+1]))"""
+        if high_volatility is None:
+            volatility = df['volatility'].values
+            high_volatility = volatility > indicators.rolling_quantile(volatility, 50)
+        scores = self._simple_score(df, high_volatility)
+        scores[:SIMPLE_MIN_BARS - 1] = 0.5
+        signals = indicators.score_signals(scores, buy_above, sell_below)
+        signals[:SIMPLE_MIN_BARS - 1] = "HOLD"
+        return scores, signals
+    
+    def simple_ml_strategy(self, df, high_volatility=None):
+        """Strategia ML semplificata senza scikit-learn"""
+        if len(df) < SIMPLE_MIN_BARS:
+            return "HOLD", 0.5
+        
+        # 4. Volatility adjustment (sopra la mediana, se non già dato dal filtro di regime)
+        if high_volatility is None:
+            high_volatility = df['volatility'].iloc[-1] > np.median(df['volatility'].dropna())
+        
+        # Live: stessa logica vettoriale sull'ultima riga
+        score = float(self._simple_score(df.iloc[-1:], high_volatility)[0])
         
         # Decision
-        if score > 0.7:
-            return "BUY", score
-        elif score < 0.3:
-            return "SELL", score
-        else:
-            return "HOLD", score
+        return indicators.score_signals(score, SIMPLE_BUY_ABOVE, SIMPLE_SELL_BELOW).item(), score
+    
+    def high_volatility(self, symbol, df):
+        """Volatilità dell'ultima riga sopra la mediana di tutte le righe di df, in O(log n) per candela.
+
+        Come np.median(df['volatility']) in simple_ml_strategy, ma le righe
+        chiuse stanno in un RollingQuantile per simbolo a cui si aggiungono
+        solo quelle nuove; l'ultima (candela in corso) entra senza inserirla.
+        Se la finestra cambia lunghezza o non continua la precedente si riparte.
+        """
+        volatility = df['volatility'].to_numpy(dtype=float)
+        timestamps = df['timestamp'].tolist()
+        window = len(df) - 1
+        key = (symbol, self.interval)
+        regime, last = self._regimes.get(key, (None, None))
+        start = timestamps.index(last) + 1 if last in timestamps[:window] else None
+        if regime is None or regime.window != window or start is None:
+            regime, start = indicators.RollingQuantile(window), 0
+        for value in volatility[start:window]:
+            regime.add(value)
+        self._regimes[key] = (regime, timestamps[window - 1])
+        live = volatility[-1]
+        return bool(live > regime.quantile(50, extra=live))
+    
+    def evaluate(self, symbol, df):
+        """Segnale, score e prezzo dalle candele grezze (None se dati insufficienti)"""
+        df = self.calculate_simple_indicators(df, symbol, self.interval)
+        df = df.dropna()
+        
+        if len(df) < SIMPLE_MIN_BARS:
+            return None
+        
+        # Filtro di regime incrementale invece della mediana su tutta la storia
+        signal, confidence = self.simple_ml_strategy(df, self.high_volatility(symbol, df))
+        return signal, confidence, df.iloc[-1]['close']
     
     def run_ml_bot(self):
         """Bot ML semplificato"""
@@ -147,24 +155,18 @@ class SimpleMLTrader:
         
         while True:
             try:
-                # Scarica dati
-                df = self.download_historical_data("BTCUSDT", days=180)
-                if df is None or len(df) < 40:
+                # Registro strategie: il lookback dichiarato, indicatori + strategia
+                # saltati se le candele non sono cambiate
+                results = strategies.run_all("BTCUSDT", [SIMPLE_ML.name], self.provider, self.interval,
+                                             evaluators={SIMPLE_ML.name: self.evaluate})
+                result = results.get(SIMPLE_ML.name)
+                if result is None:
                     print("❌ Dati insufficienti")
                     time.sleep(300)
                     continue
                 
-                # Calcola indicatori
-                df = self.calculate_simple_indicators(df)
-                df = df.dropna()
-                
-                if len(df) < 40:
-                    continue
-                
-                # Strategia ML semplificata
-                signal, confidence = self.simple_ml_strategy(df)
+                signal, confidence, current_price = result
                 timestamp = datetime.now().strftime('%H:%M:%S')
-                current_price = df.iloc[-1]['close']
                 
                 print(f"⏰ {timestamp} | 🧠 ML: {signal} (score: {confidence:.2f}) | 💰 ${current_price:.2f}")
                 
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+from main import MONEY_MANAGEMENT
+
+# ==================== CONFIGURAZIONE MONTE CARLO ====================
+MC_PATHS = 10000
+MC_METHOD = 'bootstrap'          # 'bootstrap' (con reinserimento) o 'shuffle' (stesso insieme, ordine diverso)
+MC_PERCENTILES = (5, 25, 50, 75, 95)
+RUIN_DRAWDOWN = MONEY_MANAGEMENT['max_drawdown']
+
+# ==================== PERCORSI ====================
+def trade_returns(result):
+    """Ritorni (frazione, commissioni incluse) delle operazioni chiuse di un run_backtest"""
+    return np.array([t['profit_percent'] / 100 for t in result['trades'] if t.get('profit_percent') is not None])
+
+def simulate_paths(returns, initial_balance, n_paths=MC_PATHS, method=MC_METHOD, seed=None):
+    """Curve di equity (percorsi × operazioni+1) da ritorni ricampionati o rimescolati.
+
+    Tutti i percorsi sono una sola matrice: indici casuali, un cumprod lungo
+    le righe, nessun ciclo Python per percorso.
+    """
+    returns = np.asarray(returns, dtype=float)
+    rng = np.random.default_rng(seed)
+    if method == 'bootstrap':
+        sampled = returns[rng.integers(0, len(returns), size=(n_paths, len(returns)))]
+    elif method == 'shuffle':
+        sampled = rng.permuted(np.broadcast_to(returns, (n_paths, len(returns))), axis=1)
+    else:
+        raise ValueError(f"Metodo Monte Carlo sconosciuto: {method}")
+    equity = np.empty((n_paths, len(returns) + 1))
+    equity[:, 0] = initial_balance
+    np.cumprod(1 + sampled, axis=1, out=equity[:, 1:])
+    equity[:, 1:] *= initial_balance
+    return equity
+
+def drawdowns(equity):
+    """Drawdown (frazione dal massimo precedente) di ogni punto di ogni percorso"""
+    peak = np.maximum.accumulate(equity, axis=1)
+    return 1 - equity / peak
+
+def time_to_ruin(drawdown, limit=RUIN_DRAWDOWN):
+    """Operazioni prima che il drawdown tocchi `limit` (NaN se mai)"""
+    ruined = drawdown >= limit
+    first = np.argmax(ruined, axis=1).astype(float)
+    first[~ruined.any(axis=1)] = np.nan
+    return first
+
+# ==================== DISTRIBUZIONI ====================
+def equity_bands(equity, percentiles=MC_PERCENTILES):
+    """Bande di confidenza dell'equity dopo ogni operazione (una colonna per percentile)"""
+    bands = np.percentile(equity, percentiles, axis=0)
+    return pd.DataFrame(bands.T, columns=[f'p{p}' for p in percentiles])
+
+def monte_carlo(returns, initial_balance, n_paths=MC_PATHS, method=MC_METHOD,
+                ruin_drawdown=RUIN_DRAWDOWN, seed=None, percentiles=MC_PERCENTILES):
+    """Distribuzioni di saldo finale, max drawdown e tempo alla rovina per una sequenza di trade"""
+    returns = np.asarray(returns, dtype=float)
+    if len(returns) == 0:
+        return None
+    equity = simulate_paths(returns, initial_balance, n_paths, method, seed)
+    drawdown = drawdowns(equity)
+    final = equity[:, -1]
+    max_drawdown = drawdown.max(axis=1) * 100
+    ruin = time_to_ruin(drawdown, ruin_drawdown)
+    ruined = ~np.isnan(ruin)
+
+    def spread(values):
+        return dict(zip((f'p{p}' for p in percentiles), np.percentile(values, percentiles)))
+
+    return {
+        'paths': n_paths,
+        'trades': len(returns),
+        'method': method,
+        'final_balance': spread(final),
+        'return_percent': spread((final - initial_balance) / initial_balance * 100),
+        'max_drawdown': spread(max_drawdown),
+        'loss_probability': float(np.mean(final < initial_balance) * 100),
+        'ruin_limit': ruin_drawdown * 100,
+        'ruin_probability': float(np.mean(ruined) * 100),
+        'median_trades_to_ruin': float(np.median(ruin[ruined])) if ruined.any() else None,
+        'bands': equity_bands(equity, percentiles),
+    }
+
+def analyze_backtest(result, n_paths=MC_PATHS, method=MC_METHOD, seed=None):
+    """Monte Carlo direttamente sul risultato di backtest.run_backtest"""
+    if result is None:
+        return None
+    return monte_carlo(trade_returns(result), result['initial_balance'], n_paths, method, seed=seed)
+
+def print_monte_carlo(symbol, mc):
+    """Riepilogo testuale (banda 5-95%)"""
+    if mc is None:
+        print(f"   {symbol}: nessun trade chiuso")
+        return
+    final, dd = mc['final_balance'], mc['max_drawdown']
+    print(f"\n🎲 {symbol} ({mc['paths']} percorsi {mc['method']}, {mc['trades']} trade)")
+    print(f"   💰 Balance finale: {final['p50']:.2f}€ (5-95%: {final['p5']:.2f}€ - {final['p95']:.2f}€)")
+    print(f"   📉 Max Drawdown: {dd['p50']:.1f}% (5-95%: {dd['p5']:.1f}% - {dd['p95']:.1f}%)")
+    print(f"   ❌ Probabilità di perdita: {mc['loss_probability']:.1f}%")
+    ruin = f"{mc['ruin_probability']:.1f}%"
+    if mc['median_trades_to_ruin'] is not None:
+        ruin += f" (mediana dopo {mc['median_trades_to_ruin']:.0f} trade)"
+    print(f"   💀 Drawdown oltre {mc['ruin_limit']:.0f}%: {ruin}")
@@ -0,0 +1,312 @@
+import time
+import argparse
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+import indicators
+import main
+import results_store
+from indicator_panel import IndicatorPanel
+from market_data import REST_PROVIDER
+
+# ==================== CONFIGURAZIONE ====================
+PORTFOLIO_INTERVAL = '1h'    # Passo dell'orologio simulato
+PORTFOLIO_YEARS = 3
+STEP = pd.Timedelta(hours=1)
+
+# Parametri di main.calculate_advanced_indicators usati dal punteggio
+SMA_WINDOWS = (5, 10, 30)
+RSI_PERIOD = 14
+MOMENTUM_PERIOD = 5
+VOLATILITY_WINDOW = 20
+
+# ==================== OROLOGIO SIMULATO ====================
+class SimClock:
+    """Sostituisce datetime.now nel trader: ritorna l'istante dell'evento in corso"""
+
+    def __init__(self, now=None):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+# ==================== TRADER SIMULATO ====================
+class SimulatedTrader(main.ProfessionalTrader):
+    """ProfessionalTrader con orologio simulato e registro delle operazioni chiuse.
+
+    Le regole (stop, trailing, take profit, pesi, limiti giornalieri, orari)
+    restano quelle della classe live: qui si registra solo l'esito.
+    """
+
+    def __init__(self, clock, verbose=False):
+        super().__init__(provider=None, clock=clock, verbose=verbose)
+        self.trades = []
+
+    def close_position(self, symbol, current_price, reason):
+        position = self.open_positions[symbol]
+        profit_percent = (current_price - position['entry_price']) / position['entry_price']
+        self.trades.append({
+            'symbol': symbol,
+            'entry_time': position['entry_time'],
+            'exit_time': self.clock(),
+            'entry_price': position['entry_price'],
+            'exit_price': current_price,
+            'position_size': position['position_size'],
+            'profit_percent': profit_percent * 100,
+            'profit': position['position_size'] * profit_percent,
+            'reason': reason,
+        })
+        super().close_position(symbol, current_price, reason)
+
+# ==================== SEGNALI LIVE VETTORIALI ====================
+def daily_closes(timestamps, closes):
+    """Giorno live di ogni candela oraria, chiusure dei giorni (ultima oraria del giorno) e date dei giorni"""
+    days = timestamps.values.astype('datetime64[D]')
+    unique_days, hour_day = np.unique(days, return_inverse=True)
+    last = np.r_[np.flatnonzero(np.diff(hour_day)), len(hour_day) - 1]
+    return hour_day, closes[last], unique_days
+
+def _window_sums(closed, width):
+    """Somme delle ultime `width` chiusure chiuse prima di ogni giorno (cumsum con 0 in testa)"""
+    cumulative = np.r_[0.0, np.cumsum(closed)]
+    sums = np.full(len(closed), np.nan)
+    sums[width:] = cumulative[width:-1] - cumulative[:-width - 1]
+    return sums
+
+def live_scores(timestamps, closes, closed_volatility=None):
+    """Punteggio di optimized_ml_strategy a ogni chiusura oraria, come lo vede il bot live.
+
+    Il bot valuta le candele giornaliere chiuse più la candela del giorno in
+    corso, il cui close è l'ultimo prezzo. Qui quel calcolo è fatto per tutte
+    le ore in un passaggio: gli indicatori della riga live si ottengono da
+    somme mobili dei giorni chiusi più il prezzo orario, e il filtro di
+    volatilità inserisce virtualmente la volatilità live tra le ultime
+    OPTIMIZED_ML.rows - 1 dei giorni chiusi (come StreamingIndicators).
+    Prima di OPTIMIZED_ML.lookback giorni di storia il punteggio è NaN.
+    closed_volatility (volatilità dei giorni chiusi) può arrivare già
+    calcolata da un IndicatorPanel di tutti i simboli.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    hour_day, closed, _ = daily_closes(timestamps, closes)
+    day = hour_day
+    price = closes
+    rows = main.OPTIMIZED_ML.rows - 1
+    first_day = main.OPTIMIZED_ML.lookback - 1
+    valid = day >= first_day
+    day = np.where(valid, day, first_day)          # Indici sicuri, poi mascherati
+
+    if first_day >= len(closed):
+        return np.full(len(closes), np.nan)
+
+    frame = {}
+    for n in SMA_WINDOWS:
+        frame[f'sma_{n}'] = (_window_sums(closed, n - 1)[day] + price) / n
+
+    # RSI: ultimi RSI_PERIOD - 1 delta chiusi + delta live
+    deltas = np.r_[0.0, np.diff(closed)]
+    gains = _window_sums(np.where(deltas > 0, deltas, 0.0), RSI_PERIOD - 1)[day]
+    losses = _window_sums(np.where(deltas < 0, -deltas, 0.0), RSI_PERIOD - 1)[day]
+    live_delta = price - closed[day - 1]
+    avg_gain = (gains + np.where(live_delta > 0, live_delta, 0.0)) / RSI_PERIOD
+    avg_loss = (losses + np.where(live_delta < 0, -live_delta, 0.0)) / RSI_PERIOD
+    avg_loss = np.where(avg_loss > 0, avg_loss, indicators.RSI_MIN_LOSS)
+    frame['rsi'] = 100 - (100 / (1 + avg_gain / avg_loss))
+
+    frame['momentum_5'] = price / closed[day - MOMENTUM_PERIOD] - 1
+
+    # Volatilità: ultime VOLATILITY_WINDOW - 1 chiusure + prezzo live, centrate
+    # sull'ultima chiusura per non perdere cifre su prezzi alti
+    width = VOLATILITY_WINDOW - 1
+    windows = sliding_window_view(closed[:-1], width)         # righe: giorni width..n-1
+    centered = windows - closed[width - 1:-1, None]
+    s1 = np.full(len(closed), np.nan)
+    s2 = np.full(len(closed), np.nan)
+    s1[width:] = centered.sum(axis=1)
+    s2[width:] = (centered ** 2).sum(axis=1)
+    x = price - closed[day - 1]
+    mean = (s1[day] + x) / VOLATILITY_WINDOW
+    variance = (s2[day] + x * x - VOLATILITY_WINDOW * mean * mean) / (VOLATILITY_WINDOW - 1)
+    live_volatility = np.sqrt(np.maximum(variance, 0.0))
+
+    # Percentile con la volatilità live inserita tra quelle dei giorni chiusi
+    if closed_volatility is None:
+        closed_volatility = indicators.volatility(pd.Series(closed), VOLATILITY_WINDOW).to_numpy()
+    history = np.sort(sliding_window_view(closed_volatility[:-1], rows), axis=1)   # giorni rows..n-1
+    history = history[day - rows]
+    pos = (history < live_volatility[:, None]).sum(axis=1)
+    rank = rows * (indicators.VOLATILITY_PERCENTILE / 100)
+    lo = int(np.floor(rank))
+    hi = min(lo + 1, rows)
+    gamma = rank - lo
+
+    def at(k):
+        merged = history[:, min(k, rows - 1)]
+        merged = np.where(k > pos, history[:, max(k - 1, 0)], merged)
+        return np.where(k == pos, live_volatility, merged)
+
+    a, b = at(lo), at(hi)
+    threshold = np.where(gamma >= 0.5, b - (b - a) * (1 - gamma), a + (b - a) * gamma)
+    high_volatility = live_volatility > threshold
+
+    scores = main._optimized_ml_score(pd.DataFrame(frame), high_volatility)
+    scores[~valid] = np.nan
+    return scores
+
+# ==================== DATI ====================
+def load_hourly(symbols=None, years=PORTFOLIO_YEARS, provider=None):
+    """Candele orarie chiuse per simbolo dallo store locale (backfill dei buchi)"""
+    provider = provider or REST_PROVIDER
+    symbols = symbols or [crypto['symbol'] for crypto in main.CRYPTO_PORTFOLIO]
+    start_time = int((datetime.now() - timedelta(days=years * 365)).timestamp() * 1000)
+    frames = {}
+    for symbol in symbols:
+        print(f"📥 Scaricando candele {PORTFOLIO_INTERVAL} per {symbol}...")
+        try:
+            df = provider.get_history(symbol, PORTFOLIO_INTERVAL, start_time=start_time)
+        except Exception as e:
+            print(f"❌ Errore download {symbol}: {e}")
+            continue
+        if df.empty:
+            print(f"❌ Nessun dato per {symbol}")
+            continue
+        frames[symbol] = df.drop_duplicates('timestamp').sort_values('timestamp').reset_index(drop=True)
+    return frames
+
+def build_panel(frames):
+    """Asse temporale comune: prezzi (riportati avanti dopo la quotazione) e punteggi per simbolo"""
+    symbols = list(frames)
+    # Volatilità dei giorni chiusi di tutti i simboli in un solo pannello
+    daily = {}
+    for symbol, df in frames.items():
+        _, closed, days = daily_closes(pd.DatetimeIndex(df['timestamp']), df['close'].to_numpy(dtype=float))
+        daily[symbol] = pd.DataFrame({'timestamp': days, 'close': closed})
+    panel = IndicatorPanel.from_frames(daily)
+    series = {}
+    for symbol, df in frames.items():
+        timestamps = pd.DatetimeIndex(df['timestamp'])
+        closed_volatility = panel.frame(symbol, ['volatility'])['volatility'].to_numpy()
+        series[symbol] = pd.DataFrame({
+            'close': df['close'].to_numpy(dtype=float),
+            'score': live_scores(timestamps, df['close'].to_numpy(dtype=float), closed_volatility),
+        }, index=timestamps)
+    axis = pd.DatetimeIndex([])
+    for frame in series.values():
+        axis = axis.union(frame.index)
+    prices = np.full((len(symbols), len(axis)), np.nan)
+    scores = np.full((len(symbols), len(axis)), np.nan)
+    for i, symbol in enumerate(symbols):
+        frame = series[symbol].reindex(axis)
+        prices[i] = frame['close'].ffill().to_numpy()
+        scores[i] = frame['score'].to_numpy()
+    return symbols, axis, prices, scores
+
+# ==================== SIMULAZIONE ====================
+def simulate_portfolio(symbols, timestamps, prices, scores, verbose=False):
+    """Rigioca il portfolio attraverso ProfessionalTrader con l'orologio simulato.
+
+    A ogni chiusura oraria, come nel ciclo di professional_bot: prima la
+    gestione delle posizioni aperte (stop, trailing, take profit), poi i
+    segnali sopra MIN_CONFIDENCE. Prezzi e segnali sono array precalcolati:
+    il ciclo tocca Python solo per le posizioni aperte e i segnali eseguibili.
+    """
+    clock = SimClock()
+    trader = SimulatedTrader(clock, verbose=verbose)
+    row = {symbol: i for i, symbol in enumerate(symbols)}
+
+    signals = indicators.score_signals(np.nan_to_num(scores, nan=0.5),
+                                       main.OPTIMIZED_BUY_ABOVE, main.OPTIMIZED_SELL_BELOW)
+    actionable = (signals != "HOLD") & (scores > main.MIN_CONFIDENCE)
+    has_action = actionable.any(axis=0)
+    # Evento = chiusura della candela oraria
+    event_times = (timestamps + STEP).to_pydatetime()
+
+    equity = np.empty(len(timestamps))
+    executed = 0
+    for t, now in enumerate(event_times):
+        clock.now = now
+        for symbol in list(trader.open_positions):
+            price = prices[row[symbol], t]
+            if price == price:
+                trader.on_price_update(symbol, price)
+
+        if has_action[t]:
+            for i in np.flatnonzero(actionable[:, t]):
+                if trader.execute_paper_trade(symbols[i], signals[i, t], prices[i, t], scores[i, t]):
+                    executed += 1
+
+        value = trader.paper_balance
+        for symbol, position in trader.open_positions.items():
+            value += position['position_size'] * prices[row[symbol], t] / position['entry_price']
+        equity[t] = value
+
+    return trader, pd.Series(equity, index=timestamps + STEP), {
+        'signals': int(actionable.sum()),
+        'executed': executed,
+    }
+
+def portfolio_stats(trader, equity, counts):
+    """Statistiche del portfolio simulato"""
+    initial = main.MONEY_MANAGEMENT['initial_capital']
+    trades = pd.DataFrame(trader.trades)
+    peak = np.maximum.accumulate(equity.to_numpy()) if len(equity) else np.array([initial])
+    drawdown = float(np.max((peak - equity.to_numpy()) / peak) * 100) if len(equity) else 0.0
+    final = float(equity.iloc[-1]) if len(equity) else initial
+    return {
+        'initial_balance': initial,
+        'final_balance': final,
+        'total_return_percent': (final - initial) / initial * 100,
+        'total_trades': len(trades),
+        'win_rate': float((trades['profit'] > 0).mean() * 100) if len(trades) else 0.0,
+        'max_drawdown': drawdown,
+        'open_positions': len(trader.open_positions),
+        **counts,
+        'by_reason': trades['reason'].value_counts().to_dict() if len(trades) else {},
+        'by_symbol': trades.groupby('symbol')['profit'].sum().to_dict() if len(trades) else {},
+    }
+
+def run_portfolio_backtest(years=PORTFOLIO_YEARS, provider=None, frames=None, verbose=False):
+    """Carica, calcola i segnali e simula: ritorna statistiche, equity e operazioni"""
+    frames = frames if frames is not None else load_hourly(years=years, provider=provider)
+    if not frames:
+        return None
+    symbols, timestamps, prices, scores = build_panel(frames)
+    trader, equity, counts = simulate_portfolio(symbols, timestamps, prices, scores, verbose)
+    return {
+        'stats': portfolio_stats(trader, equity, counts),
+        'equity': equity,
+        'trades': pd.DataFrame(trader.trades),
+    }
+
+# ==================== CLI ====================
+def main_cli():
+    parser = argparse.ArgumentParser(description="Backtest di portfolio del ProfessionalTrader")
+    parser.add_argument('--years', type=float, default=PORTFOLIO_YEARS)
+    parser.add_argument('--verbose', action='store_true', help="Log del trader per ogni operazione")
+    parser.add_argument('--results', action='store_true', help="Salva equity oraria e trade su disco")
+    args = parser.parse_args()
+
+    print("📊 BACKTEST PORTFOLIO - PROFESSIONAL TRADER")
+    started = time.time()
+    result = run_portfolio_backtest(years=args.years, verbose=args.verbose)
+    if result is None:
+        print("❌ Nessun dato disponibile")
+        return
+    stats = result['stats']
+    print(f"⏱️  Simulazione completata in {time.time() - started:.1f}s")
+    print(f"💰 Balance: {stats['initial_balance']}€ -> {stats['final_balance']:.2f}€ ({stats['total_return_percent']:+.2f}%)")
+    print(f"🔢 Trade: {stats['total_trades']} | Win rate: {stats['win_rate']:.1f}% | Max DD: {stats['max_drawdown']:.2f}%")
+    print(f"📡 Segnali eseguibili: {stats['signals']} | Eseguiti: {stats['executed']}")
+    print(f"🚪 Uscite: {stats['by_reason']}")
+    for symbol, profit in stats['by_symbol'].items():
+        print(f"   • {symbol}: {profit:+.2f}€")
+    
+    if args.results:
+        writer = results_store.ResultsWriter(results_store.new_run_dir("portfolio"),
+                                             info={k: v for k, v in stats.items() if not isinstance(v, dict)})
+        writer.write_equity('PORTFOLIO', result['equity'].index, result['equity'].to_numpy())
+        writer.append('trades', result['trades'])
+        print(f"💾 Equity e trade salvati in {writer.root}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,112 @@
+import os
+import json
+import threading
+import time
+from exchange_client import CLIENT
+
+# ==================== CONFIGURAZIONE PREZZI ====================
+TICKER_PATH = "/api/v3/ticker/price"
+PRICE_TTL = float(os.getenv('PRICE_TTL', 10))   # Secondi di validità cache
+
+def fetch_ticker_prices(symbols):
+    """Scarica i prezzi di più simboli con una sola richiesta bulk"""
+    params = {"symbols": json.dumps(sorted(symbols), separators=(',', ':'))}
+    data = CLIENT.get(TICKER_PATH, params=params)
+
+    # Un simbolo non valido fa fallire tutta la richiesta: ripiega sul ticker completo
+    if isinstance(data, dict):
+        data = CLIENT.get(TICKER_PATH)
+        if isinstance(data, dict):
+            raise ValueError(f"Binance ticker: {data.get('msg', data)}")
+
+    wanted = set(symbols)
+    return {item['symbol']: float(item['price']) for item in data if item['symbol'] in wanted}
+
+class _Flight:
+    """Richiesta bulk in corso, condivisa da tutti i chiamanti"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+# ==================== SERVIZIO PREZZI ====================
+class PriceService:
+    """Cache in-process dei prezzi con TTL e richiesta bulk condivisa.
+
+    Ogni refresh scarica tutti i simboli tracciati in una sola chiamata;
+    i chiamanti concorrenti aspettano la stessa richiesta invece di
+    aprirne una propria.
+    """
+
+    def __init__(self, ttl=PRICE_TTL, symbols=None, fetch=fetch_ticker_prices):
+        self.ttl = ttl
+        self.fetch = fetch
+        self._symbols = set(symbols or [])
+        self._prices = {}            # symbol -> (prezzo, istante fetch)
+        self._lock = threading.Lock()
+        self._flight = None
+
+    def track(self, *symbols):
+        """Aggiunge simboli al refresh bulk"""
+        with self._lock:
+            self._symbols.update(symbols)
+
+    def _cached(self, symbols):
+        """Prezzi ancora validi in cache"""
+        now = time.monotonic()
+        result = {}
+        with self._lock:
+            for symbol in symbols:
+                cached = self._prices.get(symbol)
+                if cached and now - cached[1] < self.ttl:
+                    result[symbol] = cached[0]
+        return result
+
+    def _refresh(self, symbols):
+        """Avvia (o attende) il refresh bulk e ritorna quando è completato"""
+        with self._lock:
+            self._symbols.update(symbols)
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight()
+                wanted = sorted(self._symbols)
+
+        if not leader:
+            flight.done.wait()
+            return flight
+
+        try:
+            prices = self.fetch(wanted)
+            fetched_at = time.monotonic()
+            with self._lock:
+                for symbol, price in prices.items():
+                    self._prices[symbol] = (price, fetched_at)
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                self._flight = None
+            flight.done.set()
+        return flight
+
+    def get_prices(self, symbols):
+        """Prezzi correnti per più simboli (dict), con un solo refresh bulk"""
+        symbols = list(symbols)
+        result = self._cached(symbols)
+        # Secondo giro: il simbolo può essere arrivato a refresh già partito
+        for _ in range(2):
+            missing = [s for s in symbols if s not in result]
+            if not missing:
+                break
+            flight = self._refresh(missing)
+            if flight.error is not None:
+                raise flight.error
+            result.update(self._cached(missing))
+        return result
+
+    def get_price(self, symbol):
+        """Prezzo corrente di un simbolo (None se l'exchange non lo quota)"""
+        return self.get_prices([symbol]).get(symbol)
+
+PRICES = PriceService()
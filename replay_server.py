@@ -0,0 +1,134 @@
+import json
+import asyncio
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+import websockets
+from candle_store import STORE, INTERVAL_MS, OPEN_TIME
+
+# ==================== MESSAGGI DI REPLAY ====================
+def _kline_message(symbol, interval, row, closed):
+    open_time, o, h, l, c, v, close_time = row
+    return {
+        "stream": f"{symbol.lower()}@kline_{interval}",
+        "data": {
+            "e": "kline", "E": int(close_time), "s": symbol,
+            "k": {
+                "t": int(open_time), "T": int(close_time), "s": symbol, "i": interval,
+                "o": repr(o), "h": repr(h), "l": repr(l), "c": repr(c), "v": repr(v),
+                "x": closed,
+            },
+        },
+    }
+
+def _ticker_message(symbol, price, event_time):
+    return {
+        "stream": f"{symbol.lower()}@bookTicker",
+        "data": {"E": int(event_time), "s": symbol, "b": repr(price), "B": "1",
+                 "a": repr(price), "A": "1"},
+    }
+
+def candles_to_messages(block, symbol, interval):
+    """Trasforma candele salvate in una sequenza di messaggi stream plausibile.
+
+    Per ogni candela: tick di apertura, minimo/massimo nell'ordine più
+    probabile, chiusura e infine la kline chiusa.
+    """
+    messages = []
+    step = INTERVAL_MS[interval]
+    for i in range(block.shape[1]):
+        row = [float(x) for x in block[:, i]]
+        open_time, o, h, l, c = row[OPEN_TIME], row[1], row[2], row[3], row[4]
+        path = [o, l, h, c] if c >= o else [o, h, l, c]
+        for j, price in enumerate(path):
+            messages.append(_ticker_message(symbol, price, open_time + step * j / len(path)))
+        messages.append(_kline_message(symbol, interval, row, True))
+    return [json.dumps(m) for m in messages]
+
+def store_messages(symbols, interval='1d', store=STORE):
+    """Messaggi di replay per più simboli dallo store, ordinati per tempo evento"""
+    messages = []
+    for symbol in symbols:
+        block = store.load(symbol, interval)
+        messages.extend(candles_to_messages(block, symbol, interval))
+    return sorted(messages, key=lambda m: json.loads(m)['data'].get('E', 0))
+
+def load_recording(path):
+    """Messaggi registrati da MarketStream(record_path=...) (uno per riga)"""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+# ==================== SERVER WEBSOCKET ====================
+class ReplayServer:
+    """Server WebSocket locale che imita lo stream combinato Binance.
+
+    Ogni client riceve solo i messaggi degli stream richiesti nell'URL
+    (?streams=...). speed=0 invia tutto il più velocemente possibile,
+    speed=N riproduce N volte più veloce del tempo reale.
+    """
+
+    def __init__(self, messages, host='127.0.0.1', port=8765, speed=0):
+        self.messages = messages
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self._ready = threading.Event()
+        self._loop = None
+        self._stop = None
+
+    async def _handler(self, websocket):
+        query = parse_qs(urlparse(websocket.path).query)
+        wanted = set(query.get('streams', [''])[0].split('/'))
+        previous = None
+        for raw in self.messages:
+            message = json.loads(raw)
+            if message.get('stream') not in wanted:
+                continue
+            event_time = message['data'].get('E')
+            if self.speed and previous is not None and event_time is not None:
+                await asyncio.sleep(max(0, (event_time - previous) / 1000 / self.speed))
+            previous = event_time
+            await websocket.send(raw)
+        await websocket.close()
+
+    async def serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        async with websockets.serve(self._handler, self.host, self.port) as server:
+            self.port = server.sockets[0].getsockname()[1]
+            self._ready.set()
+            await self._stop.wait()
+
+    def start(self):
+        """Avvia il server in un thread daemon e ritorna l'URL base dello stream"""
+        thread = threading.Thread(target=lambda: asyncio.run(self.serve()), daemon=True)
+        thread.start()
+        self._ready.wait()
+        return f"ws://{self.host}:{self.port}/stream"
+
+    def stop(self):
+        if self._loop and self._stop:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+def main():
+    """Avvio da riga di comando"""
+    parser = argparse.ArgumentParser(description="Replay locale dello stream Binance")
+    parser.add_argument('--file', help="Registrazione JSONL di MarketStream")
+    parser.add_argument('--symbols', default="BTCUSDT", help="Simboli dallo store (se niente --file)")
+    parser.add_argument('--interval', default='1d')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--speed', type=float, default=0)
+    args = parser.parse_args()
+
+    if args.file:
+        messages = load_recording(args.file)
+    else:
+        messages = store_messages(args.symbols.split(','), args.interval)
+
+    print(f"📼 Replay di {len(messages)} messaggi su ws://127.0.0.1:{args.port}/stream")
+    print(f"   • Usa MARKET_STREAM_URL=ws://127.0.0.1:{args.port}/stream")
+    server = ReplayServer(messages, port=args.port, speed=args.speed)
+    asyncio.run(server.serve())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import threading
+import numpy as np
+from candle_store import STORE, COLUMNS, OPEN_TIME, CLOSE_TIME, INTERVAL_MS, now_ms, to_dataframe
+from market_data import RestProvider, REST_PROVIDER
+from price_service import PRICES
+from backfill import backfill_store
+
+# ==================== CONFIGURAZIONE ====================
+BASE_INTERVAL = '1m'
+RESAMPLE_CHUNK = 1_000_000   # Candele base aggregate per passo (~2 anni di 1m)
+NATIVE_INTERVALS = ('1d',)   # Scaricati così come sono; tutti gli altri derivano dalla base
+
+# Le candele settimanali Binance aprono il lunedì, l'epoch (1/1/1970) è un giovedì
+INTERVAL_OFFSET_MS = {'1w': 4 * INTERVAL_MS['1d']}
+
+OPEN, HIGH, LOW, CLOSE, VOLUME = (COLUMNS.index(name) for name in ('open', 'high', 'low', 'close', 'volume'))
+
+# ==================== AGGREGAZIONE OHLCV ====================
+def bucket_starts(open_times, interval):
+    """Apertura della candela `interval` che contiene ogni candela base"""
+    step = INTERVAL_MS[interval]
+    offset = INTERVAL_OFFSET_MS.get(interval, 0)
+    return (open_times - offset) // step * step + offset
+
+def aggregate(block, interval):
+    """Candele base (colonne × righe) -> candele `interval`: open primo, high max, low min, close ultimo, volume somma"""
+    if block.shape[1] == 0:
+        return np.empty((len(COLUMNS), 0))
+    buckets = bucket_starts(block[OPEN_TIME], interval)
+    starts = np.r_[0, np.flatnonzero(np.diff(buckets)) + 1]
+    ends = np.r_[starts[1:], block.shape[1]] - 1
+    out = np.empty((len(COLUMNS), len(starts)))
+    out[OPEN_TIME] = buckets[starts]
+    out[OPEN] = block[OPEN, starts]
+    out[HIGH] = np.maximum.reduceat(block[HIGH], starts)
+    out[LOW] = np.minimum.reduceat(block[LOW], starts)
+    out[CLOSE] = block[CLOSE, ends]
+    out[VOLUME] = np.add.reduceat(block[VOLUME], starts)
+    out[CLOSE_TIME] = buckets[starts] + INTERVAL_MS[interval] - 1
+    return out
+
+# ==================== CACHE DEGLI INTERVALLI DERIVATI ====================
+class DerivedSeries:
+    """Candele chiuse di un intervallo derivato e quante candele base hanno consumato.
+
+    update() aggrega solo le candele base arrivate dopo l'ultima chiamata:
+    la candela derivata ancora incompleta resta fuori (le sue candele base
+    vengono riaggregate alla prossima chiamata, insieme a quelle nuove).
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.block = np.empty((len(COLUMNS), 0))
+        self.base_rows = 0
+        self.first_open = None
+
+    def update(self, stored):
+        total = stored.shape[1]
+        first_open = float(stored[OPEN_TIME, 0]) if total else None
+        if first_open != self.first_open or self.base_rows > total:
+            # Storico base riscritto (backfill in testa): si riparte da zero
+            self.__init__(self.interval)
+            self.first_open = first_open
+
+        if self.base_rows == 0 and total:
+            first_bucket = bucket_starts(first_open, self.interval)
+            if first_open > first_bucket:
+                # Prima candela derivata iniziata prima dello storico base: incompleta, esclusa
+                next_bucket = first_bucket + INTERVAL_MS[self.interval]
+                self.base_rows = int(np.searchsorted(stored[OPEN_TIME], next_bucket))
+
+        while self.base_rows < total:
+            chunk = np.asarray(stored[:, self.base_rows:self.base_rows + RESAMPLE_CHUNK])
+            candles = aggregate(chunk, self.interval)
+            # Solo l'ultima candela può essere incompleta
+            complete = candles.shape[1] if chunk[CLOSE_TIME, -1] >= candles[CLOSE_TIME, -1] else candles.shape[1] - 1
+            if complete == 0:
+                break
+            consumed = chunk.shape[1] if complete == candles.shape[1] else \
+                int(np.searchsorted(chunk[OPEN_TIME], candles[OPEN_TIME, complete]))
+            self.block = np.concatenate([self.block, candles[:, :complete]], axis=1)
+            self.base_rows += consumed
+        return self.block
+
+    def live(self, stored, live_base):
+        """Candela derivata in corso: candele base non ancora consumate + candela base live"""
+        pending = np.concatenate([np.asarray(stored[:, self.base_rows:]), live_base], axis=1)
+        return aggregate(pending, self.interval)
+
+# ==================== PROVIDER MULTI-TIMEFRAME ====================
+class ResampledProvider(RestProvider):
+    """Qualunque intervallo derivato da un'unica serie 1m per simbolo nello store.
+
+    Si scarica (e sincronizza) solo la base: 4h, 15m o 1d sono aggregati in
+    memoria alla prima richiesta e poi aggiornati solo con i minuti nuovi,
+    quindi cambiare intervallo non costa traffico di rete.
+    """
+
+    def __init__(self, store=STORE, prices=PRICES, base_interval=BASE_INTERVAL):
+        super().__init__(store, prices)
+        self.base_interval = base_interval
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _derived(self, symbol, interval):
+        key = (symbol.upper(), interval)
+        with self._lock:
+            if key not in self._series:
+                self._series[key] = DerivedSeries(interval)
+            return self._series[key]
+
+    def resampled(self, symbol, interval, live_base=None):
+        """(candele chiuse, candela in corso) di `interval` come blocchi colonnari"""
+        stored = self.store.load(symbol, self.base_interval)
+        series = self._derived(symbol, interval)
+        with self._lock:
+            closed = series.update(stored)
+            live = series.live(stored, live_base) if live_base is not None else np.empty((len(COLUMNS), 0))
+        return closed, live
+
+    def _frame(self, symbol, interval, live_base, limit=None, start_time=None, fields=None, dtype=np.float64):
+        closed, live = self.resampled(symbol, interval, live_base)
+        if start_time is not None:
+            closed = closed[:, np.searchsorted(closed[OPEN_TIME], start_time):]
+        block = np.concatenate([closed, live], axis=1)
+        if limit is not None:
+            block = block[:, -limit:]
+        return to_dataframe(block, fields, dtype)
+
+    def get_klines(self, symbol, interval='1d', limit=None, start_time=None, include_live=True,
+                   fields=None, dtype=np.float64):
+        if interval == self.base_interval:
+            return super().get_klines(symbol, interval, limit, start_time, include_live, fields, dtype)
+        if start_time is None and limit is not None:
+            start_time = now_ms() - (limit + 1) * INTERVAL_MS[interval]
+        since = self.store.coverage(symbol, self.base_interval)[0]
+        if start_time is not None and (since is None or start_time < since):
+            # Minuti mai scaricati: backfill parallelo invece del sync pagina per pagina
+            backfill_store(symbol, self.base_interval, start_time, store=self.store)
+        live_base = self.store.sync(symbol, self.base_interval, start_time=start_time, include_live=include_live)
+        return self._frame(symbol, interval, live_base if include_live else None,
+                           limit=limit, start_time=start_time, fields=fields, dtype=dtype)
+
+    def get_history(self, symbol, interval='1d', start_time=None):
+        if interval == self.base_interval:
+            return super().get_history(symbol, interval, start_time)
+        # Storico lungo: backfill parallelo dei minuti mancanti, poi solo aggregazione locale
+        if start_time is not None:
+            backfill_store(symbol, self.base_interval, start_time, store=self.store)
+        return self._frame(symbol, interval, None, start_time=start_time)
+
+RESAMPLED_PROVIDER = ResampledProvider()
+
+def provider_for(interval, provider=None):
+    """Il provider indicato, altrimenti REST per gli intervalli nativi e il ricampionato per gli altri"""
+    if provider is not None:
+        return provider
+    return REST_PROVIDER if interval in NATIVE_INTERVALS else RESAMPLED_PROVIDER
@@ -0,0 +1,227 @@
+import os
+import json
+import threading
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# ==================== CONFIGURAZIONE ====================
+RESULTS_DIR = os.getenv(
+    'RESULTS_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'results')
+)
+MIN_CAPACITY = 1024          # Righe pre-allocate per tabella
+
+# ==================== CONVERSIONI ====================
+def _to_float(values):
+    """Colonna numerica o temporale -> float64 (datetime in millisecondi)"""
+    values = pd.Series(values) if not isinstance(values, pd.Series) else values
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.values.astype('datetime64[ms]').astype(np.int64).astype(np.float64)
+    return values.to_numpy(dtype=np.float64)
+
+def trade_rows(symbol, trades):
+    """Una riga per trade chiuso: ogni BUY è accoppiato al primo SELL/SELL_FINAL che lo segue.
+
+    Un BUY finale senza uscita (posizione ancora aperta) non produce righe;
+    un'uscita senza BUY aperto, o due BUY di fila, sono un log corrotto.
+    """
+    pairs = []
+    buy = None
+    for trade in trades:
+        if trade['type'] == 'BUY':
+            if buy is not None:
+                raise ValueError(f"{symbol}: BUY del {trade['date']} con una posizione già aperta")
+            buy = trade
+        elif trade['type'].startswith('SELL'):
+            if buy is None:
+                raise ValueError(f"{symbol}: {trade['type']} del {trade['date']} senza BUY aperto")
+            pairs.append((buy, trade))
+            buy = None
+    return {
+        'symbol': [symbol] * len(pairs),
+        'entry_time': [buy['date'] for buy, _ in pairs],
+        'exit_time': [sell['date'] for _, sell in pairs],
+        'entry_price': [buy['price'] for buy, _ in pairs],
+        'exit_price': [sell['price'] for _, sell in pairs],
+        'profit_percent': [sell['profit_percent'] for _, sell in pairs],
+        'balance_before': [buy['balance_before'] for buy, _ in pairs],
+        'balance_after': [sell['balance_after'] for _, sell in pairs],
+        'reason': [sell.get('reason', sell['type']) for _, sell in pairs],
+    }
+
+# ==================== SCRITTURA ====================
+class ResultsWriter:
+    """Risultati di backtest in tabelle colonnari su disco, scritte a blocchi.
+
+    Ogni tabella è un file .npy memory-mappabile (colonne × capacità) come lo
+    store delle candele: append() scrive solo le righe nuove, il file cresce
+    raddoppiando. Le colonne di testo (simbolo, motivo) sono salvate come
+    codici interi, con i valori nel meta.json insieme a righe e tipi delle
+    colonne; il meta è riscritto a ogni append, quindi un run interrotto
+    resta leggibile fino all'ultimo blocco.
+    """
+
+    def __init__(self, root, info=None):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self.meta = {'tables': {}, 'categories': {}, 'info': info or {}}
+        meta_path = os.path.join(root, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+
+    def _path(self, table):
+        return os.path.join(self.root, f"{table}.npy")
+
+    def _write_meta(self):
+        meta_path = os.path.join(self.root, 'meta.json')
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f, default=str)
+        os.replace(tmp_path, meta_path)
+
+    def _encode(self, name, values):
+        """Testo -> codici interi stabili per colonna"""
+        codes = self.meta['categories'].setdefault(name, [])
+        lookup = {value: i for i, value in enumerate(codes)}
+        out = np.empty(len(values), dtype=np.float64)
+        for i, value in enumerate(values):
+            value = str(value)
+            if value not in lookup:
+                lookup[value] = len(codes)
+                codes.append(value)
+            out[i] = lookup[value]
+        return out
+
+    def _column(self, name, values):
+        values = list(values) if not hasattr(values, 'dtype') else values
+        sample = values[0] if len(values) else 0
+        if isinstance(sample, str):
+            return 'category', self._encode(name, values)
+        if isinstance(sample, (datetime, np.datetime64)) or \
+                (hasattr(values, 'dtype') and pd.api.types.is_datetime64_any_dtype(values)):
+            return 'datetime', _to_float(pd.Series(pd.to_datetime(values)))
+        return 'float', _to_float(values)
+
+    def append(self, table, columns):
+        """Aggiunge righe a una tabella: columns è {nome: valori} (dict o DataFrame)"""
+        if isinstance(columns, pd.DataFrame):
+            columns = {name: columns[name] for name in columns.columns}
+        with self._lock:
+            spec = self.meta['tables'].get(table)
+            names = spec['columns'] if spec else list(columns)
+            encoded = [self._column(name, columns[name]) for name in names]
+            rows = len(encoded[0][1]) if encoded else 0
+            if rows == 0:
+                return 0
+            block = np.vstack([values for _, values in encoded])
+            if spec is None:
+                spec = {'columns': names, 'types': [kind for kind, _ in encoded], 'rows': 0}
+                self.meta['tables'][table] = spec
+            self._write_block(table, spec, block)
+            spec['rows'] += rows
+            self._write_meta()
+            return rows
+
+    def _write_block(self, table, spec, block):
+        path = self._path(table)
+        rows = spec['rows']
+        if rows and os.path.exists(path):
+            mm = np.load(path, mmap_mode='r+')
+            if rows + block.shape[1] <= mm.shape[1]:
+                mm[:, rows:rows + block.shape[1]] = block
+                mm.flush()
+                del mm
+                return
+            block = np.concatenate([np.asarray(mm[:, :rows]), block], axis=1)
+            del mm
+        # Prima scrittura o crescita: nuovo file con capacità doppia
+        total = block.shape[1]
+        capacity = max(MIN_CAPACITY, 2 * total)
+        tmp_path = path + '.tmp.npy'
+        mm = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float64,
+                                       shape=(len(spec['columns']), capacity))
+        mm[:, :total] = block
+        mm[:, total:] = np.nan
+        mm.flush()
+        del mm
+        os.replace(tmp_path, path)
+
+    def write_equity(self, symbol, timestamps, equity):
+        """Equity per barra di un simbolo (tabella 'equity')"""
+        return self.append('equity', {
+            'symbol': [symbol] * len(equity),
+            'timestamp': pd.to_datetime(pd.Series(timestamps)),
+            'equity': np.asarray(equity, dtype=np.float64),
+        })
+
+    def write_trades(self, symbol, trades):
+        """Log completo dei trade chiusi di un simbolo (tabella 'trades')"""
+        return self.append('trades', trade_rows(symbol, trades))
+
+    def write_info(self, **info):
+        with self._lock:
+            self.meta['info'].update(info)
+            self._write_meta()
+
+# ==================== LETTURA ====================
+class ResultsReader:
+    """Lettura delle tabelle di ResultsWriter come viste memory-mapped o DataFrame"""
+
+    def __init__(self, root):
+        self.root = root
+        with open(os.path.join(root, 'meta.json')) as f:
+            self.meta = json.load(f)
+
+    @property
+    def tables(self):
+        return list(self.meta['tables'])
+
+    @property
+    def info(self):
+        return self.meta['info']
+
+    def columns(self, table):
+        """Array grezzo (colonne × righe) memory-mapped: nessuna lettura finché non si accede"""
+        spec = self.meta['tables'][table]
+        return np.load(os.path.join(self.root, f"{table}.npy"), mmap_mode='r')[:, :spec['rows']]
+
+    def frame(self, table, columns=None, where=None):
+        """DataFrame decodificato; where={colonna: valore} filtra prima di copiare"""
+        spec = self.meta['tables'][table]
+        data = self.columns(table)
+        names = spec['columns']
+        rows = slice(None)
+        if where:
+            mask = np.ones(data.shape[1], dtype=bool)
+            for name, value in where.items():
+                column = data[names.index(name)]
+                if spec['types'][names.index(name)] == 'category':
+                    codes = self.meta['categories'][name]
+                    value = codes.index(value) if value in codes else -1
+                mask &= column == value
+            rows = np.flatnonzero(mask)
+
+        out = {}
+        for name in columns or names:
+            kind = spec['types'][names.index(name)]
+            values = np.asarray(data[names.index(name)][rows])
+            if kind == 'category':
+                out[name] = pd.Categorical.from_codes(values.astype(np.int64), self.meta['categories'][name])
+            elif kind == 'datetime':
+                out[name] = pd.to_datetime(values.astype(np.int64), unit='ms')
+            else:
+                out[name] = values
+        return pd.DataFrame(out)
+
+    def equity(self, symbol):
+        return self.frame('equity', ['timestamp', 'equity'], where={'symbol': symbol})
+
+    def trades(self, symbol=None):
+        return self.frame('trades', where={'symbol': symbol} if symbol else None)
+
+def new_run_dir(name, root=RESULTS_DIR):
+    """Cartella per un nuovo run: <root>/<name>_<timestamp>"""
+    return os.path.join(root, f"{name}_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}")
@@ -0,0 +1,118 @@
+import threading
+import indicators
+from resample import provider_for
+
+# ==================== STRATEGIA DICHIARATIVA ====================
+class Strategy:
+    """Strategia registrata con gli indicatori che usa e le righe che valuta.
+
+    `indicators` è una lista di (nome, parametri) della libreria indicators;
+    `rows` sono le righe con tutti gli indicatori validi che la strategia
+    guarda (es. la finestra del percentile di volatilità). Da questi segue
+    lookback = riscaldamento + rows: le candele da scaricare, candela in
+    corso inclusa, senza numeri scelti a mano.
+    """
+
+    def __init__(self, name, indicators, rows=1, interval='1d', evaluate=None):
+        self.name = name
+        self.indicators = list(indicators)
+        self.rows = rows
+        self.interval = interval
+        self.evaluate = evaluate
+        self._last = {}
+        self._lock = threading.Lock()
+
+    @property
+    def warmup(self):
+        return max((indicators.warmup_bars(name, **params) for name, params in self.indicators), default=0)
+
+    @property
+    def lookback(self):
+        return self.warmup + self.rows
+
+    def window(self, df):
+        """Solo le ultime `lookback` candele"""
+        return df.iloc[-self.lookback:].reset_index(drop=True)
+
+    def run(self, symbol, df, evaluate=None):
+        """Valuta la strategia, oppure ritorna l'ultimo risultato se l'input non è cambiato.
+
+        L'input è identificato da ultima candela, sua chiusura e numero di
+        righe: con la candela live il prezzo cambia senza cambiare timestamp.
+        """
+        evaluate = evaluate or self.evaluate
+        key = indicators.series_key(symbol, self.interval, df)
+        with self._lock:
+            last = self._last.get(symbol)
+        if key is not None and last is not None and last[0] == key:
+            return last[1]
+
+        result = evaluate(symbol, df)
+        with self._lock:
+            self._last[symbol] = (key, result)
+        return result
+
+    def __repr__(self):
+        return f"Strategy({self.name!r}, lookback={self.lookback}, interval={self.interval!r})"
+
+# ==================== REGISTRO ====================
+STRATEGIES = {}
+
+# Indicatori della strategia ML ottimizzata (versione attuale e versione old)
+OPTIMIZED_ML_INDICATORS = [
+    ('sma', {'window': 5}), ('sma', {'window': 10}), ('sma', {'window': 30}),
+    ('rsi', {'period': 14}),
+    ('momentum', {'periods': 3}), ('momentum', {'periods': 5}), ('momentum', {'periods': 10}),
+    ('volatility', {'window': 20}),
+]
+
+def register(name, indicators, rows=1, interval='1d', evaluate=None):
+    """Registra (o sostituisce) una strategia e la ritorna"""
+    strategy = Strategy(name, indicators, rows, interval, evaluate)
+    STRATEGIES[name] = strategy
+    return strategy
+
+def active(names=None):
+    return [STRATEGIES[name] for name in (names or STRATEGIES)]
+
+def requirements(names=None, interval=None):
+    """Unione dei requisiti: {intervallo: candele da scaricare} per le strategie attive.
+
+    Con `interval` tutte le strategie girano sulle candele di quell'intervallo.
+    """
+    needs = {}
+    for strategy in active(names):
+        key = interval or strategy.interval
+        needs[key] = max(needs.get(key, 0), strategy.lookback)
+    return needs
+
+def fetch_inputs(symbol, names=None, provider=None, interval=None):
+    """Un solo download per intervallo, grande quanto la strategia più esigente (ordinato, senza NaN).
+
+    Senza provider gli intervalli non nativi sono ricampionati dalla serie 1m.
+    """
+    inputs = {}
+    for key, bars in requirements(names, interval).items():
+        df = provider_for(key, provider).get_klines(symbol, key, limit=bars)
+        inputs[key] = df.sort_values('timestamp').dropna().reset_index(drop=True)
+    return inputs
+
+def run_all(symbol, names=None, provider=None, interval=None, evaluators=None):
+    """Esegue le strategie attive su un simbolo: {nome: risultato}.
+
+    evaluators {nome: funzione(symbol, df)} sostituisce la valutazione
+    registrata (es. metodi di un trader); le strategie senza valutazione o
+    senza candele sono saltate. Su un intervallo diverso da quello della
+    strategia, risultati e stato restano separati per simbolo@intervallo.
+    """
+    evaluators = evaluators or {}
+    inputs = fetch_inputs(symbol, names, provider, interval)
+    results = {}
+    for strategy in active(names):
+        evaluate = evaluators.get(strategy.name, strategy.evaluate)
+        df = inputs[interval or strategy.interval]
+        if evaluate is None or df.empty:
+            continue
+        key = symbol if interval in (None, strategy.interval) else f"{symbol}@{interval}"
+        results[strategy.name] = strategy.run(key, strategy.window(df), evaluate)
+    return results
@@ -0,0 +1,250 @@
+import math
+import threading
+from collections import deque
+import pandas as pd
+from indicators import RSI_MIN_LOSS, VOLATILITY_PERCENTILE, RollingQuantile
+
+# ==================== PARAMETRI INDICATORI ====================
+# Gli stessi di main.calculate_advanced_indicators
+SMA_WINDOWS = (5, 10, 30)
+RSI_PERIOD = 14
+MOMENTUM_PERIODS = (3, 5, 10)
+VOLATILITY_WINDOW = 20
+
+# Ogni quante candele ricalcolare somme e varianza da zero (deriva floating point)
+RESYNC_EVERY = 1000
+
+# Barre iniziali senza tutti gli indicatori (sma_30 è l'ultimo a diventare valido)
+WARMUP_BARS = max(SMA_WINDOWS) - 1
+
+NAN = float('nan')
+
+# ==================== STATO PER SIMBOLO ====================
+class IndicatorState:
+    """Stato incrementale degli indicatori di un simbolo.
+
+    update() registra una candela chiusa, peek() calcola gli indicatori per
+    la candela in corso senza modificare lo stato. Entrambi costano O(1)
+    rispetto alla lunghezza dello storico: somme mobili per le SMA,
+    Welford su finestra per la volatilità, somme di guadagni/perdite per l'RSI.
+    """
+
+    def __init__(self):
+        self.closes = deque(maxlen=max(max(SMA_WINDOWS), max(MOMENTUM_PERIODS), VOLATILITY_WINDOW) + 1)
+        self.sums = {n: 0.0 for n in SMA_WINDOWS}
+        self.gains = deque(maxlen=RSI_PERIOD)
+        self.losses = deque(maxlen=RSI_PERIOD)
+        self.gain_sum = 0.0
+        self.loss_sum = 0.0
+        self.vol_mean = 0.0
+        self.vol_m2 = 0.0
+        self.same_run = 0            # Chiusure identiche consecutive (varianza esattamente 0)
+        self.count = 0
+
+    # ---------- transizioni ----------
+    def _next_sums(self, close):
+        sums = {}
+        for n, total in self.sums.items():
+            total += close
+            if len(self.closes) >= n:
+                total -= self.closes[-n]
+            sums[n] = total
+        return sums
+
+    def _next_rsi_sums(self, close):
+        # Prima candela: pandas trasforma il delta NaN in guadagno/perdita 0
+        delta = close - self.closes[-1] if self.closes else 0.0
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        gain_sum, loss_sum = self.gain_sum + gain, self.loss_sum + loss
+        if len(self.gains) == RSI_PERIOD:
+            gain_sum -= self.gains[0]
+            loss_sum -= self.losses[0]
+        return gain, loss, gain_sum, loss_sum
+
+    def _next_welford(self, close):
+        n = VOLATILITY_WINDOW
+        if len(self.closes) >= n:
+            old = self.closes[-n]
+            mean = self.vol_mean + (close - old) / n
+            m2 = self.vol_m2 + (close - old) * (close - mean + old - self.vol_mean)
+        else:
+            k = len(self.closes) + 1
+            delta = close - self.vol_mean
+            mean = self.vol_mean + delta / k
+            m2 = self.vol_m2 + delta * (close - mean)
+        return mean, m2
+
+    def _next_same_run(self, close):
+        return self.same_run + 1 if self.closes and close == self.closes[-1] else 1
+
+    def _values(self, close, sums, gain_sum, loss_sum, vol_m2, same_run, window):
+        """Indicatori per `close` dato lo stato successivo (window = ultime chiusure incluso close)"""
+        length = len(window)
+        values = {'close': close}
+
+        for n in SMA_WINDOWS:
+            if length < n:
+                values[f'sma_{n}'] = NAN
+            elif same_run >= n:
+                # Come pandas: n valori identici -> media esattamente uguale al valore
+                values[f'sma_{n}'] = close
+            else:
+                values[f'sma_{n}'] = sums[n] / n
+
+        if length >= RSI_PERIOD:
+            avg_gain = max(gain_sum, 0.0) / RSI_PERIOD
+            avg_loss = max(loss_sum, 0.0) / RSI_PERIOD
+            if avg_loss == 0:
+                avg_loss = RSI_MIN_LOSS
+            values['rsi'] = 100 - (100 / (1 + avg_gain / avg_loss))
+        else:
+            values['rsi'] = NAN
+
+        for n in MOMENTUM_PERIODS:
+            values[f'momentum_{n}'] = close / window[-n - 1] - 1 if length > n else NAN
+
+        if length >= VOLATILITY_WINDOW:
+            # Come pandas: finestra tutta uguale -> 0 esatto, non residui di arrotondamento
+            variance = 0.0 if same_run >= VOLATILITY_WINDOW else max(vol_m2, 0.0) / (VOLATILITY_WINDOW - 1)
+            values['volatility'] = math.sqrt(variance)
+        else:
+            values['volatility'] = NAN
+
+        for n in SMA_WINDOWS:
+            values[f'price_vs_sma{n}'] = close / values[f'sma_{n}']
+        return values
+
+    # ---------- API ----------
+    def peek(self, close):
+        """Indicatori per la candela in corso (lo stato non cambia)"""
+        close = float(close)
+        sums = self._next_sums(close)
+        _, _, gain_sum, loss_sum = self._next_rsi_sums(close)
+        _, vol_m2 = self._next_welford(close)
+        window = list(self.closes)[-(self.closes.maxlen - 1):] + [close]
+        return self._values(close, sums, gain_sum, loss_sum, vol_m2, self._next_same_run(close), window)
+
+    def update(self, close):
+        """Registra una candela chiusa e ritorna i suoi indicatori"""
+        close = float(close)
+        self.sums = self._next_sums(close)
+        gain, loss, self.gain_sum, self.loss_sum = self._next_rsi_sums(close)
+        self.vol_mean, self.vol_m2 = self._next_welford(close)
+        self.same_run = self._next_same_run(close)
+        self.gains.append(gain)
+        self.losses.append(loss)
+        self.closes.append(close)
+        self.count += 1
+        if self.count % RESYNC_EVERY == 0:
+            self._resync()
+        return self._values(close, self.sums, self.gain_sum, self.loss_sum, self.vol_m2,
+                            self.same_run, list(self.closes))
+
+    def _resync(self):
+        """Ricalcola somme e varianza dalle finestre per azzerare la deriva"""
+        closes = list(self.closes)
+        for n in SMA_WINDOWS:
+            self.sums[n] = math.fsum(closes[-n:])
+        self.gain_sum = math.fsum(self.gains)
+        self.loss_sum = math.fsum(self.losses)
+        window = closes[-VOLATILITY_WINDOW:]
+        self.vol_mean = math.fsum(window) / len(window)
+        self.vol_m2 = math.fsum((x - self.vol_mean) ** 2 for x in window)
+
+# ==================== MOTORE MULTI-SIMBOLO ====================
+class StreamingIndicators:
+    """Indicatori incrementali per più simboli, con le ultime righe pronte per le strategie.
+
+    `rows` è il numero di righe restituite da frame(): con rows = giorni
+    scaricati - WARMUP_BARS il risultato coincide con
+    calculate_advanced_indicators(df).dropna() sulla stessa finestra.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self._states = {}
+        self._history = {}
+        self._volatility = {}
+        self._live_volatility = {}
+        self._last_timestamp = {}
+        self._lock = threading.Lock()
+
+    def _reset(self, key):
+        self._states[key] = IndicatorState()
+        self._history[key] = deque(maxlen=max(self.rows - 1, 0))
+        # Stessa finestra delle righe in _history, per il filtro di regime
+        self._volatility[key] = RollingQuantile(window=max(self.rows - 1, 0))
+        self._live_volatility[key] = None
+        self._last_timestamp[key] = None
+
+    def on_bar_close(self, key, timestamp, close):
+        """Candela chiusa: aggiorna lo stato in O(1)"""
+        with self._lock:
+            if key not in self._states:
+                self._reset(key)
+        values = self._states[key].update(close)
+        values['timestamp'] = timestamp
+        self._history[key].append(values)
+        self._volatility[key].add(values['volatility'])
+        self._last_timestamp[key] = timestamp
+        return values
+
+    def on_live(self, key, timestamp, close):
+        """Candela in corso: indicatori senza modificare lo stato"""
+        values = self._states[key].peek(close)
+        values['timestamp'] = timestamp
+        return values
+
+    def frame(self, key, df):
+        """Allinea lo stato con df (ultima riga = candela in corso) e ritorna le righe indicatori.
+
+        Vengono elaborate solo le candele chiuse successive all'ultima vista;
+        se la storia non è contigua lo stato riparte da zero.
+        """
+        timestamps = df['timestamp'].tolist()
+        closes = df['close'].astype(float).tolist()
+        closed = len(timestamps) - 1
+
+        with self._lock:
+            last = self._last_timestamp.get(key)
+        start = None
+        if last is not None:
+            for i in range(closed - 1, -1, -1):
+                if timestamps[i] == last:
+                    start = i + 1
+                    break
+                if timestamps[i] < last:
+                    break
+        if start is None:
+            with self._lock:
+                self._reset(key)
+            start = 0
+
+        for i in range(start, closed):
+            self.on_bar_close(key, timestamps[i], closes[i])
+
+        rows = list(self._history[key])
+        if closed >= 0:
+            rows.append(self.on_live(key, timestamps[-1], closes[-1]))
+        result = pd.DataFrame(rows)
+        if not len(result):
+            return result
+        result = result.dropna().reset_index(drop=True)
+
+        # Il quantile incrementale vale solo se frame() non ha scartato righe
+        live = rows[-1]['volatility'] if closed >= 0 and len(result) == len(rows) else None
+        self._live_volatility[key] = live
+        return result
+
+    def high_volatility(self, key, percentile=VOLATILITY_PERCENTILE):
+        """La volatilità dell'ultima riga di frame() supera il percentile delle righe restituite?
+
+        Equivale a np.percentile(frame['volatility'], percentile) ma costa
+        O(log n). Ritorna None se il valore non è disponibile (storia non
+        ancora piena): il chiamante deve calcolarlo dal DataFrame.
+        """
+        live = self._live_volatility.get(key)
+        if live is None:
+            return None
+        return live > self._volatility[key].quantile(percentile, extra=live)
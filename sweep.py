@@ -0,0 +1,243 @@
+import os
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+import backtest
+import indicators
+import main
+from indicator_panel import IndicatorPanel
+
+# ==================== CONFIGURAZIONE SWEEP ====================
+SWEEP_WORKERS = int(os.getenv('SWEEP_WORKERS', os.cpu_count() or 1))
+SWEEP_CHUNK = 50             # Combinazioni per task inviato a un worker
+
+# Valori attuali del bot: il punto di partenza di ogni griglia
+DEFAULT_PARAMS = {
+    'stop_loss': main.MONEY_MANAGEMENT['stop_loss'],
+    'take_profit': main.MONEY_MANAGEMENT['take_profit'],
+    'trailing_stop': main.MONEY_MANAGEMENT['trailing_stop'],
+    'trailing_activation': main.MONEY_MANAGEMENT['trailing_activation'],
+    'use_trailing_stop': main.MONEY_MANAGEMENT['use_trailing_stop'],
+    'buy_above': main.OPTIMIZED_BUY_ABOVE,
+    'sell_below': main.OPTIMIZED_SELL_BELOW,
+    'min_confidence': main.MIN_CONFIDENCE,
+}
+
+EXAMPLE_GRID = {
+    'stop_loss': [0.01, 0.015, 0.02, 0.03, 0.05],
+    'take_profit': [0.02, 0.025, 0.04, 0.06, 0.1],
+    'trailing_stop': [0.02, 0.03, 0.05, 0.08],
+    'trailing_activation': [0.01, 0.02, 0.04],
+    'buy_above': [0.5, 0.55, 0.6],
+    'sell_below': [0.4, 0.45],
+    'min_confidence': [0.5, 0.6],
+}
+
+# ==================== DATI ====================
+# Colonne del pannello che entrano nel punteggio (le righe con NaN sono il riscaldamento)
+SCORE_COLUMNS = ('sma_5', 'sma_10', 'sma_30', 'rsi', 'momentum_3', 'momentum_5', 'momentum_10', 'volatility')
+
+def scores_from_frame(frame):
+    """Punteggi di optimized_ml_strategy per ogni barra chiusa, come li vede il bot live.
+
+    Il percentile di volatilità usa una finestra mobile di OPTIMIZED_ML.rows
+    righe (quella del frame live) e le prime righe sotto il minimo della
+    strategia restano NaN, così nessuna soglia può attivarle.
+    """
+    valid = frame.dropna()
+    scores = np.full(len(frame), np.nan)
+    if len(valid) < main.STRATEGY_MIN_BARS:
+        return scores
+
+    volatility = valid['volatility'].values
+    high_volatility = volatility > indicators.rolling_quantile(
+        volatility, indicators.VOLATILITY_PERCENTILE, window=main.OPTIMIZED_ML.rows)
+    valid_scores, _ = main.optimized_ml_scores(valid, high_volatility)
+    valid_scores[:main.STRATEGY_MIN_BARS - 1] = np.nan
+    scores[frame.index.get_indexer(valid.index)] = valid_scores
+    return scores
+
+def panel_scores(frames):
+    """{simbolo: punteggi per candela} con gli indicatori di tutte le coppie in un solo pannello"""
+    panel = IndicatorPanel.from_frames({symbol: df[['timestamp', 'close']] for symbol, df in frames.items()})
+    return {symbol: scores_from_frame(panel.frame(symbol, SCORE_COLUMNS)) for symbol in panel.symbols}
+
+def strategy_scores(df):
+    """Punteggi di una sola coppia (pannello con un simbolo)"""
+    return panel_scores({'pair': df})['pair']
+
+def load_frames(pairs=None, years=7, provider=None):
+    """{simbolo: candele} per le coppie con storico sufficiente"""
+    frames = {}
+    for symbol in pairs or backtest.CRYPTO_PAIRS:
+        df = backtest.download_historical_data(symbol, years=years, provider=provider)
+        if df is None or len(df) < 100:
+            print(f"❌ Dati insufficienti per {symbol}")
+            continue
+        frames[symbol] = df
+    return frames
+
+def load_pairs(pairs=None, years=7, provider=None):
+    """{simbolo: (prezzi, punteggi)} per le coppie con storico sufficiente"""
+    frames = load_frames(pairs, years, provider)
+    scores = panel_scores(frames) if frames else {}
+    return {symbol: (df['close'].to_numpy(dtype=float), scores[symbol]) for symbol, df in frames.items()}
+
+# ==================== MEMORIA CONDIVISA ====================
+class SharedArrays:
+    """Prezzi e punteggi di tutte le coppie in un unico blocco di memoria condivisa.
+
+    Il processo principale copia gli array una volta; i worker si agganciano
+    per nome e leggono viste NumPy senza ricevere dati via pickle.
+    """
+
+    def __init__(self, data):
+        self.layout = []
+        offset = 0
+        for symbol, (prices, scores) in data.items():
+            self.layout.append((symbol, offset, len(prices)))
+            offset += len(prices)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, 2 * offset * 8))
+        buffer = np.ndarray((2, offset), dtype=np.float64, buffer=self.shm.buf)
+        for (symbol, start, length), (prices, scores) in zip(self.layout, data.values()):
+            buffer[0, start:start + length] = prices
+            buffer[1, start:start + length] = scores
+        self.total = offset
+
+    @property
+    def spec(self):
+        """Quanto serve a un worker per ritrovare gli array"""
+        return self.shm.name, self.total, self.layout
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+_WORKER = {}
+
+def _attach(name, total, layout):
+    """Initializer dei worker: viste sugli array condivisi"""
+    shm = shared_memory.SharedMemory(name=name)
+    buffer = np.ndarray((2, total), dtype=np.float64, buffer=shm.buf)
+    _WORKER['shm'] = shm
+    _WORKER['pairs'] = [(symbol, buffer[0, start:start + length], buffer[1, start:start + length])
+                        for symbol, start, length in layout]
+
+# ==================== VALUTAZIONE ====================
+def evaluate(params, pairs, initial_balance=backtest.INITIAL_BALANCE, start=0, end=None):
+    """Backtest di una combinazione su tutte le coppie: una riga della classifica.
+
+    start/end limitano la valutazione a un intervallo di barre (es. una
+    finestra walk-forward); i punteggi sono causali, quindi tagliare non
+    introduce sguardi al futuro.
+    """
+    returns, win_rates, drawdowns, trades = [], [], [], 0
+    for symbol, prices, scores in pairs:
+        prices, scores = prices[start:end], scores[start:end]
+        # Coppia non ancora quotata (o ancora in riscaldamento) nell'intervallo
+        if not np.isfinite(scores).any():
+            continue
+        confident = scores > params['min_confidence']
+        buy = confident & (scores > params['buy_above'])
+        sell = confident & (scores < params['sell_below'])
+        balance, pair_trades = backtest.simulate_managed(
+            prices, buy, sell, initial_balance,
+            params['stop_loss'], params['take_profit'],
+            params['trailing_stop'], params['trailing_activation'],
+            params['use_trailing_stop'])
+        stats = backtest.backtest_stats(initial_balance, balance, pair_trades)
+        returns.append(stats['total_return_percent'])
+        win_rates.append(stats['win_rate'])
+        drawdowns.append(stats['max_drawdown'])
+        trades += stats['total_trades']
+
+    row = dict(params)
+    row.update({
+        'mean_return': float(np.mean(returns)) if returns else 0.0,
+        'median_return': float(np.median(returns)) if returns else 0.0,
+        'worst_return': float(np.min(returns)) if returns else 0.0,
+        'mean_win_rate': float(np.mean(win_rates)) if win_rates else 0.0,
+        'max_drawdown': float(np.max(drawdowns)) if drawdowns else 0.0,
+        'trades': trades,
+    })
+    return row
+
+def _evaluate_chunk(chunk):
+    return [evaluate(params, _WORKER['pairs'], start=start, end=end) for params, start, end in chunk]
+
+def parallel_evaluate(tasks, data, workers=SWEEP_WORKERS, chunk_size=SWEEP_CHUNK, on_rows=None):
+    """Valuta in parallelo una lista di (params, start, end); righe nello stesso ordine.
+
+    on_rows(righe) è chiamato a ogni blocco completato (es. scrittura incrementale).
+    """
+    chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+    shared = SharedArrays(data)
+    rows = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                 initargs=shared.spec) as executor:
+            for result in executor.map(_evaluate_chunk, chunks):
+                rows.extend(result)
+                if on_rows is not None:
+                    on_rows(result)
+    finally:
+        shared.close()
+    return rows
+
+def expand_grid(grid):
+    """Tutte le combinazioni della griglia, con i valori attuali per i parametri non indicati"""
+    names = list(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(DEFAULT_PARAMS)
+        params.update(zip(names, values))
+        yield params
+
+def run_sweep(grid, data, workers=SWEEP_WORKERS, chunk_size=SWEEP_CHUNK, sort_by='mean_return', writer=None):
+    """Valuta tutta la griglia in parallelo e ritorna la classifica (DataFrame).
+
+    Con un results_store.ResultsWriter le righe finiscono su disco (tabella
+    'sweep') man mano che i blocchi terminano.
+    """
+    tasks = [(params, 0, None) for params in expand_grid(grid)]
+    on_rows = (lambda rows: writer.append('sweep', pd.DataFrame(rows))) if writer is not None else None
+    rows = parallel_evaluate(tasks, data, workers, chunk_size, on_rows)
+
+    table = pd.DataFrame(rows)
+    if len(table):
+        table = table.sort_values(sort_by, ascending=False).reset_index(drop=True)
+    return table
+
+# ==================== CLI ====================
+def main_cli():
+    parser = argparse.ArgumentParser(description="Sweep parametri money management e soglie")
+    parser.add_argument('--years', type=float, default=7)
+    parser.add_argument('--workers', type=int, default=SWEEP_WORKERS)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--output', help="CSV con la classifica completa")
+    parser.add_argument('--results', action='store_true', help="Salva le righe su disco durante lo sweep")
+    args = parser.parse_args()
+
+    data = load_pairs(years=args.years)
+    combos = int(np.prod([len(v) for v in EXAMPLE_GRID.values()]))
+    print(f"🔬 SWEEP: {combos} combinazioni × {len(data)} coppie su {args.workers} processi")
+
+    writer = None
+    if args.results:
+        import results_store
+        writer = results_store.ResultsWriter(results_store.new_run_dir("sweep"), info={'pairs': list(data)})
+        print(f"💾 Righe salvate in {writer.root}")
+    
+    started = time.time()
+    table = run_sweep(EXAMPLE_GRID, data, workers=args.workers, writer=writer)
+    print(f"⏱️  Completato in {time.time() - started:.1f}s")
+    print(table.head(args.top).to_string())
+    if args.output:
+        table.to_csv(args.output, index=False)
+        print(f"💾 Classifica salvata in {args.output}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,25 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# I moduli del bot stanno nella radice del repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def random_walk(bars, seed=7, daily_vol=0.03):
+    """Candele giornaliere riproducibili, abbastanza volatili da generare trade"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, daily_vol, bars)))
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2020-01-01', periods=bars, freq='D'),
+        'open': np.r_[100, close[:-1]],
+        'high': close * 1.01,
+        'low': close * 0.99,
+        'close': close,
+        'volume': rng.lognormal(3, 0.5, bars),
+    })
+
+@pytest.fixture
+def candles():
+    return random_walk(400)
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import pytest
+import main as bot
+import backtest
+import sweep
+from conftest import random_walk
+from indicator_panel import IndicatorPanel, rolling_mean
+from streaming_indicators import StreamingIndicators, WARMUP_BARS
+
+# ==================== STRATEGIA: VETTORIALE vs SCALARE ====================
+def test_optimized_ml_scores_match_scalar(candles):
+    df = bot.calculate_advanced_indicators(candles.copy()).dropna().reset_index(drop=True)
+    scores, signals = bot.optimized_ml_scores(df)
+    for i in range(bot.STRATEGY_MIN_BARS - 1, len(df)):
+        signal, score = bot.optimized_ml_strategy(df.iloc[:i + 1])
+        assert signals[i] == signal, f"riga {i}"
+        assert scores[i] == pytest.approx(score), f"riga {i}"
+
+def test_improved_signals_match_scalar(candles):
+    prices = candles['close'].to_numpy()
+    rsi = backtest.calculate_rsi(prices).to_numpy()
+    signals = backtest.improved_signals(prices, rsi)
+    codes = {"BUY": backtest.BUY, "SELL": backtest.SELL, "HOLD": backtest.HOLD}
+    expected = [codes[backtest.improved_strategy(prices[:i + 1], rsi[:i + 1])] for i in range(len(prices))]
+    np.testing.assert_array_equal(signals, expected)
+
+# ==================== INDICATORI: STREAMING vs BATCH ====================
+def test_streaming_frame_matches_batch(candles):
+    rows = 71
+    stream = StreamingIndicators(rows=rows)
+    # Finestra che scorre come nel bot live: una candela nuova per volta
+    for end in range(rows + WARMUP_BARS, len(candles) + 1, 37):
+        window = candles.iloc[end - rows - WARMUP_BARS:end].reset_index(drop=True)
+        frame = stream.frame('TEST', window)
+        batch = bot.calculate_advanced_indicators(window.copy()).dropna().reset_index(drop=True)
+        assert len(frame) == len(batch) == rows
+        for column in ('sma_5', 'sma_10', 'sma_30', 'rsi', 'momentum_3', 'momentum_5',
+                       'momentum_10', 'volatility', 'price_vs_sma5', 'price_vs_sma30'):
+            np.testing.assert_allclose(frame[column], batch[column], rtol=1e-9, err_msg=column)
+        expected = batch['volatility'].iloc[-1] > np.percentile(batch['volatility'], 80)
+        assert stream.high_volatility('TEST') == expected
+
+# ==================== INDICATORI: PANNELLO vs PER SIMBOLO ====================
+def gapped_frames():
+    """Due coppie quotate in date diverse, la seconda con candele mancanti a metà storia"""
+    late = random_walk(300, seed=2)
+    late['timestamp'] += pd.Timedelta(days=40)
+    late = late.drop(index=[100, 101, 160]).reset_index(drop=True)
+    return {'EARLY': random_walk(400, seed=1), 'LATE': late}
+
+def test_panel_matches_advanced_indicators():
+    frames = gapped_frames()
+    panel = IndicatorPanel.from_frames(frames)
+    for symbol, df in frames.items():
+        frame = panel.frame(symbol)
+        batch = bot.calculate_advanced_indicators(df.copy())
+        assert len(frame) == len(df)
+        np.testing.assert_array_equal(frame['timestamp'], df['timestamp'])
+        for column in ('sma_5', 'sma_10', 'sma_30', 'rsi', 'momentum_3', 'momentum_5',
+                       'momentum_10', 'volatility', 'price_vs_sma5', 'price_vs_sma10', 'price_vs_sma30'):
+            np.testing.assert_allclose(frame[column], batch[column], rtol=1e-9, err_msg=column)
+        macd = df['close'].ewm(span=12).mean() - df['close'].ewm(span=26).mean()
+        np.testing.assert_allclose(frame['macd'], macd, rtol=1e-9)
+        np.testing.assert_allclose(frame['macd_signal'], macd.ewm(span=9).mean(), rtol=1e-9)
+        np.testing.assert_allclose(frame['volume_ratio'], df['volume'] / df['volume'].rolling(20).mean(), rtol=1e-9)
+        latest = panel.latest(['rsi']).loc[symbol]
+        assert latest['timestamp'] == df['timestamp'].iloc[-1]
+        assert latest['rsi'] == pytest.approx(batch['rsi'].iloc[-1])
+
+def test_panel_scores_match_per_pair_indicators():
+    frames = gapped_frames()
+    scores = sweep.panel_scores(frames)
+    for symbol, df in frames.items():
+        reference = sweep.scores_from_frame(bot.calculate_advanced_indicators(df[['timestamp', 'close']].copy()))
+        np.testing.assert_allclose(scores[symbol], reference, rtol=1e-12)
+
+# ==================== BACKTEST: VETTORIALE vs CICLO ====================
+def loop_backtest(df, initial_balance):
+    """Il backtest originale barra per barra, come riferimento"""
+    balance, position, entry_price, trades = initial_balance, 0, 0, []
+    prices = df['close'].tolist()
+    rsi_values = backtest.calculate_rsi(prices).tolist()
+    for i in range(backtest.WARMUP_BARS, len(prices)):
+        action = backtest.improved_strategy(prices[:i + 1], rsi_values[:i + 1])
+        if action == "BUY" and position == 0:
+            position, entry_price = 1, prices[i]
+            trades.append({'type': 'BUY', 'price': prices[i], 'date': df['timestamp'].iloc[i],
+                           'balance_before': balance})
+        elif action == "SELL" and position == 1:
+            profit_percent = (prices[i] - entry_price) / entry_price - backtest.COMMISSION * 2
+            balance *= 1 + profit_percent
+            position = 0
+            trades.append({'type': 'SELL', 'price': prices[i], 'profit_percent': profit_percent * 100,
+                           'balance_after': balance, 'date': df['timestamp'].iloc[i]})
+    if position == 1:
+        profit_percent = (prices[-1] - entry_price) / entry_price - backtest.COMMISSION * 2
+        balance *= 1 + profit_percent
+        trades.append({'type': 'SELL_FINAL', 'price': prices[-1], 'profit_percent': profit_percent * 100,
+                       'balance_after': balance, 'date': df['timestamp'].iloc[-1]})
+    return balance, trades
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_run_backtest_matches_loop(seed):
+    df = random_walk(500, seed=seed)
+    result = backtest.run_backtest(df, initial_balance=50, cache=None)
+    balance, trades = loop_backtest(df, 50)
+    assert len(trades) > 0
+    assert result['trades'] == trades
+    assert result['final_balance'] == pytest.approx(balance, rel=1e-12)
+
+def test_rolling_mean_matches_window_mean(candles):
+    # Bit per bit come np.mean sulla finestra di improved_strategy, non solo a meno di tolleranza
+    prices = candles['close'].to_numpy()
+    for window in (1, 5, 20, len(prices), len(prices) + 1):
+        expected = [np.mean(prices[i + 1 - window:i + 1]) if i + 1 >= window else np.nan
+                    for i in range(len(prices))]
+        np.testing.assert_array_equal(rolling_mean(prices, window), expected)
@@ -1,8 +1,8 @@
 import os
 import time
-import requests
 import json
 from datetime import datetime
+from price_service import PRICES
 
 # Configurazione
 BINANCE_API_KEY = os.getenv('BINANCE_API_KEY')
@@ -15,11 +15,10 @@ print("🎯 TRADING BOT ATTIVO!")
 def get_btc_price():
     """Prendi il prezzo corrente di BTC"""
     try:
-        url = "https://api.binance.com/api/v3/ticker/price"
-        params = {"symbol": SYMBOL}
-        response = requests.get(url, params=params)
-        data = response.json()
-        return float(data['price'])
+        price = PRICES.get_price(SYMBOL)
+        if price is None:
+            raise ValueError(f"{SYMBOL} non quotato")
+        return price
     except Exception as e:
         print(f"❌ Errore prezzo: {e}")
         return None
@@ -0,0 +1,190 @@
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import backtest
+import sweep
+from candle_store import STORE_DIR
+from backtest_cache import ResultCache, content_key, code_fingerprint
+
+# ==================== CONFIGURAZIONE WALK-FORWARD ====================
+BLOCK_BARS = 182             # Finestra di test (~6 mesi di candele giornaliere)
+TRAIN_BLOCKS = 4             # Finestra di training = 4 blocchi (~2 anni); None = ancorata
+OBJECTIVE = 'mean_return'
+FIT_CACHE_DIR = os.getenv('WALK_FORWARD_CACHE_DIR', os.path.join(os.path.dirname(STORE_DIR), 'walkforward_cache'))
+FIT_CACHE_MB = float(os.getenv('WALK_FORWARD_CACHE_MB', 64))   # 0 = nessuna persistenza tra run
+
+WALK_FORWARD_GRID = {
+    'stop_loss': [0.015, 0.03, 0.05],
+    'take_profit': [0.025, 0.05, 0.1],
+    'trailing_stop': [0.03, 0.05],
+    'trailing_activation': [0.02, 0.04],
+    'buy_above': [0.55, 0.6],
+}
+
+# ==================== DATI ALLINEATI ====================
+def load_aligned(pairs=None, years=7, provider=None):
+    """Prezzi e punteggi di tutte le coppie sullo stesso asse temporale.
+
+    Le coppie quotate più tardi hanno NaN in testa: nessun segnale e nessun
+    trade finché non esistono. Ritorna ({simbolo: (prezzi, punteggi)}, date).
+    """
+    candles = sweep.load_frames(pairs, years, provider)
+    scores = sweep.panel_scores(candles) if candles else {}
+    frames = {
+        symbol: pd.DataFrame({
+            'close': df['close'].to_numpy(dtype=float),
+            'score': scores[symbol],
+        }, index=pd.DatetimeIndex(df['timestamp']))
+        for symbol, df in candles.items()
+    }
+    return align_frames(frames)
+
+def align_frames(frames):
+    """Unione delle date; prezzi mancanti a metà storia riportati avanti, punteggi NaN"""
+    if not frames:
+        return {}, pd.DatetimeIndex([])
+    dates = frames[next(iter(frames))].index
+    for frame in frames.values():
+        dates = dates.union(frame.index)
+    data = {}
+    for symbol, frame in frames.items():
+        frame = frame.reindex(dates)
+        data[symbol] = (frame['close'].ffill().to_numpy(), frame['score'].to_numpy())
+    return data, dates
+
+def fingerprint(data):
+    """Impronta dei dati: le valutazioni in cache valgono solo per gli stessi array"""
+    return content_key(*(part for symbol, (prices, scores) in data.items() for part in (symbol, prices, scores)))
+
+# ==================== CACHE DELLE VALUTAZIONI ====================
+# Codice e impostazioni che determinano una riga di sweep.evaluate
+FIT_CODE = (sweep.evaluate, backtest.simulate_managed, backtest.first_exit, backtest.backtest_stats)
+
+def fit_key(data_id, code_id, params, start, end):
+    """Chiave di contenuto di (dati, codice, impostazioni della simulazione, blocco, parametri)"""
+    settings = {
+        'initial_balance': backtest.INITIAL_BALANCE,
+        'commission': backtest.COMMISSION,
+    }
+    return content_key(data_id, code_id, settings, int(start), int(end), params)
+
+def fit_cache(enabled=True):
+    """Cache su disco delle valutazioni (LRU limitata a FIT_CACHE_MB); disattivata = solo in memoria"""
+    return ResultCache(FIT_CACHE_DIR, FIT_CACHE_MB if enabled else 0)
+
+# ==================== FINESTRE ====================
+def plan_blocks(length, block_bars=BLOCK_BARS):
+    """Blocchi contigui di barre [start, end) che coprono tutta la storia"""
+    return [(start, min(start + block_bars, length)) for start in range(0, length, block_bars)]
+
+def plan_folds(blocks, train_blocks=TRAIN_BLOCKS):
+    """(blocchi di training, blocco di test) per ogni passo: training mobile o ancorato"""
+    folds = []
+    first = train_blocks or 1
+    for k in range(first, len(blocks)):
+        train = blocks[k - train_blocks:k] if train_blocks else blocks[:k]
+        folds.append((train, blocks[k]))
+    return folds
+
+# ==================== WALK-FORWARD ====================
+def compound(returns_percent):
+    """Ritorno composto (%) di una sequenza di ritorni per blocco"""
+    return (np.prod([1 + r / 100 for r in returns_percent]) - 1) * 100
+
+def walk_forward(data, dates, grid=WALK_FORWARD_GRID, block_bars=BLOCK_BARS, train_blocks=TRAIN_BLOCKS,
+                 objective=OBJECTIVE, initial_balance=backtest.INITIAL_BALANCE,
+                 workers=sweep.SWEEP_WORKERS, cache=None):
+    """Ottimizza in-sample su finestre mobili e valuta out-of-sample il blocco successivo.
+
+    Ogni training è una sequenza di blocchi e ogni blocco è valutato da solo
+    (si parte flat, posizioni chiuse a fine blocco): così (blocco, parametri)
+    è calcolato una volta e riusato da tutte le finestre che lo contengono,
+    e il test di un passo è già in cache per i training successivi. Le
+    valutazioni mancanti girano in parallelo sul process pool dello sweep.
+    """
+    cache = cache if cache is not None else fit_cache()
+    length = len(dates)
+    blocks = plan_blocks(length, block_bars)
+    folds = plan_folds(blocks, train_blocks)
+    combos = list(sweep.expand_grid(grid))
+    data_id = fingerprint(data)
+    code_id = code_fingerprint(*FIT_CODE)
+
+    # Tutte le valutazioni servono a qualche finestra: solo quelle mai viste vanno al pool
+    keys = {(i, j): fit_key(data_id, code_id, params, *block) for i, params in enumerate(combos)
+            for j, block in enumerate(blocks)}
+    rows, needed = {}, {}
+    for (i, j), key in keys.items():
+        row = cache.get(key)
+        if row is None:
+            needed[key] = (combos[i], *blocks[j])
+        else:
+            rows[key] = row
+    if needed:
+        evaluated = dict(zip(needed, sweep.parallel_evaluate(list(needed.values()), data, workers)))
+        rows.update(evaluated)
+        cache.put_many(evaluated)
+
+    def block_row(i, block):
+        return rows[keys[(i, blocks.index(block))]]
+
+    folds_table = []
+    equity = [initial_balance]
+    for train, test in folds:
+        # In-sample: ritorno composto dei blocchi di training per ogni combinazione
+        scores = [compound([block_row(i, block)[objective] for block in train]) for i in range(len(combos))]
+        best = int(np.argmax(scores))
+        params = combos[best]
+
+        oos = block_row(best, test)
+        equity.append(equity[-1] * (1 + oos['mean_return'] / 100))
+        folds_table.append({
+            'train_start': dates[train[0][0]],
+            'test_start': dates[test[0]],
+            'test_end': dates[test[1] - 1],
+            **{name: params[name] for name in grid},
+            'in_sample_return': scores[best],
+            'oos_return': oos['mean_return'],
+            'oos_win_rate': oos['mean_win_rate'],
+            'oos_max_drawdown': oos['max_drawdown'],
+            'oos_trades': oos['trades'],
+            'equity': equity[-1],
+        })
+
+    table = pd.DataFrame(folds_table)
+    curve = pd.Series(equity, index=[dates[folds[0][1][0]]] + [dates[test[1] - 1] for _, test in folds]) \
+        if folds else pd.Series([initial_balance], dtype=float)
+    return table, curve
+
+def stability(table, grid=WALK_FORWARD_GRID):
+    """Quante volte ogni valore è stato scelto: parametri stabili = pochi valori dominanti"""
+    return {name: table[name].value_counts().to_dict() for name in grid if name in table}
+
+# ==================== CLI ====================
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward dei parametri di trading")
+    parser.add_argument('--years', type=float, default=7)
+    parser.add_argument('--block', type=int, default=BLOCK_BARS, help="Barre per blocco di test")
+    parser.add_argument('--train-blocks', type=int, default=TRAIN_BLOCKS, help="0 = training ancorato")
+    parser.add_argument('--workers', type=int, default=sweep.SWEEP_WORKERS)
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args()
+
+    print("🚶 WALK-FORWARD OPTIMIZATION")
+    data, dates = load_aligned(years=args.years)
+    cache = fit_cache(enabled=not args.no_cache)
+
+    started = time.time()
+    table, curve = walk_forward(data, dates, block_bars=args.block, train_blocks=args.train_blocks or None,
+                                workers=args.workers, cache=cache)
+    print(f"⏱️  Completato in {time.time() - started:.1f}s")
+    print(table.to_string())
+    print(f"\n📈 Equity out-of-sample: {curve.iloc[0]:.2f}€ -> {curve.iloc[-1]:.2f}€")
+    print("🧭 Stabilità parametri:")
+    for name, counts in stability(table).items():
+        print(f"   • {name}: {counts}")
+
+if __name__ == "__main__":
+    main()